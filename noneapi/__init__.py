@@ -1,10 +1,16 @@
+from .caches import TTLCache
 from .containers import Container, ContainerRunner
 from .events import EventDispatcher, event_handler
 from .exceptions import RemoteError
 from .handlers import BaseRemoteErrorHandler
 from .proxies import ClusterProxy, ServiceProxy
 from .rpc import rpc
-from .serializers import BaseSerializer, JSONSerializer, ORJSONSerializer
+from .serializers import (
+    BaseSerializer,
+    JSONSerializer,
+    MsgPackSerializer,
+    ORJSONSerializer,
+)
 
 __all__ = (
     "rpc",
@@ -18,5 +24,7 @@ __all__ = (
     "BaseRemoteErrorHandler",
     "ORJSONSerializer",
     "JSONSerializer",
+    "MsgPackSerializer",
     "BaseSerializer",
+    "TTLCache",
 )
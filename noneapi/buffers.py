@@ -0,0 +1,118 @@
+import secrets
+import sys
+from typing import Any
+
+BUFFER_KEY = "__buffer__"
+FRAME_KEY = "frame"
+
+
+def extract_buffer(buffers: list[Any], value: Any) -> dict[str, Any]:
+    """
+    Default hook of serializers moving NumPy arrays and other buffers,
+    ``memoryview`` and ``bytearray``, to separate frames sent without
+    copying. The value is replaced with the descriptor of its frame,
+    arrays are described by their dtype, shape and memory order.
+
+    The first frame of buffers is a random tag of the message, which
+    descriptors hold under ``BUFFER_KEY``, so dicts of the data having
+    the same key aren't mistaken for descriptors.
+
+    NumPy isn't imported here, values can't be arrays unless the caller
+    has imported it.
+
+    :param buffers: frames of buffers extracted so far
+    :param value: value the serializer can't encode
+    :return: descriptor of the frame
+    """
+    numpy = sys.modules.get("numpy")
+
+    if (
+        numpy is not None
+        and isinstance(value, numpy.ndarray)
+        and not value.dtype.hasobject
+        and value.dtype.names is None
+    ):
+        order = "C"
+
+        if value.flags.f_contiguous and not value.flags.c_contiguous:
+            order = "F"
+        elif not value.flags.c_contiguous:
+            value = numpy.ascontiguousarray(value)
+
+        descriptor = _add_buffer(buffers, value.reshape(-1, order=order))
+        descriptor.update(
+            dtype=value.dtype.str, shape=list(value.shape), order=order
+        )
+
+        return descriptor
+
+    if isinstance(value, (memoryview, bytearray)):
+        if isinstance(value, memoryview) and not value.c_contiguous:
+            value = value.tobytes()
+
+        return _add_buffer(buffers, value)
+
+    raise TypeError(f"Object of type {type(value)} is not serializable")
+
+
+def restore_buffers(data: Any, frames: list[Any]) -> Any:
+    """
+    Replace descriptors of buffers with the received frames. Arrays are
+    created over the frames without copying.
+
+    :param data: deserialized data
+    :param frames: frames of buffers, starting with the tag of the message
+    :return: data with arrays and buffers
+    """
+    return _restore_buffers(data, bytes(frames[0]).decode(), frames)
+
+
+def restore_buffer(descriptor: dict[str, Any], frames: list[Any]) -> Any:
+    """
+    Get the buffer or the array of the descriptor from the received frames.
+
+    :param descriptor: descriptor built by ``extract_buffer``
+    :param frames: frames of buffers, starting with the tag of the message
+    :return: array or buffer
+    """
+    frame = frames[descriptor[FRAME_KEY]]
+
+    if "dtype" not in descriptor:
+        return frame
+
+    try:
+        import numpy
+    except ImportError as e:
+        raise ImportError(
+            "Arrays require numpy, "
+            "install it with `pip install noneapi[numpy]`"
+        ) from e
+
+    array = numpy.frombuffer(frame, dtype=numpy.dtype(descriptor["dtype"]))
+
+    return array.reshape(descriptor["shape"], order=descriptor["order"])
+
+
+def _add_buffer(buffers: list[Any], value: Any) -> dict[str, Any]:
+    if not buffers:
+        buffers.append(secrets.token_hex(16).encode())
+
+    buffers.append(value)
+
+    return {BUFFER_KEY: buffers[0].decode(), FRAME_KEY: len(buffers) - 1}
+
+
+def _restore_buffers(data: Any, tag: str, frames: list[Any]) -> Any:
+    if isinstance(data, dict):
+        if data.get(BUFFER_KEY) == tag:
+            return restore_buffer(data, frames)
+
+        return {
+            key: _restore_buffers(value, tag, frames)
+            for key, value in data.items()
+        }
+
+    if isinstance(data, list):
+        return [_restore_buffers(value, tag, frames) for value in data]
+
+    return data
@@ -0,0 +1,233 @@
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Callable, Hashable, Iterable
+
+Selector = Callable[[Any], Hashable] | None
+
+MAX_AGE_HEADER = "max_age"
+
+
+@dataclass(frozen=True)
+class CacheStats:
+    """
+    Cache statistics.
+    """
+
+    size: int
+    bytes: int
+    hits: int
+    misses: int
+    evictions: int
+    invalidations: int
+
+
+class TTLCache:
+    """
+    Size bounded LRU cache with expiring entries.
+
+    Entries may be tagged, e.g. with the id of the entity they hold, so
+    they can be invalidated selectively when an event about the entity is
+    received.
+
+    :param maxsize: Maximum number of entries, the least recently used
+        entry is evicted when the cache is full.
+    :type maxsize: int
+
+    :param ttl: Seconds an entry is valid for.
+    :type ttl: float
+
+    :param invalidate_on: Event topics (``"service_name:topic"``)
+        invalidating the cache. A list of topics drops all entries, a dict
+        maps topics to selectors returning the tag of entries to drop from
+        the event payload, ``None`` drops all entries.
+    :type invalidate_on: list[str] | dict[str, Callable | None], optional
+
+    :param tag: Function returning the tag of an entry from the arguments
+        of the call, e.g. ``lambda order_id: order_id``.
+    :type tag: Callable, optional
+
+    :param maxbytes: Maximum total size of ``bytes`` values, least recently
+        used entries are evicted over it. Not limited by default.
+    :type maxbytes: int, optional
+    """
+
+    def __init__(
+        self,
+        maxsize: int = 1024,
+        ttl: float = 60.0,
+        invalidate_on: list[str] | dict[str, Selector] | None = None,
+        tag: Callable[..., Hashable] | None = None,
+        maxbytes: int | None = None,
+    ) -> None:
+        self._maxsize = maxsize
+        self._maxbytes = maxbytes
+        self._bytes = 0
+        self._ttl = ttl
+        self._tag = tag
+
+        if isinstance(invalidate_on, dict):
+            self._invalidate_on = dict(invalidate_on)
+        else:
+            self._invalidate_on = dict.fromkeys(invalidate_on or [])
+
+        self._entries: OrderedDict[Hashable, tuple[float, Any, Hashable]] = (
+            OrderedDict()
+        )
+        self._tags: dict[Hashable, set[Hashable]] = {}
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._invalidations = 0
+
+    @property
+    def ttl(self) -> float:
+        """
+        Seconds an entry is valid for.
+        """
+        return self._ttl
+
+    @property
+    def topics(self) -> list[str]:
+        """
+        Event topics invalidating the cache.
+        """
+        return list(self._invalidate_on)
+
+    @property
+    def stats(self) -> CacheStats:
+        """
+        Current cache statistics.
+        """
+        return CacheStats(
+            size=len(self._entries),
+            bytes=self._bytes,
+            hits=self._hits,
+            misses=self._misses,
+            evictions=self._evictions,
+            invalidations=self._invalidations,
+        )
+
+    def get(self, key: Hashable) -> Any:
+        """
+        Get the value, ``None`` if it isn't cached or expired.
+
+        :param key: Key of the entry.
+        :return: Any
+        """
+        entry = self._entries.get(key)
+
+        if entry is None:
+            self._misses += 1
+            return None
+
+        expires_at, value, _ = entry
+
+        if expires_at <= time.monotonic():
+            self._remove(key)
+            self._misses += 1
+            return None
+
+        self._entries.move_to_end(key)
+        self._hits += 1
+
+        return value
+
+    def set(
+        self,
+        key: Hashable,
+        value: Any,
+        args: Iterable[Any] = (),
+        kwargs: dict[str, Any] | None = None,
+        ttl: float | None = None,
+    ) -> None:
+        """
+        Cache the value.
+
+        :param key: Key of the entry.
+        :param value: Value to cache.
+        :param args: Args of the call, used to tag the entry.
+        :param kwargs: Kwargs of the call, used to tag the entry.
+        :param ttl: Seconds the entry is valid for, limited by the ttl of
+            the cache.
+        """
+        tag = self._tag(*args, **(kwargs or {})) if self._tag else None
+        ttl = self._ttl if ttl is None else min(ttl, self._ttl)
+
+        if key in self._entries:
+            self._remove(key)
+
+        self._entries[key] = (time.monotonic() + ttl, value, tag)
+        self._bytes += _size(value)
+
+        if tag is not None:
+            self._tags.setdefault(tag, set()).add(key)
+
+        while len(self._entries) > self._maxsize or (
+            self._maxbytes is not None and self._bytes > self._maxbytes
+        ):
+            self._remove(next(iter(self._entries)))
+            self._evictions += 1
+
+    def invalidate(self, tag: Hashable | None = None) -> int:
+        """
+        Drop entries with the tag, all entries if the tag isn't set.
+
+        :param tag: Tag of entries to drop.
+        :return: Number of dropped entries.
+        """
+        if tag is None:
+            keys = list(self._entries)
+        else:
+            keys = list(self._tags.get(tag, ()))
+
+        for key in keys:
+            self._remove(key)
+
+        self._invalidations += len(keys)
+
+        return len(keys)
+
+    def invalidate_event(self, topic: str, payload: Any) -> int:
+        """
+        Drop entries invalidated by the event.
+
+        :param topic: Event topic, ``"service_name:topic"``.
+        :param payload: Event payload.
+        :return: Number of dropped entries.
+        """
+        if topic not in self._invalidate_on:
+            return 0
+
+        selector = self._invalidate_on[topic]
+
+        return self.invalidate(selector(payload) if selector else None)
+
+    def clear(self) -> None:
+        """
+        Drop all entries.
+        """
+        self._entries.clear()
+        self._tags.clear()
+        self._bytes = 0
+
+    def _remove(self, key: Hashable) -> None:
+        _, value, tag = self._entries.pop(key)
+        self._bytes -= _size(value)
+
+        if tag is not None:
+            keys = self._tags[tag]
+            keys.discard(key)
+
+            if not keys:
+                del self._tags[tag]
+
+
+def _size(value: Any) -> int:
+    if isinstance(value, (bytes, bytearray)):
+        return len(value)
+
+    if isinstance(value, list):
+        return sum(_size(item) for item in value)
+
+    return getattr(value, "nbytes", 0)
@@ -1,32 +1,108 @@
+import inspect
+import os
+import tempfile
+import time
+import uuid
 import weakref
+from contextlib import contextmanager
+from contextvars import ContextVar
 from pathlib import Path
-from typing import Any, Generic, List, Type, TypeVar, Union
+from typing import Any, Callable, Generic, Iterator, List, Type, TypeVar
 
 import gevent  # type: ignore
+import orjson
 from gevent import monkey  # type: ignore
+from gevent.event import AsyncResult  # type: ignore
 from gevent.greenlet import Greenlet  # type: ignore
+from gevent.lock import Semaphore  # type: ignore
+from gevent.pool import Pool  # type: ignore
+from gevent.queue import Queue  # type: ignore
 from loguru import logger
 
+from .caches import MAX_AGE_HEADER, TTLCache
+from .deadlines import (
+    BUDGET_HEADER,
+    DEADLINE_HEADER,
+    deadline_scope,
+    get_deadline,
+    parse_deadline,
+)
 from .docs import generate_docs_for_service, get_paths, start_docs_server
 from .events import _REGISTERED_EVENT_HANDLERS
-from .exceptions import ContainerStopped
+from .exceptions import (
+    CallInterrupted,
+    ContainerStopped,
+    DeadlineExceeded,
+    MethodNotFound,
+    Overloaded,
+    RemoteError,
+)
+from .executors import PROCESS, THREAD, ExecutorPools
 from .handlers import BaseRemoteErrorHandler, RemoteErrorHandler
-from .protocols import RPCProtocol
+from .middlewares import Handler, Middleware, compose
+from .protocols import (
+    BATCH_METHOD,
+    CORRELATION_HEADER,
+    SERIALIZER_HEADER,
+    RPCProtocol,
+    is_batch_call,
+)
 from .proxies import ServiceProxy
-from .rpc import _REGISTERED_METHODS
-from .serializers import ORJSONSerializer
-from .servers import ZeroMQRPCServer, ZeroMQSubscribeServer
+from .rpc import get_rpc_options, is_rpc_method
+from .serializers import BaseSerializer, ORJSONSerializer
+from .servers import ZeroMQBroker, ZeroMQRPCServer, ZeroMQSubscribeServer
 from .services import ServiceInterface
-from .transports import TCP, ProtocolType
-from .validations import validate_or_ignore
+from .shm import get_segment_pool
+from .streams import (
+    CANCEL_METHOD,
+    CHUNK_METHOD,
+    CONTROL_METHODS,
+    CREDIT_HEADER,
+    END_HEADER,
+    STREAM_HEADER,
+    STREAM_TIMEOUT,
+    STREAM_WINDOW,
+    UPLOAD_HEADER,
+    WINDOW_HEADER,
+    HeldStream,
+    StreamCredit,
+    Upload,
+    is_stream,
+)
+from .supervisors import ProcessSupervisor
+from .transports import (
+    IPC,
+    TCP,
+    Address,
+    Frames,
+    ProtocolType,
+    build_url,
+    get_pool,
+)
+from .validations import get_coercer, get_validator
 
 monkey.patch_all()
 
+# Headers set per request, not per caller, left out of keys of calls.
+_REQUEST_HEADERS = (DEADLINE_HEADER, BUDGET_HEADER, CORRELATION_HEADER)
+
+# Key of the call being processed by the current greenlet, if calls of its
+# method are coalesced or cached.
+_CALL_KEY: ContextVar[tuple | None] = ContextVar("call_key", default=None)
+
+
+@contextmanager
+def _key_scope(key: tuple | None) -> Iterator[None]:
+    token = _CALL_KEY.set(key)
+
+    try:
+        yield
+    finally:
+        _CALL_KEY.reset(token)
+
 T = TypeVar("T")
 _SI = TypeVar("_SI", bound=ServiceInterface)
 
-Address = Union[str, Path]
-
 
 class Container(Generic[_SI]):
     """
@@ -34,48 +110,167 @@ class Container(Generic[_SI]):
 
     :param service_class: Service class implementing the ServiceInterface.
     :type service_class: Type[ServiceInterface]
+
+    :param error_callback: Handler converting errors to responses.
+    :type error_callback: Type[BaseRemoteErrorHandler]
+
+    :param serializer: Default serializer of the service, used if the
+        service doesn't define its own protocol. Requests encoded with
+        other registered serializers are still accepted.
+    :type serializer: BaseSerializer, optional
+
+    :param middlewares: Middlewares wrapping every RPC method, the first
+        one is the outermost.
+    :type middlewares: list[Middleware], optional
+
+    :param thread_pools: Number of threads by pool name, for methods
+        decorated with ``@rpc(executor="thread")``.
+    :type thread_pools: dict[str, int], optional
+
+    :param process_pools: Number of processes by pool name, for methods
+        decorated with ``@rpc(executor="process")``.
+    :type process_pools: dict[str, int], optional
+
+    :param max_queue: Maximum number of requests queued or being processed
+        by the container, requests over it are rejected right away with the
+        Overloaded error.
+    :type max_queue: int, optional
+
+    :param hwm: High water mark of the RPC server socket.
+    :type hwm: int, optional
+
+    :param batch_concurrency: Maximum number of calls of one batch run at
+        once.
+    :type batch_concurrency: int, optional
+
+    :param stream_timeout: Seconds a generator method waits for the caller
+        to grant credit for more items before the stream is dropped, and a
+        method receiving an upload waits for the next chunk.
+    :type stream_timeout: float, optional
     """
 
     def __init__(
         self,
         service_class: Type[_SI],
         error_callback: Type[BaseRemoteErrorHandler] = RemoteErrorHandler,
+        serializer: BaseSerializer | None = None,
+        middlewares: list[Middleware] | None = None,
+        thread_pools: dict[str, int] | None = None,
+        process_pools: dict[str, int] | None = None,
+        max_queue: int | None = None,
+        hwm: int | None = None,
+        batch_concurrency: int = 10,
+        stream_timeout: float = STREAM_TIMEOUT,
     ):
         self._service_class = service_class
+        self._serializer = serializer or ORJSONSerializer()
+        self._middlewares = middlewares or []
+        self._handlers: dict[str, Handler] = {}
+        self._priorities: dict[str, int] = {}
+        self._bulkheads: dict[str, Semaphore] = {}
+        self._coalesced: set[str] = set()
+        self._caches: dict[str, TTLCache] = {}
+        self._max_ages: dict[str, float] = {}
+        self._coalesced_calls: dict[
+            tuple, tuple[AsyncResult, float | None]
+        ] = {}
+        self._thread_pools = thread_pools
+        self._process_pools = process_pools
+        self._executors: ExecutorPools | None = None
+        self._max_queue = max_queue
+        self._hwm = hwm
+        self._batch_concurrency = batch_concurrency
+        self._stream_timeout = stream_timeout
+        self._shared_memory = False
+        self._streams: dict[str, StreamCredit] = {}
+        self._uploads: dict[str, Upload] = {}
         self._service: _SI | None = None
         self._error_callback = error_callback
         self._rpc_server: weakref.ref[ZeroMQRPCServer] | None = None
         self._event_servers: list[weakref.ref[ZeroMQSubscribeServer]] = []
+        self._supervisor: ProcessSupervisor | None = None
+        self._broker: ZeroMQBroker | None = None
         self.modules: list[str | Path] = []
 
+    def __getstate__(self) -> dict[str, Any]:
+        """
+        Pickle only the container configuration, runtime state is created
+        again in the worker process.
+        """
+        state = self.__dict__.copy()
+        state.update(
+            _service=None,
+            _handlers={},
+            _priorities={},
+            _bulkheads={},
+            _coalesced=set(),
+            _caches={},
+            _max_ages={},
+            _coalesced_calls={},
+            _streams={},
+            _uploads={},
+            _executors=None,
+            _rpc_server=None,
+            _event_servers=[],
+            _supervisor=None,
+            _broker=None,
+        )
+        return state
+
     def run(
         self,
-        host: str,
-        port: int,
-        event_host: str | None = None,
+        host: Address,
+        port: int | None = None,
+        event_host: Address | None = None,
         event_port: int | None = None,
         workers: int = 1,
         protocol: ProtocolType = TCP,
         events_protocol: ProtocolType = TCP,
         is_debug: bool = False,
         through_broker: bool = False,
+        processes: int = 1,
+        shared_memory: bool | None = None,
     ) -> None:
         """
         Initialize and run the service.
 
-        :param host: RPC host.
-        :param port: RPC port.
-        :param event_host: Event host (optional).
+        :param host: RPC host, or the socket path for IPC.
+        :param port: RPC port, not used for IPC.
+        :param event_host: Event host, or the socket path for IPC
+            (optional).
         :param event_port: Event port (optional).
-        :param workers: Number of worker threads.
+        :param workers: Number of requests processed concurrently.
         :param protocol: RPC protocol.
         :param events_protocol: Events protocol.
         :param is_debug: Debug flag.
         :param through_broker: Use broker or not.
+        :param processes: Number of worker processes sharing the endpoint.
+        :param shared_memory: Read frames callers send through shared
+            memory and reply large frames the same way. Enabled for IPC
+            endpoints by default, enable it for other endpoints only if
+            they are reached by trusted processes of the same host.
         """
+        if shared_memory is None:
+            shared_memory = protocol == IPC
+
+        if processes > 1:
+            return self._run_processes(
+                host,
+                port,
+                processes,
+                event_host=event_host,
+                event_port=event_port,
+                workers=workers,
+                protocol=protocol,
+                events_protocol=events_protocol,
+                is_debug=is_debug,
+                shared_memory=shared_memory,
+            )
+
         self.init()
+        self._shared_memory = shared_memory
 
-        if event_host and event_port:
+        if event_host:
             self.subscribe(
                 event_host,
                 event_port,
@@ -91,12 +286,75 @@ class Container(Generic[_SI]):
             protocol=protocol,
             callback=self._callback,
             through_broker=through_broker,
+            max_queue=self._max_queue,
+            overload_callback=self._callback_overload,
+            error_callback=self._callback_error,
+            hwm=self._hwm,
+            priority_callback=(
+                self._callback_priority if self._priorities else None
+            ),
+            control_callback=self._callback_control,
+            shared_memory=shared_memory,
         )
 
         self._rpc_server = weakref.ref(server)
 
         server.run()
 
+    def _run_processes(
+        self,
+        host: Address,
+        port: int | None,
+        processes: int,
+        event_host: Address | None = None,
+        event_port: int | None = None,
+        workers: int = 1,
+        protocol: ProtocolType = TCP,
+        events_protocol: ProtocolType = TCP,
+        is_debug: bool = False,
+        shared_memory: bool = False,
+    ) -> None:
+        """
+        Run the service in several processes behind one endpoint. The
+        current process binds the endpoint and forwards requests to the
+        worker processes over IPC, restarting workers that crash.
+        """
+        backend = os.path.join(
+            tempfile.gettempdir(), f"noneapi-{uuid.uuid4().hex}.ipc"
+        )
+
+        self._broker = ZeroMQBroker(
+            frontend=build_url(protocol, host, port),
+            backend=build_url(IPC, backend, None),
+        )
+        self._supervisor = ProcessSupervisor(
+            target=_run_worker_process,
+            processes=processes,
+            args=(
+                self,
+                backend,
+                event_host,
+                event_port,
+                workers,
+                events_protocol,
+                is_debug,
+                shared_memory,
+            ),
+        )
+
+        broker = Greenlet(self._broker.run)
+        broker.start()
+
+        try:
+            self._supervisor.run()
+        finally:
+            self._supervisor.stop()
+            self._broker.stop()
+            broker.join()
+
+            if os.path.exists(backend):
+                os.remove(backend)
+
     def init(self) -> ServiceInterface:
         """
         Initialize the protocol.
@@ -105,15 +363,47 @@ class Container(Generic[_SI]):
         """
 
         service = self._service_class()
-        protocol: RPCProtocol[ORJSONSerializer] | None = getattr(
-            service, "protocol", None
-        )
+        protocol: RPCProtocol | None = getattr(service, "protocol", None)
 
         if not protocol:
-            protocol = RPCProtocol(ORJSONSerializer())
+            protocol = RPCProtocol(self._serializer)
             setattr(service, "protocol", protocol)
 
         self._service = service
+        self._executors = ExecutorPools(
+            self._service_class, self._thread_pools, self._process_pools
+        )
+        self._handlers = {
+            method_name: self._build_handler(
+                method_name, getattr(service, method_name)
+            )
+            for method_name in self._get_rpc_methods()
+        }
+        self._priorities = {}
+        self._coalesced = set()
+        self._caches = {}
+        self._max_ages = {}
+
+        for method_name in self._handlers:
+            options = get_rpc_options(getattr(service, method_name))
+
+            if options.priority:
+                self._priorities[method_name] = options.priority
+
+            if options.coalesce:
+                self._coalesced.add(method_name)
+
+            if options.cache is not None:
+                self._caches[method_name] = options.cache
+
+            if options.max_age:
+                self._max_ages[method_name] = options.max_age
+
+        for proxy in self._get_service_proxies():
+            if proxy._host:
+                get_pool().connect(
+                    proxy._host, proxy._port, proxy._protocol_type
+                )
 
         return service
 
@@ -121,9 +411,16 @@ class Container(Generic[_SI]):
         """
         Stop the service.
         """
+        if self._supervisor:
+            self._supervisor.stop()
+            return None
+
         if not self._service or not self._rpc_server:
             raise ContainerStopped("Container is not running")
 
+        if self._executors:
+            self._executors.close()
+
         if self._rpc_server:
             server = self._rpc_server()
 
@@ -138,8 +435,8 @@ class Container(Generic[_SI]):
 
     def subscribe(
         self,
-        host: str,
-        port: int,
+        host: Address,
+        port: int | None,
         protocol: ProtocolType = TCP,
         workers: int = 1,
         is_debug: bool = False,
@@ -148,8 +445,8 @@ class Container(Generic[_SI]):
         """
         Subscribe the service to events.
 
-        :param host: Subscription host.
-        :param port: Subscription port.
+        :param host: Subscription host, or the socket path for IPC.
+        :param port: Subscription port, not used for IPC.
         :param protocol: Subscription protocol.
         :param workers: Number of worker threads.
         :param is_debug: Debug flag.
@@ -157,16 +454,16 @@ class Container(Generic[_SI]):
         """
         assert self._service, "Service is not initialized"
 
-        services = [
-            service
-            for service in self._service.__class__.__dict__.values()
-            if isinstance(service, ServiceProxy)
-        ]
+        services = self._get_service_proxies()
 
         service_publishers = {
             service._name: (service._event_host, service._event_port)  # type: ignore  # noqa
             for service in services
-            if service._event_host and service._event_port  # type: ignore  # noqa
+            if service._event_host  # type: ignore
+        }
+
+        cache_topics = {
+            topic for cache in self._get_caches() for topic in cache.topics
         }
 
         for publisher_name in service_publishers.keys():
@@ -175,6 +472,12 @@ class Container(Generic[_SI]):
                 for key in _REGISTERED_EVENT_HANDLERS
                 if key[0] == publisher_name
             ]
+            topics.extend(
+                topic
+                for topic in sorted(cache_topics)
+                if topic.startswith(f"{publisher_name}:")
+                and topic not in topics
+            )
 
             if not topics:
                 continue
@@ -194,37 +497,801 @@ class Container(Generic[_SI]):
 
             Greenlet(server.run).start()
 
-    def _callback(self, data: bytes) -> bytes | None:
+    def _get_rpc_methods(self) -> list[str]:
+        """
+        Get names of RPC methods of the service class, including inherited
+        ones.
+        """
+        return [
+            name
+            for name in dir(self._service_class)
+            if is_rpc_method(inspect.getattr_static(self._service_class, name))
+        ]
+
+    def _build_handler(self, method_name: str, method: Any) -> Handler:
+        """
+        Build handler of the RPC method: validation, middlewares and error
+        handling composed into one callable. Stages that aren't needed are
+        left out.
+
+        :param method_name: Name of the method.
+        :param method: Bound method of the service.
+        :return: Handler
         """
-        Internal callback for RPC calls.
 
-        :param data: Incoming data.
+        options = get_rpc_options(method)
+        executors = self._executors
+
+        if options.executor == THREAD:
+            def call(args: Any, kwargs: Any, headers: Any) -> Any:
+                return executors.run_in_thread(
+                    options.pool, method, args, kwargs
+                )
+        elif options.executor == PROCESS:
+            def call(args: Any, kwargs: Any, headers: Any) -> Any:
+                return executors.run_in_process(
+                    options.pool, method_name, args, kwargs
+                )
+        else:
+            def call(args: Any, kwargs: Any, headers: Any) -> Any:
+                return method(*args, **kwargs)
+
+        handler: Handler = call
+
+        if options.coerce:
+            coercer = get_coercer(method)
+
+            if coercer:
+                def call_coerced(args: Any, kwargs: Any, headers: Any) -> Any:
+                    args, kwargs = coercer(*args, **kwargs)
+                    return call(args, kwargs, headers)
+
+                handler = call_coerced
+        else:
+            validator = get_validator(method)
+
+            if validator:
+                def call_validated(
+                    args: Any, kwargs: Any, headers: Any
+                ) -> Any:
+                    validator(*args, **kwargs)
+                    return call(args, kwargs, headers)
+
+                handler = call_validated
+
+        if options.max_concurrency:
+            bulkhead = self._bulkheads[method_name] = Semaphore(
+                options.max_concurrency
+            )
+            handler = self._limit_concurrency(handler, bulkhead)
+
+        if options.max_inflight:
+            handler = self._limit_inflight(
+                method_name, handler, options.max_inflight
+            )
+
+        if options.coalesce:
+            handler = self._coalesce(method_name, handler)
+
+        handler = compose(method_name, handler, self._middlewares)
+        error_callback = self._error_callback
+
+        def handle(args: Any, kwargs: Any, headers: Any) -> Any:
+            try:
+                return handler(args, kwargs, headers)
+            except Exception as e:
+                return error_callback().handle_exception(e)
+
+        return handle
+
+    def _get_caches(self) -> list[TTLCache]:
+        """
+        Get caches of RPC methods and of service proxies, invalidated by
+        events.
+        """
+        caches = list(self._caches.values())
+        caches.extend(
+            proxy._cache
+            for proxy in self._get_service_proxies()
+            if proxy._cache is not None
+        )
+
+        return caches
+
+    def _get_service_proxies(self) -> list[ServiceProxy]:
+        """
+        Get service proxies declared on the service class.
+        """
+        return [
+            service
+            for service in self._service_class.__dict__.values()
+            if isinstance(service, ServiceProxy)
+        ]
+
+    def _callback(
+        self, frames: Frames
+    ) -> bytes | Frames | Iterator[Frames] | Greenlet | None:
+        """
+        Internal callback for RPC calls. The request is routed and its
+        deadline is checked by the header frame, the body is parsed only
+        if the call is going to be processed. Calls of a method without a
+        free slot are processed in their own greenlet.
+
+        :param frames: Incoming request frames.
         :return: Response data.
         """
         if not self._service:
             logger.warning("Service is not initialized")
             return None
 
-        (
-            method,
-            args,
-            kwargs,
-        ) = self._service.protocol.parse_call(data)
-        full_method_name = f"{self._service.__class__.__name__}.{method}"
+        protocol = self._service.protocol
+        serializer = None
+
+        try:
+            if len(frames) == 1:
+                method, args, kwargs, headers = protocol.parse_request(
+                    frames
+                )
+            else:
+                args, kwargs = (), {}
+                method, serializer, headers = protocol.parse_header(
+                    frames[0]
+                )
+        except Exception as e:
+            logger.warning(f"Rejecting malformed request: {e}")
+            return self._error_response(e)
+
+        if method in CONTROL_METHODS:
+            self._control_stream(method, headers, frames, serializer)
+            return None
+
+        handler = self._handlers.get(method)
+
+        if handler is None and method != BATCH_METHOD:
+            return self._error_response(
+                MethodNotFound(f"Method {method} is not found"), serializer
+            )
+
+        deadline = parse_deadline(headers)
+
+        if deadline is not None and deadline <= time.time():
+            logger.debug(f"Dropping {method} call, deadline exceeded")
+            return self._error_response(
+                DeadlineExceeded(f"Deadline of {method} exceeded"), serializer
+            )
+
+        if handler is None:
+            return self._call_batch(
+                frames, args, headers, serializer, deadline
+            )
+
+        cache = None
+        key = None
+
+        if (
+            len(frames) > 1
+            and STREAM_HEADER not in headers
+            and UPLOAD_HEADER not in headers
+        ):
+            cache = self._caches.get(method)
+
+            if cache is not None or method in self._coalesced:
+                key = self._call_key(method, serializer, frames, headers)
+
+        if cache is not None:
+            response = cache.get(key)
+
+            if response is not None:
+                return response
+
+        call = (
+            method, handler, frames, args, kwargs, headers, serializer,
+            deadline, cache, key,
+        )
+
+        bulkhead = self._bulkheads.get(method)
+
+        if bulkhead is not None and bulkhead.locked():
+            # Wait for a free slot of the method without holding a worker,
+            # so calls of other methods aren't starved.
+            return gevent.spawn(self._call, *call)
+
+        return self._call(*call)
+
+    @staticmethod
+    def _call_key(
+        method: str, serializer: str | None, frames: Frames, headers: dict
+    ) -> tuple:
+        """
+        Key of the call for caches and coalescing: the method, serializer,
+        raw body and the headers of the caller, except the deadline and
+        correlation id of the request. Calls of different callers, e.g.
+        with different auth tokens, don't share responses, so middlewares
+        checking headers apply to every caller.
+        """
+        key = (method, serializer, *map(bytes, frames[1:]))
+        caller = {
+            name: value
+            for name, value in headers.items()
+            if name not in _REQUEST_HEADERS
+        }
+
+        if caller:
+            key += (orjson.dumps(caller, option=orjson.OPT_SORT_KEYS),)
+
+        return key
+
+    def _call(
+        self,
+        method: str,
+        handler: Handler,
+        frames: Frames,
+        args: Any,
+        kwargs: Any,
+        headers: dict,
+        serializer: str | None,
+        deadline: float | None,
+        cache: TTLCache | None = None,
+        key: tuple | None = None,
+    ) -> bytes | Frames | Iterator[Frames]:
+        """
+        Parse the request body if it wasn't parsed yet, call the handler and
+        build the response. Successful responses are cached if the method
+        has a cache and tagged with ``max_age`` for client caches if the
+        method has it. Results of generator methods are streamed if the
+        caller asked for it and replied as a list otherwise. Uploads are
+        passed to the method as its first argument.
+        """
+        assert self._service, "Service is not initialized"
+
+        protocol = self._service.protocol
+
+        if len(frames) > 1:
+            try:
+                args, kwargs = protocol.parse_body(
+                    frames[1], serializer, frames[2:]
+                )
+            except Exception as e:
+                return self._error_response(e, serializer)
+
+        if UPLOAD_HEADER in headers:
+            return self._upload(
+                handler, args, kwargs, headers, serializer, deadline
+            )
+
+        with deadline_scope(deadline), _key_scope(key):
+            result = handler(args, kwargs, headers)
+
+            if is_stream(result):
+                if STREAM_HEADER in headers:
+                    return self._stream(result, headers, serializer)
+
+                result = self._collect(result)
+
+        response: bytes | Frames = protocol.build_response(
+            result=result, serializer=serializer
+        )
+
+        if RemoteError.is_remote_error(result):
+            return response
+
+        max_age = self._max_ages.get(method)
+
+        if max_age:
+            response = protocol.build_reply(
+                response, {MAX_AGE_HEADER: max_age}
+            )
+
+        if cache is not None:
+            try:
+                cache.set(key, response, args, kwargs)
+            except Exception as e:
+                logger.exception(f"Failed to cache response of {method}: {e}")
+
+        return response
+
+    def _call_batch(
+        self,
+        frames: Frames,
+        calls: Any,
+        headers: dict,
+        serializer: str | None,
+        deadline: float | None,
+    ) -> bytes | Frames:
+        """
+        Run a batch of calls, at most ``batch_concurrency`` at once, and
+        reply with the list of their results. Malformed calls get an error
+        in place of their result, like calls of unknown methods.
+        """
+        assert self._service, "Service is not initialized"
+
+        protocol = self._service.protocol
+
+        if len(frames) > 1:
+            try:
+                calls, _ = protocol.parse_body(
+                    frames[1], serializer, frames[2:]
+                )
+            except Exception as e:
+                return self._error_response(e, serializer)
+
+        if not isinstance(calls, (list, tuple)):
+            return self._error_response(
+                TypeError("Batch must be a list of calls"), serializer
+            )
+
+        def call(batch_call: Any) -> Any:
+            if not is_batch_call(batch_call):
+                return self._error_callback().handle_exception(
+                    TypeError(
+                        "Batch call must be [method, args, kwargs], "
+                        f"got {batch_call!r}"
+                    )
+                )
+
+            method, args, kwargs = batch_call
+            handler = self._handlers.get(method)
+
+            if handler is None:
+                return self._error_callback().handle_exception(
+                    MethodNotFound(f"Method {method} is not found")
+                )
+
+            with deadline_scope(deadline):
+                result = handler(args, kwargs, headers)
+
+                return self._collect(result) if is_stream(result) else result
+
+        if self._batch_concurrency > 1 and len(calls) > 1:
+            results = Pool(self._batch_concurrency).map(call, calls)
+        else:
+            results = [call(batch_call) for batch_call in calls]
+
+        return protocol.build_response(result=results, serializer=serializer)
+
+    def _stream(
+        self, items: Iterator, headers: dict, serializer: str | None
+    ) -> Iterator[Frames]:
+        """
+        Stream items of the generator method one reply per item, while the
+        caller grants credit for them. The stream is finished by the reply
+        holding null or the error, and dropped without it if the caller
+        cancels it or doesn't grant credit for ``stream_timeout`` seconds.
+        """
+        assert self._service, "Service is not initialized"
+
+        protocol = self._service.protocol
+        stream_id = headers[STREAM_HEADER]
+        credit = self._streams[stream_id] = StreamCredit(
+            int(headers.get(WINDOW_HEADER, STREAM_WINDOW))
+        )
+        result = None
+
+        try:
+            while True:
+                if not credit.take(self._stream_timeout):
+                    logger.debug(f"Stream {stream_id} is dropped")
+                    return None
+
+                try:
+                    item = next(items)
+                except StopIteration:
+                    break
+
+                yield protocol.build_stream_reply(
+                    protocol.build_response(result=item, serializer=serializer)
+                )
+        except Exception as e:
+            result = self._error_callback().handle_exception(e)
+        finally:
+            del self._streams[stream_id]
+
+            close = getattr(items, "close", None)
+
+            if close:
+                close()
+
+        yield protocol.build_stream_reply(
+            protocol.build_response(result=result, serializer=serializer),
+            end=True,
+        )
+
+    def _upload(
+        self,
+        handler: Handler,
+        args: Any,
+        kwargs: Any,
+        headers: dict,
+        serializer: str | None,
+        deadline: float | None,
+    ) -> Iterator[Frames]:
+        """
+        Call the method with the iterator over chunks uploaded by the
+        caller. The method runs in its own greenlet, while credit for more
+        chunks is replied to the caller as the method consumes them. The
+        response of the method is the last reply.
+        """
+        assert self._service, "Service is not initialized"
+
+        protocol = self._service.protocol
+        upload_id = headers[UPLOAD_HEADER]
+        replies = Queue()
+
+        def grant(credit: int) -> None:
+            replies.put((protocol.build_credit_reply(credit), False))
+
+        def parse(frames: Frames, chunk_serializer: str | None) -> Any:
+            (chunk,), _ = protocol.parse_body(
+                frames[0], chunk_serializer, frames[1:]
+            )
+            return chunk
+
+        upload = self._uploads[upload_id] = Upload(
+            int(headers.get(WINDOW_HEADER, STREAM_WINDOW)),
+            self._stream_timeout,
+            grant,
+            parse,
+        )
+
+        def call() -> None:
+            try:
+                with deadline_scope(deadline):
+                    result = handler([upload, *args], kwargs, headers)
+
+                    if is_stream(result):
+                        result = self._collect(result)
+
+                response = protocol.build_response(
+                    result=result, serializer=serializer
+                )
+            except Exception as e:
+                response = self._error_response(e, serializer)
+
+            replies.put((response, True))
+
+        greenlet = gevent.spawn(call)
+
+        try:
+            while True:
+                reply, is_last = replies.get()
+                yield reply
+
+                if is_last:
+                    break
+        finally:
+            greenlet.kill()
+            del self._uploads[upload_id]
+
+    def _collect(self, items: Iterator) -> Any:
+        """
+        Collect items of the generator method called without streaming.
+        """
+        try:
+            return list(items)
+        except Exception as e:
+            return self._error_callback().handle_exception(e)
+
+    def _control_stream(
+        self,
+        method: str,
+        headers: dict,
+        frames: Frames,
+        serializer: str | None,
+    ) -> None:
+        """
+        Grant credit to the stream, add a chunk to the upload, or cancel
+        either of them. Messages of finished streams are dropped.
+
+        :param method: One of ``CONTROL_METHODS``.
+        :param headers: Headers of the control message.
+        :param frames: Frames of the control message.
+        :param serializer: Name of the serializer of the message body.
+        """
+        stream_id = headers.get(STREAM_HEADER)
+        upload = self._uploads.get(stream_id)  # type: ignore
+        credit = self._streams.get(stream_id)  # type: ignore
+
+        if upload is not None and method == CHUNK_METHOD:
+            if headers.get(END_HEADER):
+                upload.end()
+            else:
+                chunk = frames[1:]
+
+                if self._shared_memory:
+                    chunk = get_segment_pool().attach(chunk)
+
+                upload.put(chunk, serializer)
+        elif upload is not None and method == CANCEL_METHOD:
+            upload.cancel()
+        elif credit is not None and method == CANCEL_METHOD:
+            credit.cancel()
+        elif credit is not None:
+            credit.grant(int(headers.get(CREDIT_HEADER, 0)))
+
+    @staticmethod
+    def _limit_inflight(
+        method_name: str, handler: Handler, max_inflight: int
+    ) -> Handler:
+        """
+        Reject calls of the method over ``max_inflight`` with the Overloaded
+        error. Streamed calls are in flight until their stream ends.
+        """
+        in_flight = 0
+
+        def release() -> None:
+            nonlocal in_flight
+
+            in_flight -= 1
+
+        def limited(args: Any, kwargs: Any, headers: Any) -> Any:
+            nonlocal in_flight
+
+            if in_flight >= max_inflight:
+                raise Overloaded(
+                    f"Method {method_name} has {in_flight} calls in flight"
+                )
+
+            in_flight += 1
+
+            return Container._hold(handler, args, kwargs, headers, release)
+
+        return limited
+
+    @staticmethod
+    def _limit_concurrency(handler: Handler, semaphore: Semaphore) -> Handler:
+        """
+        Process at most as many calls of the method at once as the
+        semaphore allows, other calls wait for a free slot. Calls arriving
+        while all slots are taken wait in their own greenlet, see
+        ``_callback``, so they don't hold workers of the server. Streamed
+        calls hold their slot until their stream ends.
+        """
+
+        def limited(args: Any, kwargs: Any, headers: Any) -> Any:
+            semaphore.acquire()
+
+            return Container._hold(
+                handler, args, kwargs, headers, semaphore.release
+            )
+
+        return limited
+
+    @staticmethod
+    def _hold(
+        handler: Handler,
+        args: Any,
+        kwargs: Any,
+        headers: Any,
+        release: Callable[[], None],
+    ) -> Any:
+        """
+        Call the handler and release the resource taken for the call when
+        it returns or, for generator methods, when the stream ends.
+        """
+        try:
+            result = handler(args, kwargs, headers)
+        except BaseException:
+            release()
+            raise
+
+        if is_stream(result):
+            return HeldStream(result, release)
+
+        release()
+
+        return result
+
+    def _coalesce(self, method_name: str, handler: Handler) -> Handler:
+        """
+        Share one execution between identical calls in flight, matched by
+        the key of the call, see ``_call_key``. The first call is
+        processed, others wait for its result, each up to its own
+        deadline. The stage runs inside middlewares, so every call is
+        checked by them before it gets the shared result.
+        """
+
+        def coalesced(args: Any, kwargs: Any, headers: Any) -> Any:
+            key = _CALL_KEY.get()
+
+            if key is None:
+                return handler(args, kwargs, headers)
+
+            shared = self._coalesced_calls.get(key)
+
+            if shared is None:
+                return self._lead_coalesced(
+                    key, method_name, handler, args, kwargs, headers
+                )
+
+            leader, leader_deadline = shared
+            deadline = get_deadline()
+            timeout = None
+
+            if deadline is not None:
+                timeout = max(deadline - time.time(), 0)
+
+            leader.wait(timeout)
+
+            if not leader.ready():
+                raise DeadlineExceeded(f"Deadline of {method_name} exceeded")
+
+            # The first call finished after its deadline, so its result is
+            # likely DeadlineExceeded, calls with a later deadline are
+            # processed again instead of inheriting it.
+            if (
+                leader_deadline is not None
+                and leader_deadline <= time.time()
+                and (deadline is None or deadline > leader_deadline)
+            ):
+                return coalesced(args, kwargs, headers)
+
+            return leader.get()
+
+        return coalesced
+
+    def _lead_coalesced(
+        self,
+        key: tuple,
+        method_name: str,
+        handler: Handler,
+        args: Any,
+        kwargs: Any,
+        headers: Any,
+    ) -> Any:
+        """
+        Process the first of coalesced calls and share its result with the
+        calls waiting for it. Items of generator methods are collected, so
+        every call gets all of them. If the call is killed, waiting calls
+        fail with CallInterrupted.
+        """
+        leader = AsyncResult()
+        self._coalesced_calls[key] = (leader, get_deadline())
+
+        try:
+            result = handler(args, kwargs, headers)
+
+            if is_stream(result):
+                result = list(result)
+        except Exception as e:
+            leader.set_exception(e)
+            raise
+        except BaseException:
+            leader.set_exception(
+                CallInterrupted(f"Call of {method_name} is interrupted")
+            )
+            raise
+        finally:
+            del self._coalesced_calls[key]
+
+        leader.set(result)
+
+        return result
+
+    def _callback_priority(self, frames: Frames) -> int:
+        """
+        Internal callback returning priority of the RPC call.
+
+        :param frames: Incoming request frames.
+        :return: Priority of the called method.
+        """
+        if not self._service or len(frames) == 1:
+            return 0
+
+        protocol = self._service.protocol
+        method = protocol.peek_method(frames[0])
+
+        if method is None:
+            method, _, _ = protocol.parse_header(frames[0])
+
+        return self._priorities.get(method, 0)
+
+    def _callback_control(self, frames: Frames) -> bool:
+        """
+        Internal callback for control messages of streams and uploads,
+        handled by the RPC server as they arrive. Other messages are told
+        apart by the method name only, their header is parsed once, by
+        ``_callback``.
+
+        :param frames: Incoming message frames.
+        :return: True if the message was handled.
+        """
+        if not self._service or len(frames) == 1:
+            return False
+
+        protocol = self._service.protocol
+
+        if protocol.peek_method(frames[0]) not in (None, *CONTROL_METHODS):
+            return False
+
+        method, serializer, headers = protocol.parse_header(frames[0])
+
+        if method not in CONTROL_METHODS:
+            return False
+
+        self._control_stream(method, headers, frames, serializer)
+
+        return True
+
+    def _callback_overload(self, frames: Frames) -> bytes | None:
+        """
+        Internal callback for requests rejected by the RPC server.
+
+        :param frames: Incoming request frames.
+        :return: Response data.
+        """
+        if not self._service:
+            return None
+
+        serializer = None
+
+        if len(frames) > 1:
+            _, serializer, _ = self._service.protocol.parse_header(frames[0])
+
+        return self._error_response(
+            Overloaded("Service is overloaded"), serializer
+        )
+
+    def _callback_error(
+        self, frames: Frames, error: Exception
+    ) -> bytes | Frames | None:
+        """
+        Internal callback for requests the RPC server can't read, e.g.
+        with shared memory frames while shared memory is disabled.
 
-        if full_method_name not in _REGISTERED_METHODS:
+        :param frames: Incoming request frames.
+        :param error: Reason the request can't be read.
+        :return: Response data.
+        """
+        if not self._service:
             return None
 
-        _method = getattr(self._service, method)
+        serializer = None
+
+        if len(frames) > 1:
+            try:
+                _, serializer, _ = self._service.protocol.parse_header(
+                    frames[0]
+                )
+            except Exception:
+                pass
+
+        return self._error_response(error, serializer)
+
+    def _error_response(
+        self, error: Exception, serializer: str | None = None
+    ) -> bytes | Frames:
+        """
+        Build response for the call rejected before processing. If the
+        serializer of the request isn't available, e.g. it isn't registered
+        or installed, the error is encoded with the serializer of the
+        service and the reply names it in the headers.
+
+        :param error: Reason of rejection.
+        :param serializer: Name of the serializer the request is encoded with.
+        :return: Response data.
+        """
+        assert self._service, "Service is not initialized"
+
+        protocol = self._service.protocol
+        result = self._error_callback().handle_exception(error)
 
         try:
-            validate_or_ignore(_method, *args, **kwargs)
-            result = _method(*args, **kwargs)
+            return protocol.build_response(
+                result=result, serializer=serializer
+            )
         except Exception as e:
-            error_callback = self._error_callback()
-            result = error_callback.handle_exception(e)
+            if serializer is None:
+                raise
 
-        return self._service.protocol.build_response(result=result)
+            logger.warning(
+                f"Serializer {serializer} is not available, "
+                f"replying with {protocol.serializer_name}: {e}"
+            )
+
+        return protocol.build_reply(
+            protocol.build_response(result=result),
+            {SERIALIZER_HEADER: protocol.serializer_name},
+        )
 
     def _callback_event(self, topic: bytes, payload: bytes) -> None:
         """
@@ -243,12 +1310,49 @@ class Container(Generic[_SI]):
 
         msg = self._service.protocol.parse_event(payload)
 
+        for cache in self._get_caches():
+            try:
+                cache.invalidate_event(f"{service_name}:{string_topic}", msg)
+            except Exception as e:
+                logger.exception(f"Failed to invalidate cache: {e}")
+
         if key not in _REGISTERED_EVENT_HANDLERS.keys():
             return None
 
         _REGISTERED_EVENT_HANDLERS[key](self._service, msg)
 
 
+def _run_worker_process(
+    container: Container,
+    backend: str,
+    event_host: Address | None,
+    event_port: int | None,
+    workers: int,
+    events_protocol: ProtocolType,
+    is_debug: bool,
+    shared_memory: bool,
+    index: int,
+) -> None:
+    """
+    Entry point of a worker process started by ``Container.run``. Only the
+    first worker subscribes to events, so every event is handled once.
+    """
+    if index:
+        event_host = event_port = None
+
+    container.run(
+        host=backend,
+        event_host=event_host,
+        event_port=event_port,
+        workers=workers,
+        protocol=IPC,
+        events_protocol=events_protocol,
+        is_debug=is_debug,
+        through_broker=True,
+        shared_memory=shared_memory,
+    )
+
+
 class SingletonMeta(type, Generic[T]):
     _instances: dict[Type[T], T] = {}
 
@@ -0,0 +1,71 @@
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Iterator
+
+DEADLINE_HEADER = "deadline"
+BUDGET_HEADER = "budget"
+
+_DEADLINE: ContextVar[float | None] = ContextVar("deadline", default=None)
+
+
+def get_deadline() -> float | None:
+    """
+    Get absolute deadline (unix time) of the RPC call being processed by
+    the current greenlet, if any.
+    """
+    return _DEADLINE.get()
+
+
+@contextmanager
+def deadline_scope(deadline: float | None) -> Iterator[None]:
+    """
+    Set the deadline inherited by remote calls made inside the block.
+
+    :param deadline: absolute deadline, unix time.
+    """
+    token = _DEADLINE.set(deadline)
+
+    try:
+        yield
+    finally:
+        _DEADLINE.reset(token)
+
+
+def build_deadline(budget: float) -> float:
+    """
+    Get deadline for a call that may take ``budget`` seconds, limited by
+    the deadline of the call being processed.
+
+    :param budget: seconds the call may take.
+    :return: absolute deadline, unix time.
+    """
+    deadline = time.time() + budget
+    inherited = get_deadline()
+
+    if inherited is not None:
+        return min(deadline, inherited)
+
+    return deadline
+
+
+def parse_deadline(headers: dict) -> float | None:
+    """
+    Get local deadline from request headers. The remaining budget caps the
+    absolute deadline, so a caller with the clock running ahead can't
+    extend it.
+
+    :param headers: request headers.
+    :return: absolute deadline, unix time.
+    """
+    deadline = headers.get(DEADLINE_HEADER)
+
+    if deadline is None:
+        return None
+
+    budget = headers.get(BUDGET_HEADER)
+
+    if budget is not None:
+        return min(deadline, time.time() + budget)
+
+    return deadline
@@ -1,5 +1,7 @@
 from typing import Any, Callable
 
+from .transports import TCP, Address, ProtocolType
+
 _REGISTERED_EVENT_HANDLERS: dict[tuple[str, str], Callable] = {}
 
 
@@ -30,19 +32,29 @@ class EventDispatcher:
     """
     Dispatches events to the relevant services.
 
-    :param host: Host where the event should be dispatched to.
-    :type host: str
+    :param host: Host where the event should be dispatched to, or the
+        socket path for IPC.
+    :type host: str | Path
+
+    :param port: Port where the event should be dispatched to, not used
+        for IPC.
+    :type port: int | None
 
-    :param port: Port where the event should be dispatched to.
-    :type port: int
+    :param protocol: The communication protocol. Defaults to TCP.
+    :type protocol: PROTOCOLS, optional
     """
 
     def __init__(
-            self, host: str, port: int, through_broker: bool = False
+            self,
+            host: Address,
+            port: int | None = None,
+            through_broker: bool = False,
+            protocol: ProtocolType = TCP,
     ) -> None:
         self._host = host
         self._port = port
         self._through_broker = through_broker
+        self._protocol = protocol
 
     def __set_name__(self, owner: Any, name: str) -> None:
         """
@@ -87,5 +99,6 @@ class EventDispatcher:
         key = "{}:{}".format(self._service.name, topic)
         self._service.protocol.dispatch(
             self._host, self._port, key, payload,
+            protocol=self._protocol,
             through_broker=self._through_broker
         )
@@ -43,8 +43,9 @@ class RemoteError(BaseError):
         module = import_module(module_path)
         exc_cls = getattr(module, class_name)
         original_exc = exc_cls(*data["exc_args"])
+        error_cls = _REMOTE_ERRORS.get(data["exc_path"], cls)
 
-        return cls(original_exc, data["value"])
+        return error_cls(original_exc, data["value"])
 
     @staticmethod
     def is_remote_error(data: Any) -> bool:
@@ -69,3 +70,109 @@ class AsyncCallError(BaseError):
     """Raised when the async call is out of context."""
 
     pass
+
+
+class ConnectionClosed(BaseError):
+    """Raised when the connection is closed before the reply arrived."""
+
+    def __init__(self, url: str) -> None:
+        super().__init__(f"Connection to {url} is closed")
+
+
+class RequestTimeout(BaseError):
+    """Raised when the remote endpoint doesn't reply in time."""
+
+    def __init__(
+        self,
+        message: str,
+        url: str | None = None,
+        timeout: float | None = None,
+        attempts: int | None = None,
+    ) -> None:
+        super().__init__(message)
+        self.url = url
+        self.timeout = timeout
+        self.attempts = attempts
+
+    @classmethod
+    def no_reply(
+        cls, url: str, timeout: float | None, attempts: int
+    ) -> "RequestTimeout":
+        """
+        Build the error of the request to ``url`` left without reply.
+        """
+        return cls(
+            f"No reply from {url} in {timeout}s after {attempts} attempt(s)",
+            url=url,
+            timeout=timeout,
+            attempts=attempts,
+        )
+
+
+class UnsupportedEnvelope(BaseError):
+    """Raised when the request is encoded with an unknown envelope version."""
+
+    pass
+
+
+class DeadlineExceeded(BaseError):
+    """Raised when the deadline of the call has passed."""
+
+    pass
+
+
+class MethodNotFound(BaseError):
+    """Raised when the service has no such RPC method."""
+
+    pass
+
+
+class Overloaded(BaseError):
+    """Raised when the service has no capacity to process the call."""
+
+    pass
+
+
+class CallInterrupted(BaseError):
+    """Raised when the shared execution of coalesced calls is killed."""
+
+    pass
+
+
+class StreamInterrupted(BaseError):
+    """Raised when the other side stops the stream before its end."""
+
+    pass
+
+
+class InvalidSegment(BaseError):
+    """
+    Raised when the shared memory handle names a file which isn't a
+    segment of the pool.
+    """
+
+    pass
+
+
+class SegmentExpired(BaseError):
+    """
+    Raised when the shared memory segment of a frame is removed or reused
+    before the frame was read.
+    """
+
+    pass
+
+
+class RemoteOverloaded(RemoteError):
+    """
+    Raised by the client when the remote service rejected the call
+    because it's overloaded. The call wasn't processed, so it's safe to
+    retry it, preferably on another instance.
+    """
+
+    pass
+
+
+_REMOTE_ERRORS: dict[str, type[RemoteError]] = {
+    get_module_path(Overloaded): RemoteOverloaded,
+}
@@ -0,0 +1,164 @@
+import contextvars
+import multiprocessing
+import os
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Any, Callable, Literal, cast
+
+from gevent.event import AsyncResult  # type: ignore
+from gevent.threadpool import ThreadPool  # type: ignore
+
+THREAD = cast(Literal["thread"], "thread")
+PROCESS = cast(Literal["process"], "process")
+
+ExecutorType = Literal["thread", "process"]
+
+DEFAULT_POOL = "default"
+
+_PROCESS_SERVICE: Any = None
+
+
+def _init_process_service(service_class: type) -> None:
+    """
+    Initializer of pool processes, creates the service instance used by
+    all calls in the process.
+    """
+    global _PROCESS_SERVICE
+
+    _PROCESS_SERVICE = service_class()
+
+
+def _call_process_service(
+    method_name: str, args: tuple[Any, ...], kwargs: dict[str, Any]
+) -> Any:
+    return getattr(_PROCESS_SERVICE, method_name)(*args, **kwargs)
+
+
+def wait_future(future: Future) -> Any:
+    """
+    Wait for the future of a concurrent executor without blocking the hub.
+
+    :param future: Future to wait for.
+    :return: Result of the future.
+    """
+    result = AsyncResult()
+
+    def resolve(done: Future) -> None:
+        try:
+            result.set(done.result())
+        except BaseException as e:
+            result.set_exception(e)
+
+    future.add_done_callback(resolve)
+
+    return result.get()
+
+
+class ExecutorPools:
+    """
+    Named pools running blocking or CPU bound RPC methods off the gevent
+    hub, so other requests are served meanwhile.
+
+    Thread pools run the bound method of the container service in native
+    threads. Process pools call the method of a service instance created
+    once per pool process, so the service class must be importable and its
+    arguments and results picklable.
+
+    Pools are created on first use, pools missing in the configuration get
+    the default size.
+
+    :param service_class: Service class to create in pool processes.
+    :type service_class: type
+
+    :param thread_pools: Number of threads by pool name.
+    :type thread_pools: dict[str, int], optional
+
+    :param process_pools: Number of processes by pool name.
+    :type process_pools: dict[str, int], optional
+    """
+
+    DEFAULT_THREADS = 10
+
+    def __init__(
+        self,
+        service_class: type,
+        thread_pools: dict[str, int] | None = None,
+        process_pools: dict[str, int] | None = None,
+    ) -> None:
+        self._service_class = service_class
+        self._thread_sizes = thread_pools or {}
+        self._process_sizes = process_pools or {}
+        self._thread_pools: dict[str, ThreadPool] = {}
+        self._process_pools: dict[str, ProcessPoolExecutor] = {}
+
+    def run_in_thread(
+        self,
+        pool: str,
+        method: Callable,
+        args: tuple[Any, ...],
+        kwargs: dict[str, Any],
+    ) -> Any:
+        """
+        Run the method in the thread pool and wait for the result. The
+        method runs in a copy of the current context, so it sees the
+        deadline of the call.
+
+        :param pool: Name of the pool.
+        :param method: Method to run.
+        :param args: Method args.
+        :param kwargs: Method kwargs.
+        :return: Result of the method.
+        """
+        thread_pool = self._thread_pools.get(pool)
+
+        if thread_pool is None:
+            size = self._thread_sizes.get(pool, self.DEFAULT_THREADS)
+            thread_pool = self._thread_pools[pool] = ThreadPool(size)
+
+        context = contextvars.copy_context()
+
+        return thread_pool.apply(context.run, (method, *args), kwargs)
+
+    def run_in_process(
+        self,
+        pool: str,
+        method_name: str,
+        args: tuple[Any, ...],
+        kwargs: dict[str, Any],
+    ) -> Any:
+        """
+        Run the service method in the process pool and wait for the result.
+
+        :param pool: Name of the pool.
+        :param method_name: Name of the service method.
+        :param args: Method args.
+        :param kwargs: Method kwargs.
+        :return: Result of the method.
+        """
+        process_pool = self._process_pools.get(pool)
+
+        if process_pool is None:
+            process_pool = self._process_pools[pool] = ProcessPoolExecutor(
+                self._process_sizes.get(pool, os.cpu_count()),
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_process_service,
+                initargs=(self._service_class,),
+            )
+
+        return wait_future(
+            process_pool.submit(
+                _call_process_service, method_name, args, kwargs
+            )
+        )
+
+    def close(self) -> None:
+        """
+        Stop all pools.
+        """
+        for thread_pool in self._thread_pools.values():
+            thread_pool.kill()
+
+        for process_pool in self._process_pools.values():
+            process_pool.shutdown(wait=False, cancel_futures=True)
+
+        self._thread_pools = {}
+        self._process_pools = {}
@@ -0,0 +1,43 @@
+from functools import reduce
+from typing import Any, Callable, Iterable
+
+Handler = Callable[[tuple[Any, ...], dict[str, Any], dict[str, Any]], Any]
+"""
+Handler of an RPC call, takes args, kwargs and headers of the request and
+returns the result.
+"""
+
+Middleware = Callable[[str, Handler], Handler]
+"""
+Middleware takes the method name and the next handler and returns the
+handler wrapping it, e.g.::
+
+    def logging_middleware(method: str, handler: Handler) -> Handler:
+        def handle(args, kwargs, headers):
+            logger.info(f"Calling {method}")
+            return handler(args, kwargs, headers)
+
+        return handle
+
+Middlewares are applied once per method, when the container is
+initialized, so they cost nothing per call beyond the call itself.
+"""
+
+
+def compose(
+    method: str, handler: Handler, middlewares: Iterable[Middleware]
+) -> Handler:
+    """
+    Wrap the handler with middlewares, the first middleware is the
+    outermost one.
+
+    :param method: Name of the RPC method.
+    :param handler: Handler of the method.
+    :param middlewares: Middlewares to apply.
+    :return: Handler
+    """
+    return reduce(
+        lambda wrapped, middleware: middleware(method, wrapped),
+        reversed(list(middlewares)),
+        handler,
+    )
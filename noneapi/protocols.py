@@ -1,44 +1,91 @@
-from dataclasses import asdict, dataclass
-from typing import Any, Generic, TypeVar
+import time
+import uuid
+from typing import Any, Generic, Iterable, TypeVar
 
+import orjson
 import zmq.green as zmq
-
-from .serializers import BaseSerializer
-from .transports import TCP, ProtocolType, ZeroMQTransport
+from gevent.event import AsyncResult  # type: ignore
+from gevent.queue import Empty, Queue  # type: ignore
+
+from .deadlines import (
+    BUDGET_HEADER,
+    DEADLINE_HEADER,
+    build_deadline,
+    get_deadline,
+)
+from .exceptions import DeadlineExceeded, RequestTimeout, UnsupportedEnvelope
+from .serializers import BaseSerializer, get_serializer
+from .streams import (
+    CANCEL_METHOD,
+    CHUNK_METHOD,
+    CREDIT_HEADER,
+    CREDIT_METHOD,
+    END_HEADER,
+    STREAM_END,
+    STREAM_HEADER,
+    STREAM_ITEM,
+    STREAM_WINDOW,
+    UPLOAD_HEADER,
+    WINDOW_HEADER,
+)
+from .transports import (
+    TCP,
+    Address,
+    Frames,
+    ProtocolType,
+    Reply,
+    ZeroMQTransport,
+    as_frames,
+    build_url,
+    next_correlation_id,
+)
 
 T = TypeVar("T")
 _Serializer = TypeVar("_Serializer", bound=BaseSerializer)
 
 
-@dataclass(frozen=True)
-class Meta:
-    """
-    Meta information about RPC request.
-    """
+ENVELOPE_VERSION = 2
+# Version of single frame requests, ``[version, method, args, kwargs,
+# headers]``, sent before the header frame was split from the body.
+SINGLE_FRAME_VERSION = 1
 
-    headers: dict
+BATCH_METHOD = "__batch__"
+# Header of replies encoded with another serializer than the request, e.g.
+# errors of requests encoded with a serializer the service doesn't have.
+SERIALIZER_HEADER = "serializer"
+CORRELATION_HEADER = "correlation_id"
+# Start of header frames encoded by orjson, ``[version,"method",...``.
+_HEADER_PREFIX = f'[{ENVELOPE_VERSION},"'.encode()
 
 
-@dataclass(frozen=True)
-class RPCRequest:
-    """
-    RPC request body.
+def check_version(version: Any, expected: int) -> None:
     """
+    Check the version of the request envelope, requests of peers speaking
+    another version can't be decoded reliably.
 
-    method: str
-    args: tuple
-    kwargs: dict
-    meta: Meta
+    :param version: version the request is encoded with
+    :param expected: version of the envelope this protocol decodes
+    """
+    if version != expected:
+        raise UnsupportedEnvelope(
+            f"Envelope version {version!r} is not supported, "
+            f"expected {expected}"
+        )
 
 
-@dataclass(frozen=True)
-class RPCResponse:
-    """
-    RPC response body.
+def is_batch_call(call: Any) -> bool:
     """
+    Check that the item of a batch is a ``[method, args, kwargs]`` call.
 
-    result: dict
-    request: RPCRequest
+    :param call: item of the batch
+    """
+    return (
+        isinstance(call, (list, tuple))
+        and len(call) == 3
+        and isinstance(call[0], str)
+        and isinstance(call[1], (list, tuple))
+        and isinstance(call[2], dict)
+    )
 
 
 class RPCProtocol(Generic[_Serializer]):
@@ -46,56 +93,481 @@ class RPCProtocol(Generic[_Serializer]):
     Base class for all RPC protocols. This class is responsible for
     convert data to RPC request and RPC response for communication between
     services.
+
+    A request is sent as two frames. The header frame
+    ``[version, method, serializer, headers]`` is always encoded with
+    orjson, so a server or a broker can route the request, check its
+    deadline or reject it without decoding the body. The body frame
+    ``[args, kwargs]`` is encoded by the serializer named in the header,
+    and the response is encoded with the same serializer, so clients and
+    servers using different serializers can talk to each other.
+
+    A reply is the response encoded by the serializer, optionally followed
+    by a header frame encoded with orjson, e.g. ``{"max_age": 30}`` for
+    responses clients may cache.
+
+    NumPy arrays and other buffers in arguments and results are sent as raw
+    frames after the body frame of the request and after the header frame
+    of the reply, if the serializer supports it. The body or the response
+    holds their descriptors, see ``extract_buffer``.
+
+    A batch of calls is sent as a call of ``BATCH_METHOD`` with the list of
+    ``[method, args, kwargs]`` calls as args and replied with the list of
+    their results.
+
+    A stream call carries the stream id and the initial credit in its
+    headers. Every item of the streamed response is replied with the
+    ``{"stream": "item"}`` header and the stream is finished by a reply
+    with the ``{"stream": "end"}`` header, holding null or the error. The
+    client grants more credit and cancels the stream with ``CREDIT_METHOD``
+    and ``CANCEL_METHOD`` calls, which aren't replied.
+
+    An upload call carries the upload id and the window in its headers.
+    The remote method replies with ``{"credit": n}`` headers as it is ready
+    to receive ``n`` more chunks and with the response at the end. Every
+    chunk is sent as a ``CHUNK_METHOD`` call with the chunk as the only
+    argument, the last one has the ``{"end": true}`` header and no chunk.
+
+    Single frame requests, either the ``[1, method, args, kwargs, headers]``
+    array or the legacy ``{"method", "args", "kwargs", "meta"}`` dict, are
+    still accepted.
     """
 
-    def __init__(self, serializer: _Serializer):
-        self._transport = ZeroMQTransport()
+    def __init__(
+        self,
+        serializer: _Serializer,
+        shared_memory_threshold: int | None = None,
+    ):
+        self._transport = ZeroMQTransport(
+            shared_memory_threshold=shared_memory_threshold
+        )
         self._serializer = serializer
 
-    @staticmethod
-    def _build_request(
-        method: str, args: Any, kwargs: Any, headers: dict | None = None
-    ) -> RPCRequest:
-        return RPCRequest(
-            method=method,
-            args=args,
-            kwargs=kwargs,
-            meta=Meta(headers=headers or {}),
-        )
+    @property
+    def serializer_name(self) -> str:
+        """
+        Name of the serializer requests are encoded with.
+        """
+        return self._serializer.name
 
     def call(
         self,
         method: str,
         args: list[Any] | tuple[Any],
         kwargs: dict[Any, Any],
-        host: str,
-        port: int,
+        host: Address,
+        port: int | None,
         headers: dict[Any, Any] | None = None,
         protocol: ProtocolType = TCP,
+        timeout: float | None = None,
+        retries: int | None = None,
     ) -> dict | list:
         """
-        Call remote method.
+        Call remote method. Raises RequestTimeout if the remote method
+        doesn't reply after all retries.
+
+        The call gets a deadline covering all attempts, limited by the
+        deadline of the call being processed, if the remote method is
+        called from another RPC method.
         """
-        request: RPCRequest = self._build_request(
-            method, args, kwargs, headers
+        reply = self.call_raw(
+            method, args, kwargs, host, port, headers, protocol, timeout,
+            retries,
         )
 
-        data: bytes = self._serializer.serialize(asdict(request))
-        bytes_result: bytes = self._transport.request(
-            host, port, data, protocol
+        return self.parse_response(reply)
+
+    def call_batch(
+        self,
+        calls: list[list[Any]],
+        host: Address,
+        port: int | None,
+        headers: dict[Any, Any] | None = None,
+        protocol: ProtocolType = TCP,
+        timeout: float | None = None,
+        retries: int | None = None,
+    ) -> dict | list:
+        """
+        Call several remote methods in one message.
+
+        :param calls: list of ``[method, args, kwargs]`` calls
+        :return: list of results in order of calls, or the error of the
+            whole batch
+        """
+        return self.call(
+            BATCH_METHOD, calls, {}, host, port, headers, protocol, timeout,
+            retries,
         )
 
-        result: dict | list = self._serializer.deserialize(bytes_result)
+    def call_raw(
+        self,
+        method: str,
+        args: list[Any] | tuple[Any],
+        kwargs: dict[Any, Any],
+        host: Address,
+        port: int | None,
+        headers: dict[Any, Any] | None = None,
+        protocol: ProtocolType = TCP,
+        timeout: float | None = None,
+        retries: int | None = None,
+        body: Frames | None = None,
+    ) -> Reply:
+        """
+        Call remote method like ``call``, but return the reply as is, use
+        ``parse_response`` and ``parse_reply_headers`` to read it.
 
-        return result
+        :param body: frames of args and kwargs already encoded by
+            ``encode_body``, they aren't encoded again.
+        """
+        if timeout is None:
+            timeout = self._transport.REQUEST_TIMEOUT / 1000
+
+        if retries is None:
+            retries = self._transport.REQUEST_RETRIES
+
+        deadline = build_deadline(timeout * (retries + 1))
+        correlation_id, data = self._encode_call(
+            method, args, kwargs, headers, deadline, body=body
+        )
+
+        return self._transport.request(
+            host,
+            port,
+            data,
+            protocol,
+            timeout=timeout,
+            retries=retries,
+            correlation_id=correlation_id,
+            deadline=deadline,
+        )
+
+    def call_async(
+        self,
+        method: str,
+        args: list[Any] | tuple[Any],
+        kwargs: dict[Any, Any],
+        host: Address,
+        port: int | None,
+        headers: dict[Any, Any] | None = None,
+        protocol: ProtocolType = TCP,
+        correlation_id: int | None = None,
+    ) -> AsyncResult:
+        """
+        Call remote method without waiting for the result. The request is
+        tagged with a correlation id in the headers and inherits the
+        deadline of the call being processed, if any.
+
+        :param correlation_id: id of the request, pass it to ``discard``
+            to stop waiting for the response. Generated if not set.
+        :return: AsyncResult resolved with the raw response, use
+            ``parse_response`` to get the result.
+        """
+        correlation_id, data = self._encode_call(
+            method, args, kwargs, headers, get_deadline(), correlation_id
+        )
+
+        return self._transport.request_async(
+            host, port, data, protocol, correlation_id
+        )
+
+    def call_stream(
+        self,
+        method: str,
+        args: list[Any] | tuple[Any],
+        kwargs: dict[Any, Any],
+        host: Address,
+        port: int | None,
+        headers: dict[Any, Any] | None = None,
+        protocol: ProtocolType = TCP,
+        window: int = STREAM_WINDOW,
+    ) -> tuple[str, int, Queue]:
+        """
+        Call remote method streaming its response. The remote method sends
+        up to ``window`` items ahead, use ``grant_credit`` to receive more.
+
+        :return: stream id, correlation id and the queue of raw replies,
+            use ``parse_reply_headers`` and ``parse_response`` to read them.
+        """
+        stream_id = uuid.uuid4().hex
+        headers = {
+            **(headers or {}), STREAM_HEADER: stream_id, WINDOW_HEADER: window
+        }
+        correlation_id, data = self._encode_call(
+            method, args, kwargs, headers, get_deadline()
+        )
+
+        replies = self._transport.request_stream(
+            host, port, data, protocol, correlation_id
+        )
+
+        return stream_id, correlation_id, replies
+
+    def call_upload(
+        self,
+        method: str,
+        chunks: Iterable[Any],
+        args: list[Any] | tuple[Any],
+        kwargs: dict[Any, Any],
+        host: Address,
+        port: int | None,
+        headers: dict[Any, Any] | None = None,
+        protocol: ProtocolType = TCP,
+        window: int = STREAM_WINDOW,
+        timeout: float | None = None,
+    ) -> dict | list:
+        """
+        Call remote method passing it the iterator over uploaded chunks as
+        the first argument. Every chunk is sent in its own message once the
+        remote method grants credit for it, so chunks are neither collected
+        in memory nor sent faster than the method consumes them. The upload
+        is cancelled if ``chunks`` raises an error.
+
+        :param timeout: seconds to wait for every reply, e.g. credit.
+        :return: response of the remote method
+        """
+        if timeout is None:
+            timeout = self._transport.REQUEST_TIMEOUT / 1000
+
+        upload_id = uuid.uuid4().hex
+        headers = {
+            **(headers or {}), UPLOAD_HEADER: upload_id, WINDOW_HEADER: window
+        }
+        correlation_id, data = self._encode_call(
+            method, args, kwargs, headers, get_deadline()
+        )
+        replies = self._transport.request_stream(
+            host, port, data, protocol, correlation_id
+        )
+        chunks = iter(chunks)
+        is_sent = False
+
+        try:
+            while True:
+                try:
+                    reply = replies.get(timeout=timeout)
+                except Empty:
+                    raise RequestTimeout.no_reply(
+                        build_url(protocol, host, port), timeout, 1
+                    ) from None
+
+                if isinstance(reply, Exception):
+                    raise reply
+
+                credit = self.parse_reply_headers(reply).get(CREDIT_HEADER)
+
+                if credit is None:
+                    return self.parse_response(reply)
+
+                for _ in range(credit):
+                    if is_sent:
+                        break
+
+                    is_sent = self._send_chunk(
+                        upload_id, chunks, host, port, protocol
+                    )
+        except BaseException:
+            self._transport.notify(
+                host,
+                port,
+                self._encode_request(
+                    CANCEL_METHOD, (), {}, {STREAM_HEADER: upload_id}
+                ),
+                protocol,
+            )
+            raise
+        finally:
+            self._transport.close_stream(host, port, correlation_id, protocol)
+
+    def _send_chunk(
+        self,
+        upload_id: str,
+        chunks: Iterable[Any],
+        host: Address,
+        port: int | None,
+        protocol: ProtocolType = TCP,
+    ) -> bool:
+        """
+        Send the next chunk, or the end of the upload.
+
+        :return: True if the upload is finished.
+        """
+        headers: dict[str, Any] = {STREAM_HEADER: upload_id}
+        args: tuple = ()
+
+        try:
+            args = (next(chunks),)  # type: ignore
+        except StopIteration:
+            headers[END_HEADER] = True
+
+        self._transport.notify(
+            host,
+            port,
+            self._encode_request(CHUNK_METHOD, args, {}, headers),
+            protocol,
+        )
+
+        return END_HEADER in headers
+
+    def grant_credit(
+        self,
+        stream_id: str,
+        credit: int,
+        host: Address,
+        port: int | None,
+        protocol: ProtocolType = TCP,
+    ) -> None:
+        """
+        Allow the remote method to send ``credit`` more items of the stream.
+        """
+        self._transport.notify(
+            host,
+            port,
+            self._encode_request(
+                CREDIT_METHOD,
+                (),
+                {},
+                {STREAM_HEADER: stream_id, CREDIT_HEADER: credit},
+            ),
+            protocol,
+        )
+
+    def cancel_stream(
+        self,
+        stream_id: str,
+        correlation_id: int,
+        host: Address,
+        port: int | None,
+        protocol: ProtocolType = TCP,
+    ) -> None:
+        """
+        Stop the remote method streaming and drop items already sent.
+        """
+        self._transport.notify(
+            host,
+            port,
+            self._encode_request(
+                CANCEL_METHOD, (), {}, {STREAM_HEADER: stream_id}
+            ),
+            protocol,
+        )
+        self._transport.close_stream(host, port, correlation_id, protocol)
+
+    def close_stream(
+        self,
+        correlation_id: int,
+        host: Address,
+        port: int | None,
+        protocol: ProtocolType = TCP,
+    ) -> None:
+        """
+        Forget the finished stream.
+        """
+        self._transport.close_stream(host, port, correlation_id, protocol)
+
+    def discard(
+        self,
+        correlation_id: int,
+        host: Address,
+        port: int | None,
+        protocol: ProtocolType = TCP,
+    ) -> None:
+        """
+        Forget the asynchronous call nobody waits for, a late response to it
+        will be dropped.
+        """
+        self._transport.discard(host, port, correlation_id, protocol)
+
+    def _encode_call(
+        self,
+        method: str,
+        args: list[Any] | tuple[Any],
+        kwargs: dict[Any, Any],
+        headers: dict[Any, Any] | None = None,
+        deadline: float | None = None,
+        correlation_id: int | None = None,
+        body: Frames | None = None,
+    ) -> tuple[int, Frames]:
+        if correlation_id is None:
+            correlation_id = next_correlation_id()
+
+        headers = {**(headers or {}), CORRELATION_HEADER: correlation_id}
+
+        if deadline is not None:
+            budget = deadline - time.time()
+
+            if budget <= 0:
+                raise DeadlineExceeded(f"Deadline of {method} exceeded")
+
+            headers[DEADLINE_HEADER] = deadline
+            headers[BUDGET_HEADER] = budget
+
+        return correlation_id, self._encode_request(
+            method, args, kwargs, headers, body
+        )
+
+    def _encode_request(
+        self,
+        method: str,
+        args: list[Any] | tuple[Any],
+        kwargs: dict[Any, Any],
+        headers: dict[Any, Any] | None = None,
+        body: Frames | None = None,
+    ) -> Frames:
+        header = orjson.dumps(
+            [ENVELOPE_VERSION, method, self._serializer.name, headers or {}]
+        )
+
+        if body is None:
+            body = self.encode_body(args, kwargs)
+
+        return [header, *body]
+
+    def encode_body(
+        self, args: list[Any] | tuple[Any], kwargs: dict[Any, Any]
+    ) -> Frames:
+        """
+        Encode body frame of the request followed by frames of buffers.
+        :param args: args of the call
+        :param kwargs: kwargs of the call
+        :return: list of frames
+        """
+        return self._serializer.serialize_frames([args, kwargs])
+
+    def parse_response(self, data: Reply) -> dict | list:
+        """
+        Parse response of the remote method.
+        :param data: bytes or memoryview of a large response, or reply
+            frames if the reply has a header
+        :return: dict | list
+        """
+        if isinstance(data, list):
+            serializer = self._get_serializer(
+                self.parse_reply_headers(data).get(SERIALIZER_HEADER)
+            )
+
+            return serializer.deserialize_frames([data[0], *data[2:]])
+
+        return self._serializer.deserialize(data)
+
+    @staticmethod
+    def parse_reply_headers(data: Reply) -> dict[str, Any]:
+        """
+        Parse headers of the reply, e.g. how long it may be cached.
+        :param data: reply of the remote method
+        :return: dict
+        """
+        if isinstance(data, list) and len(data) > 1:
+            return orjson.loads(data[1])
+
+        return {}
 
     def send(
         self,
         method: str,
         args: list[Any] | tuple[Any],
         kwargs: dict[Any, Any],
-        host: str,
-        port: int,
+        host: Address,
+        port: int | None,
         socket: Any = None,
         headers: dict[Any, Any] | None = None,
         protocol: ProtocolType = TCP,
@@ -114,10 +586,7 @@ class RPCProtocol(Generic[_Serializer]):
         :arg socket: socket to use
         :return: zmq.Socket
         """
-        request: RPCRequest = self._build_request(
-            method, args, kwargs, headers
-        )
-        data: bytes = self._serializer.serialize(asdict(request))
+        data: Frames = self._encode_request(method, args, kwargs, headers)
 
         connection: zmq.Socket = self._transport.send(
             data, protocol, host=host, port=port, socket=socket
@@ -131,15 +600,15 @@ class RPCProtocol(Generic[_Serializer]):
         Uses by server for receiving requests.
         """
 
-        bytes_result: bytes = self._transport.receive(socket)
+        bytes_result = self._transport.receive(socket)
         result: dict | list = self._serializer.deserialize(bytes_result)
 
         return result
 
     def dispatch(
         self,
-        host: str,
-        port: int,
+        host: Address,
+        port: int | None,
         topic: str,
         payload: dict,
         protocol: ProtocolType = TCP,
@@ -154,31 +623,166 @@ class RPCProtocol(Generic[_Serializer]):
         )
 
     def parse_call(
-            self, data: bytes
+            self, data: bytes | Frames
     ) -> tuple[str, tuple[Any, ...], dict[Any, Any]]:
         """
         Parse incoming data to method name, args and kwargs.
-        :param data: bytes
+        :param data: request frames or single frame request
         :return: tuple[str, list[Any], dict[Any, Any]]
         """
-        result: dict = self._serializer.deserialize(data)
-        request = RPCRequest(**result)
+        method, args, kwargs, _ = self.parse_request(data)
 
-        return request.method, request.args, request.kwargs
+        return method, args, kwargs
 
-    def parse_event(self, data: bytes) -> dict:
+    def parse_request(
+            self, data: bytes | Frames
+    ) -> tuple[str, tuple[Any, ...], dict[Any, Any], dict[Any, Any]]:
         """
-        Parse incoming data to topic and payload.
+        Parse incoming data to method name, args, kwargs and headers.
+        :param data: request frames or single frame request
+        :return: tuple[str, list[Any], dict[Any, Any], dict[Any, Any]]
+        """
+        if isinstance(data, list) and len(data) > 1:
+            method, serializer, headers = self.parse_header(data[0])
+            args, kwargs = self.parse_body(data[1], serializer, data[2:])
+
+            return method, args, kwargs, headers
+
+        if isinstance(data, list):
+            data = data[0]
+
+        request: list | dict = self._serializer.deserialize(data)
+
+        if isinstance(request, dict):
+            return (
+                request["method"],
+                request["args"],
+                request["kwargs"],
+                request["meta"]["headers"],
+            )
+
+        version, method, args, kwargs, headers = request
+        check_version(version, SINGLE_FRAME_VERSION)
+
+        return method, args, kwargs, headers
+
+    @staticmethod
+    def parse_header(data: bytes) -> tuple[str, str, dict[Any, Any]]:
+        """
+        Parse header frame to method name, serializer name and headers.
         :param data: bytes
+        :return: tuple[str, str, dict[Any, Any]]
+        """
+        version, method, serializer, headers = orjson.loads(data)
+        check_version(version, ENVELOPE_VERSION)
+
+        return method, serializer, headers
+
+    @staticmethod
+    def peek_method(data: bytes | memoryview) -> str | None:
+        """
+        Read method name from header frame without parsing the frame, to
+        route requests before they are parsed.
+        :param data: bytes or memoryview of the header frame
+        :return: method name, None if the header isn't encoded compactly
+            or the name is escaped, the header has to be parsed then
+        """
+        if not isinstance(data, bytes):
+            data = bytes(data)
+
+        if not data.startswith(_HEADER_PREFIX):
+            return None
+
+        start = len(_HEADER_PREFIX)
+        end = data.find(b'"', start)
+
+        if end < 0 or b"\\" in data[start:end]:
+            return None
+
+        return data[start:end].decode()
+
+    def parse_body(
+            self,
+            data: bytes | memoryview,
+            serializer: str | None = None,
+            buffers: Frames | None = None,
+    ) -> tuple[tuple[Any, ...], dict[Any, Any]]:
+        """
+        Parse body frame to args and kwargs.
+        :param data: bytes or memoryview of a large body
+        :param serializer: name of the serializer the body is encoded with,
+            serializer of the protocol by default
+        :param buffers: frames of buffers following the body frame
+        :return: tuple[list[Any], dict[Any, Any]]
+        """
+        args, kwargs = self._get_serializer(serializer).deserialize_frames(
+            [data, *(buffers or ())]
+        )
+
+        return args, kwargs
+
+    def parse_event(self, data: bytes | memoryview) -> dict:
+        """
+        Parse incoming data to topic and payload.
+        :param data: bytes or memoryview of a large event
         :return: dict
         """
         return self._serializer.deserialize(data)
 
-    def build_response(self, result: dict) -> bytes:
+    def build_response(
+            self, result: dict, serializer: str | None = None
+    ) -> bytes | Frames:
         """
         Build response from result and request.
         :param result: dict
-        :return: bytes
+        :param serializer: name of the serializer the request is encoded
+            with, serializer of the protocol by default
+        :return: bytes, or reply frames if the result has buffers
+        """
+        frames = self._get_serializer(serializer).serialize_frames(result)
+
+        if len(frames) == 1:
+            return frames[0]
+
+        return [frames[0], orjson.dumps({}), *frames[1:]]
+
+    @staticmethod
+    def build_reply(
+        response: bytes | Frames, headers: dict[str, Any]
+    ) -> Frames:
         """
+        Build reply with headers from the response.
+        :param response: serialized response
+        :param headers: reply headers
+        :return: reply frames
+        """
+        frames = as_frames(response)
+
+        return [frames[0], orjson.dumps(headers), *frames[2:]]
+
+    @staticmethod
+    def build_credit_reply(credit: int) -> Frames:
+        """
+        Build reply granting the caller credit for more uploaded chunks.
+        :param credit: number of chunks
+        :return: reply frames
+        """
+        return RPCProtocol.build_reply(b"", {CREDIT_HEADER: credit})
+
+    @staticmethod
+    def build_stream_reply(response: bytes, end: bool = False) -> Frames:
+        """
+        Build reply with an item of the stream, or the last reply of it.
+        :param response: serialized item, or null or the error at the end
+        :param end: whether the stream is finished
+        :return: reply frames
+        """
+        return RPCProtocol.build_reply(
+            response, {STREAM_HEADER: STREAM_END if end else STREAM_ITEM}
+        )
+
+    def _get_serializer(self, name: str | None) -> BaseSerializer:
+        if name is None or name == self._serializer.name:
+            return self._serializer
 
-        return self._serializer.serialize(result)
+        return get_serializer(name)
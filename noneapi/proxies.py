@@ -1,17 +1,316 @@
-from typing import Any, TypedDict
+from collections import deque
+from functools import partial
+from typing import Any, Callable, Iterable, Iterator, TypedDict
 
-import zmq.green as zmq
+import gevent  # type: ignore
+from gevent.event import AsyncResult  # type: ignore
+from gevent.queue import Empty, Queue  # type: ignore
 
-from .exceptions import AsyncCallError, ServiceNotFound
+from .caches import MAX_AGE_HEADER, TTLCache
+from .exceptions import AsyncCallError, RequestTimeout, ServiceNotFound
 from .handlers import RemoteErrorHandler
 from .protocols import RPCProtocol
-from .serializers import ORJSONSerializer
+from .serializers import BaseSerializer, ORJSONSerializer
+from .streams import STREAM_HEADER, STREAM_ITEM, STREAM_WINDOW
+from .transports import (
+    TCP,
+    Address,
+    ProtocolType,
+    ZeroMQTransport,
+    build_url,
+    next_correlation_id,
+)
+
+
+class _ClusterServiceOptions(TypedDict, total=False):
+    timeout: float | None
+    retries: int | None
+    serializer: BaseSerializer | None
+    cache: TTLCache | None
+    shared_memory_threshold: int | None
+    protocol: ProtocolType
+
+
+class ClusterServiceProxy(_ClusterServiceOptions):
+    name: str
+    host: Address
+    port: int | None
 
 
-class ClusterServiceProxy(TypedDict):
-    name: str
-    host: str
-    port: int
+class RPCFuture:
+    """
+    Result of an asynchronous remote call.
+
+    :param response: Result resolved with the raw response.
+    :param protocol: Protocol used to parse the response, the response is
+        already parsed if it isn't set.
+    :param discard: Function forgetting the request, so a late response is
+        dropped, called when nobody waits for the response anymore.
+    """
+
+    def __init__(
+        self,
+        response: AsyncResult,
+        protocol: RPCProtocol | None = None,
+        discard: Callable[[], None] | None = None,
+    ) -> None:
+        self._response = response
+        self._protocol = protocol
+        self._discard = discard
+
+    def ready(self) -> bool:
+        """
+        Check whether the response has arrived.
+        """
+        return self._response.ready()
+
+    def wait(self, timeout: float | None = None) -> bool:
+        """
+        Wait for the response without raising errors.
+        :param timeout: seconds to wait, wait forever if not set.
+        :return: True if the response has arrived.
+        """
+        self._response.wait(timeout)
+        return self._response.ready()
+
+    def get(self, timeout: float | None = None) -> Any:
+        """
+        Get result of the call, raise RemoteError if the call failed.
+        The call is cancelled if the response doesn't arrive in time.
+        :param timeout: seconds to wait, wait forever if not set.
+        :return: Any
+        """
+        try:
+            response = self._response.get(timeout=timeout)
+        except gevent.Timeout:
+            self.cancel(
+                RequestTimeout(f"No response in {timeout}s", timeout=timeout)
+            )
+            response = self._response.get()
+
+        if self._protocol:
+            response = self._protocol.parse_response(response)
+
+        handler = RemoteErrorHandler()
+
+        if handler.is_validate_error(response):
+            handler.raise_remote_error(response)
+
+        return response
+
+    result = get
+
+    def cancel(self, error: Exception | None = None) -> None:
+        """
+        Stop waiting for the response, a late response is dropped and the
+        result raises ``error``.
+        :param error: error of the result, AsyncCallError by default.
+        """
+        if self._response.ready():
+            return None
+
+        if self._discard:
+            self._discard()
+
+        self._response.set_exception(
+            error or AsyncCallError("Async call is cancelled")
+        )
+
+
+class RPCBatch:
+    """
+    Calls collected to be sent to the remote service in one message, see
+    ``RPCProxy._batch``. Every call returns an RPCFuture resolved when the
+    batch is sent.
+
+    :param proxy: Proxy of the remote service.
+    :param options: Timeout and retries of the batch.
+    """
+
+    def __init__(
+        self, proxy: "RPCProxy", options: dict[str, Any] | None = None
+    ) -> None:
+        self._proxy = proxy
+        self._options = options or {}
+        self._calls: list[list[Any]] = []
+        self._results: list[AsyncResult] = []
+
+    def __getattr__(self, name: str) -> Callable[..., RPCFuture]:
+        if name.startswith("_"):
+            raise AttributeError(name)
+
+        return partial(self._add, name)
+
+    def __enter__(self) -> "Any":
+        return self
+
+    def __exit__(self, exc_type: Any, exc_val: Any, exc_tb: Any) -> None:
+        if exc_type is None:
+            self.send()
+
+    def __len__(self) -> int:
+        return len(self._calls)
+
+    def send(self) -> None:
+        """
+        Send collected calls and resolve their futures. Errors of single
+        calls are raised by their futures, an error of the whole batch is
+        raised here and by every future.
+        """
+        calls, self._calls = self._calls, []
+        results, self._results = self._results, []
+
+        if not calls:
+            return None
+
+        try:
+            responses = self._proxy._call_batch(calls, self._options)
+        except Exception as e:
+            for result in results:
+                result.set_exception(e)
+            raise
+
+        for result, response in zip(results, responses):
+            result.set(response)
+
+    def _add(self, method: str, *args: Any, **kwargs: Any) -> RPCFuture:
+        result = AsyncResult()
+        self._calls.append([method, args, kwargs])
+        self._results.append(result)
+
+        return RPCFuture(result)
+
+
+class RPCStream:
+    """
+    Iterator over items streamed by the remote generator method, see
+    ``RPCProxy._stream``. Credit for more items is granted to the remote
+    method as items are consumed, so no more than ``window`` of them are
+    buffered. Closing the stream before its end, explicitly, by leaving
+    the ``with`` block or by dropping the iterator, cancels the remote
+    method.
+
+    A method which isn't a generator is streamed too, the items of its
+    list result are iterated.
+
+    :param protocol: Protocol used to parse the replies.
+    :param host: Host of the remote service.
+    :param port: Port of the remote service.
+    :param window: Maximum number of items sent ahead.
+    :param timeout: Seconds to wait for every item.
+    :param protocol_type: Transport protocol of the remote service.
+    """
+
+    def __init__(
+        self,
+        protocol: RPCProtocol,
+        host: Address,
+        port: int | None,
+        stream_id: str,
+        correlation_id: int,
+        replies: Queue,
+        window: int = STREAM_WINDOW,
+        timeout: float | None = None,
+        protocol_type: ProtocolType = TCP,
+    ) -> None:
+        self._done = False
+        self._protocol = protocol
+        self._protocol_type = protocol_type
+        self._host = host
+        self._port = port
+        self._stream_id = stream_id
+        self._correlation_id = correlation_id
+        self._replies = replies
+        self._credit = max(window // 2, 1)
+        self._consumed = 0
+        self._timeout = timeout
+        self._items: Iterator | None = None
+
+    def __iter__(self) -> "RPCStream":
+        return self
+
+    def __next__(self) -> Any:
+        if self._items is not None:
+            return next(self._items)
+
+        if self._done:
+            raise StopIteration
+
+        try:
+            reply = self._replies.get(timeout=self._timeout)
+        except Empty:
+            self.close()
+            raise RequestTimeout.no_reply(
+                build_url(self._protocol_type, self._host, self._port),
+                self._timeout,
+                1,
+            ) from None
+
+        if isinstance(reply, Exception):
+            self._done = True
+            raise reply
+
+        stream = self._protocol.parse_reply_headers(reply).get(STREAM_HEADER)
+        response = self._protocol.parse_response(reply)
+
+        if stream == STREAM_ITEM:
+            self._grant()
+            return response
+
+        self._done = True
+        self._protocol.close_stream(
+            self._correlation_id, self._host, self._port, self._protocol_type
+        )
+
+        handler = RemoteErrorHandler()
+
+        if handler.is_validate_error(response):
+            handler.raise_remote_error(response)
+
+        if stream is None:
+            self._items = iter(response or ())
+            return next(self._items)
+
+        raise StopIteration
+
+    def __enter__(self) -> "RPCStream":
+        return self
+
+    def __exit__(self, exc_type: Any, exc_val: Any, exc_tb: Any) -> None:
+        self.close()
+
+    def __del__(self) -> None:
+        if not self._done:
+            gevent.spawn(self.close)
+
+    def close(self) -> None:
+        """
+        Cancel the remote method if the stream isn't finished yet.
+        """
+        if self._done:
+            return None
+
+        self._done = True
+        self._protocol.cancel_stream(
+            self._stream_id,
+            self._correlation_id,
+            self._host,
+            self._port,
+            self._protocol_type,
+        )
+
+    def _grant(self) -> None:
+        self._consumed += 1
+
+        if self._consumed >= self._credit:
+            self._protocol.grant_credit(
+                self._stream_id,
+                self._consumed,
+                self._host,
+                self._port,
+                self._protocol_type,
+            )
+            self._consumed = 0
 
 
 class RPCProxy:
@@ -22,18 +321,31 @@ class RPCProxy:
     def __init__(
         self,
         current_service: Any,
-        host: str | None = None,
+        host: Address | None = None,
         port: int | None = None,
-        event_host: str | None = None,
+        event_host: Address | None = None,
         event_port: int | None = None,
+        timeout: float | None = None,
+        retries: int | None = None,
+        serializer: BaseSerializer | None = None,
+        cache: TTLCache | None = None,
+        shared_memory_threshold: int | None = None,
+        protocol: ProtocolType = TCP,
     ) -> None:
         self._current_service = current_service
         self._host = host
         self._port = port
+        self._protocol_type = protocol
         self._event_host = event_host
         self._event_port = event_port
+        self._timeout = timeout
+        self._retries = retries
+        self._serializer = serializer
+        self._cache = cache
+        self._shared_memory_threshold = shared_memory_threshold
+        self._call_options: dict[str, Any] = {}
         self._method_name: str = ""
-        self._active_async_calls: dict[str, zmq.Socket] = {}
+        self._active_async_calls: dict[str, deque[RPCFuture]] = {}
         self._is_async_context: bool = False
         self._protocol: RPCProtocol | None = None
 
@@ -48,61 +360,228 @@ class RPCProxy:
         self._is_async_context = True
         return self
 
+    def _with_options(
+        self, timeout: float | None = None, retries: int | None = None
+    ) -> "Any":
+        """
+        Override timeout and retries for the next call only, e.g.
+        ``proxy.get_order._with_options(timeout=0.5)(42)``.
+        :param timeout: seconds to wait for the reply of one attempt.
+        :param retries: number of retries after a timeout.
+        :return: RPCProxy
+        """
+        self._call_options = {"timeout": timeout, "retries": retries}
+        return self
+
     def __exit__(self, exc_type: Any, exc_val: Any, exc_tb: Any) -> None:
         self._is_async_context = False
-        for connection in self._active_async_calls.values():
-            connection.close()
+        self._cancel_async_calls()
+
+    def _cancel_async_calls(self) -> None:
+        """
+        Cancel async calls which aren't resolved yet. Nobody waits for
+        their responses after the async context, so they shouldn't stay
+        pending on the connection.
+        """
+        calls, self._active_async_calls = self._active_async_calls, {}
+
+        for futures in calls.values():
+            for future in futures:
+                future.cancel()
+
+    def _batch(self) -> RPCBatch:
+        """
+        Collect calls to send them in one message, e.g.::
+
+            with proxy._batch() as batch:
+                first = batch.get_order(1)
+                second = batch.get_order(2)
+
+            first.get(), second.get()
+
+        The remote service runs the calls concurrently and replies with all
+        results at once. Options set by ``_with_options`` apply to the
+        batch.
+        :return: RPCBatch
+        """
+        options, self._call_options = self._call_options, {}
 
-        self._active_async_calls = {}
+        return RPCBatch(self, options)
 
-    def async_call(self, *args: Any, **kwargs: Any) -> None:
+    def _stream(self, *args: Any, **kwargs: Any) -> RPCStream:
         """
-        Call remote method asynchronously.
+        Call remote generator method and iterate over its items as they
+        arrive, e.g.::
+
+            with proxy.export_rows._stream(since) as rows:
+                for row in rows:
+                    ...
+
         :param args: args for remote method.
         :param kwargs: kwargs for remote method.
-        :return: None
+        :return: RPCStream
+        """
+        protocol = self._get_protocol()
+        options, self._call_options = self._call_options, {}
+        timeout = self._get_option(
+            options,
+            "timeout",
+            self._timeout or ZeroMQTransport.REQUEST_TIMEOUT / 1000,
+        )
+
+        stream_id, correlation_id, replies = protocol.call_stream(
+            host=self._host,
+            port=self._port,
+            method=self._method_name,
+            args=args,
+            kwargs=kwargs,
+            headers={},
+            protocol=self._protocol_type,
+        )
+
+        return RPCStream(
+            protocol,
+            self._host,  # type: ignore
+            self._port,
+            stream_id,
+            correlation_id,
+            replies,
+            timeout=timeout,
+            protocol_type=self._protocol_type,
+        )
+
+    def _upload(
+        self, chunks: Iterable[Any], *args: Any, **kwargs: Any
+    ) -> Any:
+        """
+        Call remote method uploading ``chunks`` to it one by one, e.g.::
+
+            with open(path) as lines:
+                proxy.import_rows._upload(lines, source="csv")
+
+        The remote method receives the iterator over chunks as its first
+        argument and the rest of the arguments after it.
+        :param chunks: chunks to upload, consumed lazily.
+        :param args: args for remote method.
+        :param kwargs: kwargs for remote method.
+        :return: Any
+        """
+        protocol = self._get_protocol()
+        options, self._call_options = self._call_options, {}
+
+        response = protocol.call_upload(
+            host=self._host,
+            port=self._port,
+            method=self._method_name,
+            chunks=chunks,
+            args=args,
+            kwargs=kwargs,
+            headers={},
+            protocol=self._protocol_type,
+            timeout=self._get_option(options, "timeout", self._timeout),
+        )
+
+        handler = RemoteErrorHandler()
+
+        if handler.is_validate_error(response):
+            handler.raise_remote_error(response)
+
+        return response
+
+    def async_call(self, *args: Any, **kwargs: Any) -> RPCFuture:
+        """
+        Call remote method asynchronously. Several calls of the same
+        method may be in flight at once.
+        :param args: args for remote method.
+        :param kwargs: kwargs for remote method.
+        :return: RPCFuture resolved with the result.
         """
         if not self._is_async_context:
             raise AsyncCallError("Async call should be in async context")
 
         protocol = self._get_protocol()
+        correlation_id = next_correlation_id()
 
-        connection = self._active_async_calls.get(self._method_name)
-
-        connection_new = protocol.send(
+        response = protocol.call_async(
             host=self._host,
             port=self._port,
             method=self._method_name,
             args=args,
             kwargs=kwargs,
             headers={},
-            socket=connection,
+            protocol=self._protocol_type,
+            correlation_id=correlation_id,
+        )
+        future = RPCFuture(
+            response,
+            protocol,
+            partial(
+                protocol.discard,
+                correlation_id,
+                self._host,
+                self._port,
+                self._protocol_type,
+            ),
         )
 
-        if not connection:
-            self._active_async_calls[self._method_name] = connection_new
+        self._active_async_calls.setdefault(
+            self._method_name, deque()
+        ).append(future)
 
-    def call_async(self, *args: Any, **kwargs: Any) -> None:
-        self.async_call(*args, **kwargs)
+        return future
+
+    def call_async(self, *args: Any, **kwargs: Any) -> RPCFuture:
+        return self.async_call(*args, **kwargs)
 
     def result(self) -> Any:
         """
-        Get result of async call.
+        Get result of the oldest pending async call of the method.
         :return: Any
         """
         if not self._is_async_context:
             raise AsyncCallError("Async call should be in async context")
 
-        protocol = self._get_protocol()
+        futures = self._active_async_calls.get(self._method_name)
 
-        if self._method_name not in self._active_async_calls:
+        if not futures:
             raise AsyncCallError(
                 f"Async call for method {self._method_name} was never called"
             )
 
-        response = protocol.receive(
-            socket=self._active_async_calls[self._method_name]
-        )
+        return futures.popleft().get()
+
+    def _call(self, *args: Any, **kwargs: Any) -> dict:
+        protocol = self._get_protocol()
+        options, self._call_options = self._call_options, {}
+        key = None
+        body = None
+        reply = None
+
+        if self._cache is not None:
+            # Encoded once, for the key and for the request on a miss.
+            body = protocol.encode_body(args, kwargs)
+            key = (self._method_name, *map(bytes, body))
+            reply = self._cache.get(key)
+
+        if reply is None:
+            reply = protocol.call_raw(
+                host=self._host,
+                port=self._port,
+                method=self._method_name,
+                args=args,
+                kwargs=kwargs,
+                headers={},
+                protocol=self._protocol_type,
+                timeout=self._get_option(options, "timeout", self._timeout),
+                retries=self._get_option(options, "retries", self._retries),
+                body=body,
+            )
+            max_age = protocol.parse_reply_headers(reply).get(MAX_AGE_HEADER)
+
+            if self._cache is not None and max_age:
+                self._cache.set(key, reply, args, kwargs, ttl=max_age)
+
+        response = protocol.parse_response(reply)
 
         handler = RemoteErrorHandler()
 
@@ -111,16 +590,19 @@ class RPCProxy:
 
         return response
 
-    def _call(self, *args: Any, **kwargs: Any) -> dict:
+    def _call_batch(
+        self, calls: list[list[Any]], options: dict[str, Any]
+    ) -> list:
         protocol = self._get_protocol()
 
-        response = protocol.call(
+        response = protocol.call_batch(
+            calls,
             host=self._host,
             port=self._port,
-            method=self._method_name,
-            args=args,
-            kwargs=kwargs,
             headers={},
+            protocol=self._protocol_type,
+            timeout=self._get_option(options, "timeout", self._timeout),
+            retries=self._get_option(options, "retries", self._retries),
         )
 
         handler = RemoteErrorHandler()
@@ -128,7 +610,12 @@ class RPCProxy:
         if handler.is_validate_error(response):
             handler.raise_remote_error(response)
 
-        return response
+        return response  # type: ignore
+
+    @staticmethod
+    def _get_option(options: dict[str, Any], name: str, default: Any) -> Any:
+        value = options.get(name)
+        return default if value is None else value
 
     def _get_protocol(self) -> Any:
         """
@@ -136,7 +623,10 @@ class RPCProxy:
         :return: RPCProtocol - protocol for communication between services.
         """
         if not self._protocol:
-            self._protocol = RPCProtocol(ORJSONSerializer())
+            self._protocol = RPCProtocol(
+                self._serializer or ORJSONSerializer(),
+                shared_memory_threshold=self._shared_memory_threshold,
+            )
 
         return self._protocol
 
@@ -144,19 +634,52 @@ class RPCProxy:
 class ServiceProxy:
     """
     Proxy class for remote service calls.
+
+    ``timeout`` is the number of seconds to wait for the reply of one
+    attempt and ``retries`` is the number of attempts after a timeout,
+    transport defaults are used if they aren't set. Calls aren't retried
+    by default, a retry runs the remote method again if it was only slow,
+    so set ``retries`` only for services with idempotent methods.
+    ``serializer`` encodes
+    requests and decodes responses, the remote service replies with the
+    serializer it received.
+
+    With ``cache`` set, responses of methods the remote service marks as
+    cacheable (``@rpc(max_age=...)``) are reused for ``max_age`` seconds,
+    limited by the cache ttl. The container of the service drops entries
+    on the cache ``invalidate_on`` events.
+
+    With ``shared_memory_threshold`` set, request and reply frames of at
+    least that many bytes are passed through shared memory instead of the
+    socket. Use it only for services on the same host.
+
+    ``protocol`` is the transport of the remote service, with ``IPC`` the
+    ``host`` is the path of its socket file and ``port`` isn't used.
     """
 
     def __init__(
         self,
-        host: str | None = None,
+        host: Address | None = None,
         port: int | None = None,
-        event_host: str | None = None,
+        event_host: Address | None = None,
         event_port: int | None = None,
+        timeout: float | None = None,
+        retries: int | None = None,
+        serializer: BaseSerializer | None = None,
+        cache: TTLCache | None = None,
+        shared_memory_threshold: int | None = None,
+        protocol: ProtocolType = TCP,
     ) -> None:
         self._host = host
         self._port = port
+        self._protocol_type = protocol
         self._event_host = event_host
         self._event_port = event_port
+        self._timeout = timeout
+        self._retries = retries
+        self._serializer = serializer
+        self._cache = cache
+        self._shared_memory_threshold = shared_memory_threshold
 
     def __set_name__(self, owner, name):
         self._name = name
@@ -170,7 +693,9 @@ class ServiceProxy:
             self._name,
             RPCProxy(
                 instance, self._host, self._port, self._event_host,
-                self._event_port
+                self._event_port, self._timeout, self._retries,
+                self._serializer, self._cache,
+                self._shared_memory_threshold, self._protocol_type,
             ),
         )
 
@@ -199,11 +724,21 @@ class ClusterProxy:
         return self
 
     def __exit__(self, exc_type: Any, exc_val: Any, exc_tb: Any) -> None:
-        for _service in self._services.values():
-            del _service
+        for service in self._services.values():
+            service._cancel_async_calls()
 
     def _init(self):
         for service in self._config:
-            proxy = RPCProxy(self, host=service["host"], port=service["port"])
+            proxy = RPCProxy(
+                self,
+                host=service["host"],
+                port=service.get("port"),
+                timeout=service.get("timeout"),
+                retries=service.get("retries"),
+                serializer=service.get("serializer"),
+                cache=service.get("cache"),
+                shared_memory_threshold=service.get("shared_memory_threshold"),
+                protocol=service.get("protocol", TCP),
+            )
             proxy._is_async_context = True
             self._services[service["name"]] = proxy
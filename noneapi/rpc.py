@@ -1,15 +1,123 @@
-from typing import Callable
+import inspect
+from dataclasses import dataclass
+from typing import Any, Callable, overload
+
+from .caches import TTLCache
+from .executors import DEFAULT_POOL, PROCESS, THREAD, ExecutorType
 
 _REGISTERED_METHODS: dict[str, Callable] = {}
 
+RPC_OPTIONS_ATTRIBUTE = "__rpc_options__"
+
+
+@dataclass(frozen=True)
+class RPCOptions:
+    """
+    Options of the RPC method.
+
+    :param coerce: Validate arguments deeply (nested generics, unions,
+        models) and call the method with the validated values, e.g. a
+        pydantic model instance instead of a dict.
+    :param executor: Run the method in a ``"thread"`` or ``"process"``
+        pool instead of the gevent hub, for blocking or CPU bound methods.
+        Generator methods run on the hub, they can't have an executor.
+    :param pool: Name of the pool, sizes of pools are set on Container.
+    :param max_inflight: Maximum number of calls of the method processed at
+        once, calls over it are rejected with the Overloaded error.
+        Streamed calls are processed until their stream ends.
+    :param max_concurrency: Maximum number of calls of the method processed
+        at once, calls over it wait for a free slot without holding a
+        worker of the server. Streamed calls hold the slot until their
+        stream ends.
+    :param priority: Priority of the method, queued calls of methods with
+        higher priority are processed first.
+    :param coalesce: Process identical calls (same raw arguments and
+        headers) that are in flight at once only once and send all of them
+        the same result. Middlewares still run for every call. Calls are in
+        flight at once only if the container has several workers.
+    :param cache: Cache of serialized responses keyed by the raw arguments
+        and headers of the call, cached calls are neither processed nor
+        serialized again. Middlewares run only for calls which aren't
+        cached, so they may depend on the arguments and headers only.
+    :param max_age: Seconds clients with a cache may reuse the response.
+    """
+
+    coerce: bool = False
+    executor: ExecutorType | None = None
+    pool: str = DEFAULT_POOL
+    max_inflight: int | None = None
+    max_concurrency: int | None = None
+    priority: int = 0
+    coalesce: bool = False
+    cache: TTLCache | None = None
+    max_age: float | None = None
+
+    def __post_init__(self) -> None:
+        if self.executor not in (None, THREAD, PROCESS):
+            raise ValueError(f"Unknown executor {self.executor}")
+
+
+_DEFAULT_OPTIONS = RPCOptions()
+
+
+def get_rpc_options(method: Callable) -> RPCOptions:
+    """
+    Get options of the RPC method, defaults if they weren't set.
+
+    :param method: Function or bound method.
+    :return: RPCOptions
+    """
+    return getattr(method, RPC_OPTIONS_ATTRIBUTE, _DEFAULT_OPTIONS)
+
+
+def is_rpc_method(method: Any) -> bool:
+    """
+    Check whether the function is decorated with ``@rpc``.
+    """
+    return callable(method) and hasattr(method, RPC_OPTIONS_ATTRIBUTE)
 
+
+@overload
 def rpc(method: Callable) -> Callable:
+    ...
+
+
+@overload
+def rpc(
+    method: None = None, **options: Any
+) -> Callable[[Callable], Callable]:
+    ...
+
+
+def rpc(method: Callable | None = None, **options: Any) -> Any:
+    """
+    Decorator to make the method available for remote calls. Can be used
+    as ``@rpc`` or with options, e.g. ``@rpc(coerce=True)``.
+
+    :param method: The method to register.
+    :param options: Options of the method, see RPCOptions.
+    """
+    if method is None:
+        return lambda func: _register(func, RPCOptions(**options))
+
+    return _register(method, RPCOptions(**options))
+
+
+def _register(method: Callable, options: RPCOptions) -> Callable:
     global _REGISTERED_METHODS
 
     method_name = method.__name__
+
+    if options.executor and inspect.isgeneratorfunction(method):
+        raise ValueError(
+            f"Generator method {method_name} can't run in an executor"
+        )
+
     method_class = method.__qualname__.split(".")[-2]
 
     if method_name not in _REGISTERED_METHODS:
         _REGISTERED_METHODS[f"{method_class}.{method_name}"] = method
 
+    setattr(method, RPC_OPTIONS_ATTRIBUTE, options)
+
     return method
@@ -1,36 +1,240 @@
 import json
 from abc import ABC, abstractmethod
+from datetime import date, datetime
+from decimal import Decimal
+from functools import partial
+from typing import Any, Type
+from uuid import UUID
 
 import orjson
 
+from .buffers import extract_buffer, restore_buffer, restore_buffers
+
 
 class BaseSerializer(ABC):
-    def serialize(self, data: dict) -> bytes:
+    """
+    Base class of serializers. Large messages are received without copying,
+    so ``deserialize`` gets either ``bytes`` or a ``memoryview``.
+
+    Serializers which override ``_serialize_buffers`` encode NumPy arrays
+    and other buffers they don't support as separate raw frames, see
+    ``serialize_frames``.
+    """
+
+    name: str = ""
+
+    def serialize(self, data: Any) -> bytes:
         return self._serialize(data)
 
-    def deserialize(self, data: bytes) -> dict:
+    def deserialize(self, data: bytes | memoryview) -> Any:
         return self._deserialize(data)
 
+    def serialize_frames(self, data: Any) -> list[Any]:
+        """
+        Serialize data to the frame of the data followed by raw frames of
+        arrays and other buffers in it, which are sent without copying.
+        """
+        buffers: list[Any] = []
+        frame = self._serialize_buffers(data, buffers)
+
+        return [frame, *buffers]
+
+    def deserialize_frames(self, frames: list[Any]) -> Any:
+        """
+        Deserialize data from the frames built by ``serialize_frames``.
+        Arrays are created over their frames without copying.
+        """
+        data = self._deserialize(frames[0])
+
+        if len(frames) > 1:
+            data = restore_buffers(data, frames[1:])
+
+        return data
+
+    def _serialize_buffers(self, data: Any, buffers: list[Any]) -> bytes:
+        """
+        Serialize data moving buffers it contains to ``buffers``, with
+        ``extract_buffer`` as the default hook. Buffers aren't extracted by
+        default.
+        """
+        return self._serialize(data)
+
     @abstractmethod
-    def _serialize(self, data: dict) -> bytes:
+    def _serialize(self, data: Any) -> bytes:
         ...
 
     @abstractmethod
-    def _deserialize(self, data: bytes) -> dict:
+    def _deserialize(self, data: bytes | memoryview) -> Any:
         ...
 
 
 class JSONSerializer(BaseSerializer):
-    def _serialize(self, data: dict) -> bytes:
+    name = "json"
+
+    def _serialize(self, data: Any) -> bytes:
         return json.dumps(data).encode()
 
-    def _deserialize(self, data: bytes) -> dict:
-        return json.loads(data.decode())
+    def _serialize_buffers(self, data: Any, buffers: list[Any]) -> bytes:
+        default = partial(extract_buffer, buffers)
+
+        return json.dumps(data, default=default).encode()
+
+    def _deserialize(self, data: bytes | memoryview) -> Any:
+        return json.loads(str(data, "utf-8"))
 
 
 class ORJSONSerializer(BaseSerializer):
-    def _serialize(self, data: dict) -> bytes:
+    name = "orjson"
+
+    def _serialize(self, data: Any) -> bytes:
         return orjson.dumps(data)
 
-    def _deserialize(self, data: bytes) -> dict:
+    def _serialize_buffers(self, data: Any, buffers: list[Any]) -> bytes:
+        return orjson.dumps(data, default=partial(extract_buffer, buffers))
+
+    def _deserialize(self, data: bytes | memoryview) -> Any:
         return orjson.loads(data)
+
+
+class MsgPackSerializer(BaseSerializer):
+    """
+    MessagePack serializer. Unlike JSON it keeps ``bytes`` as is and
+    supports ``datetime``, ``date``, ``UUID`` and ``Decimal`` values
+    through extension types.
+
+    Requires ``msgpack``, install it with ``pip install noneapi[msgpack]``.
+    """
+
+    name = "msgpack"
+
+    EXT_DATETIME = 1
+    EXT_DATE = 2
+    EXT_UUID = 3
+    EXT_DECIMAL = 4
+    EXT_BUFFER = 5
+
+    def __init__(self) -> None:
+        try:
+            import msgpack
+        except ImportError as e:
+            raise ImportError(
+                "MsgPackSerializer requires msgpack, "
+                "install it with `pip install noneapi[msgpack]`"
+            ) from e
+
+        self._msgpack = msgpack
+
+    def _serialize(self, data: Any) -> bytes:
+        return self._msgpack.packb(
+            data, default=self._encode_ext, datetime=False
+        )
+
+    def _deserialize(self, data: bytes | memoryview) -> Any:
+        return self._msgpack.unpackb(
+            data, ext_hook=self._decode_ext, strict_map_key=False
+        )
+
+    def deserialize_frames(self, frames: list[Any]) -> Any:
+        """
+        Deserialize data from the frames built by ``serialize_frames``.
+        Descriptors of buffers are extension types, restored while the
+        data is unpacked.
+        """
+        if len(frames) == 1:
+            return self._deserialize(frames[0])
+
+        def ext_hook(code: int, data: bytes) -> Any:
+            if code == self.EXT_BUFFER:
+                return restore_buffer(self._msgpack.unpackb(data), frames[1:])
+
+            return self._decode_ext(code, data)
+
+        return self._msgpack.unpackb(
+            frames[0], ext_hook=ext_hook, strict_map_key=False
+        )
+
+    def _serialize_buffers(self, data: Any, buffers: list[Any]) -> bytes:
+        def default(value: Any) -> Any:
+            try:
+                return self._encode_ext(value)
+            except TypeError:
+                return self._msgpack.ExtType(
+                    self.EXT_BUFFER,
+                    self._msgpack.packb(extract_buffer(buffers, value)),
+                )
+
+        return self._msgpack.packb(data, default=default, datetime=False)
+
+    def _encode_ext(self, value: Any) -> Any:
+        if isinstance(value, datetime):
+            return self._msgpack.ExtType(
+                self.EXT_DATETIME, value.isoformat().encode()
+            )
+
+        if isinstance(value, date):
+            return self._msgpack.ExtType(
+                self.EXT_DATE, value.isoformat().encode()
+            )
+
+        if isinstance(value, UUID):
+            return self._msgpack.ExtType(self.EXT_UUID, value.bytes)
+
+        if isinstance(value, Decimal):
+            return self._msgpack.ExtType(self.EXT_DECIMAL, str(value).encode())
+
+        raise TypeError(f"Object of type {type(value)} is not serializable")
+
+    def _decode_ext(self, code: int, data: bytes) -> Any:
+        if code == self.EXT_DATETIME:
+            return datetime.fromisoformat(data.decode())
+
+        if code == self.EXT_DATE:
+            return date.fromisoformat(data.decode())
+
+        if code == self.EXT_UUID:
+            return UUID(bytes=data)
+
+        if code == self.EXT_DECIMAL:
+            return Decimal(data.decode())
+
+        return self._msgpack.ExtType(code, data)
+
+
+_SERIALIZERS: dict[str, Type[BaseSerializer]] = {
+    JSONSerializer.name: JSONSerializer,
+    ORJSONSerializer.name: ORJSONSerializer,
+    MsgPackSerializer.name: MsgPackSerializer,
+}
+_INSTANCES: dict[str, BaseSerializer] = {}
+
+
+def register_serializer(serializer_class: Type[BaseSerializer]) -> None:
+    """
+    Register serializer, so servers can decode requests encoded with it.
+
+    :param serializer_class: Serializer class with unique ``name``.
+    """
+    assert serializer_class.name, "Serializer should have a name"
+
+    _SERIALIZERS[serializer_class.name] = serializer_class
+    _INSTANCES.pop(serializer_class.name, None)
+
+
+def get_serializer(name: str) -> BaseSerializer:
+    """
+    Get serializer by the name advertised in the request header.
+
+    :param name: Serializer name.
+    :return: BaseSerializer
+    """
+    serializer = _INSTANCES.get(name)
+
+    if serializer is None:
+        try:
+            serializer_class = _SERIALIZERS[name]
+        except KeyError as e:
+            raise ValueError(f"Serializer {name} is not registered") from e
+
+        serializer = _INSTANCES[name] = serializer_class()
+
+    return serializer
@@ -1,57 +1,181 @@
-from typing import Callable
+import itertools
+from collections.abc import Iterator
+from typing import Any, Callable
 
+import gevent  # type: ignore
+import zmq as native_zmq
 import zmq.green as zmq
+from gevent.lock import Semaphore  # type: ignore
+from gevent.queue import PriorityQueue, Queue  # type: ignore
 from loguru import logger
 
-from .transports import TCP, ProtocolType
+from .exceptions import InvalidSegment
+from .shm import get_segment_pool, has_handles, parse_trailer
+from .transports import (
+    COPY_THRESHOLD,
+    TCP,
+    Address,
+    Endpoint,
+    Frames,
+    ProtocolType,
+    as_frames,
+    recv_frames,
+)
+
+
+def split_envelope(frames: list[bytes]) -> tuple[list[bytes], list[bytes]]:
+    """
+    Split a multipart message received on a ROUTER socket into the routing
+    envelope (identities up to and including the empty delimiter) and the
+    message body.
+
+    :param frames: Frames received from the socket.
+    :return: Tuple of envelope and body frames.
+    """
+    for index, frame in enumerate(frames):
+        if not frame:
+            return frames[: index + 1], frames[index + 1:]
+
+    return frames[:1], frames[1:]
 
 
 class ZeroMQRPCServer:
     """
-    A ZeroMQ based RPC server with multithreading support.
+    A ZeroMQ based RPC server with concurrent request processing.
 
-    :param host: The host to bind the server.
-    :type host: str
+    Requests are accepted on a ROUTER socket and handed over to a fixed
+    number of worker greenlets, so a slow method doesn't block other
+    callers. Replies are routed back to the caller by its identity.
 
-    :param port: The port to bind the server.
-    :type port: int
+    If ``shared_memory`` is enabled, frames the caller sent through shared
+    memory are read without copying, and large reply frames are sent the
+    same way if the caller asked for it, see SegmentPool.
 
-    :param callback: The function to process the incoming messages.
-    :type callback: Callable[[bytes], bytes]
+    :param host: The host to bind the server, or the socket path for IPC.
+    :type host: str | Path
+
+    :param port: The port to bind the server, not used for IPC.
+    :type port: int | None
+
+    :param callback: The function to process the body frames of incoming
+        messages, returns one or several reply frames, or an iterator of
+        replies sent one by one as a stream. It may also return a greenlet
+        finishing the request, its value is sent as the reply once it's
+        ready. Streams and greenlets are replied by their own greenlet, so
+        the worker is released for other requests meanwhile. Such requests
+        count as in flight until the last reply is sent.
+    :type callback: Callable[[list[bytes]], bytes | list[bytes] | None]
 
     :param protocol: The communication protocol. Defaults to TCP.
     :type protocol: PROTOCOLS, optional
 
-    :param workers: The number of worker threads. Defaults to 1.
+    :param workers: The number of requests processed concurrently.
+        Defaults to 1.
     :type workers: int, optional
+
+    :param through_broker: Connect to a broker backend instead of binding.
+    :type through_broker: bool, optional
+
+    :param copy_threshold: Frames of at least this many bytes are received
+        as memoryviews and sent without copying.
+    :type copy_threshold: int, optional
+
+    :param max_queue: The maximum number of requests queued or being
+        processed. Requests over the limit are rejected right away with
+        the reply built by ``overload_callback``. Not limited by default.
+    :type max_queue: int, optional
+
+    :param overload_callback: The function building the reply to a
+        rejected request from its body frames. Rejected requests are
+        dropped if it isn't set.
+    :type overload_callback: Callable[[list[bytes]], bytes | None], optional
+
+    :param hwm: The high water mark of the socket, messages over it are
+        dropped by ZeroMQ. ZeroMQ default is used if it isn't set.
+    :type hwm: int, optional
+
+    :param priority_callback: The function returning the priority of a
+        request from its body frames. Queued requests with higher priority
+        are processed first, requests with the same priority in the order
+        they arrived. Requests are processed in order if it isn't set.
+    :type priority_callback: Callable[[list[bytes]], int], optional
+
+    :param control_callback: The function handling control messages, e.g.
+        credit of streams, from their body frames right in the receive
+        loop, so they are neither queued behind requests nor rejected.
+        Returns True if the message was handled, other messages are
+        processed as requests. Frames sent through shared memory are
+        passed as handles, so requests aren't attached twice, the callback
+        attaches frames of the messages it handles.
+    :type control_callback: Callable[[list[bytes]], bool], optional
+
+    :param error_callback: The function building the reply to a request
+        which can't be read, e.g. its shared memory frames, from its body
+        frames and the error. Such requests are dropped if it isn't set.
+    :type error_callback:
+        Callable[[list[bytes], Exception], bytes | None], optional
+
+    :param shared_memory: Read frames sent through shared memory and send
+        large replies the same way. Only enable it for endpoints reached
+        by trusted processes of the same host, e.g. IPC. Disabled by
+        default.
+    :type shared_memory: bool, optional
     """
 
     def __init__(
         self,
-        host: str,
-        port: int,
-        callback: Callable[[bytes], bytes | None],
+        host: Address,
+        port: int | None,
+        callback: Callable[[Frames], bytes | Frames | None],
         protocol: ProtocolType = TCP,
         workers: int = 1,
         through_broker: bool = False,
+        copy_threshold: int = COPY_THRESHOLD,
+        max_queue: int | None = None,
+        overload_callback: Callable[[Frames], bytes | None] | None = None,
+        hwm: int | None = None,
+        priority_callback: Callable[[Frames], int] | None = None,
+        control_callback: Callable[[Frames], bool] | None = None,
+        shared_memory: bool = False,
+        error_callback: (
+            Callable[[Frames, Exception], bytes | None] | None
+        ) = None,
     ) -> None:
-        self._host = host
-        self._port = port
+        self._endpoint = Endpoint(protocol, host, port)
         self._callback = callback
-        self._protocol = protocol
-        self._workers = workers
+        self._workers = max(workers, 1)
         self._through_broker = through_broker
+        self._copy_threshold = copy_threshold
+        self._max_queue = max_queue
+        self._overload_callback = overload_callback
+        self._hwm = hwm
+        self._priority_callback = priority_callback
+        self._control_callback = control_callback
+        self._shared_memory = shared_memory
+        self._error_callback = error_callback
+        self._in_flight = 0
+        self._detached: set[gevent.Greenlet] = set()
         self._is_active = False
+        self._queue: Queue = PriorityQueue() if priority_callback else Queue()
+        self._sequence = itertools.count()
+        self._send_lock = Semaphore()
+
+    @property
+    def in_flight(self) -> int:
+        """
+        Number of requests queued or being processed.
+        """
+        return self._in_flight
 
     def run(self) -> None:
         """
         Start the RPC server and listen for incoming requests.
         """
-        url_client = f"{self._protocol}://{self._host}:{self._port}"
+        url_client = self._endpoint.url
 
         logger.info(
-            f"Starting ZeroMQ RPC server on "
-            f"{self._protocol}://{self._host}:{self._port}"
+            f"Starting ZeroMQ RPC server on {url_client} "
+            f"with {self._workers} worker(s)"
         )
 
         self._start_worker(url_client, self._callback)
@@ -64,7 +188,7 @@ class ZeroMQRPCServer:
 
     def _start_worker(self, url_worker: str, callback: Callable) -> None:
         """
-        Worker function to process incoming messages.
+        Receive incoming messages and dispatch them to the worker pool.
 
         :param url_worker: The worker URL.
         :type url_worker: str
@@ -73,30 +197,327 @@ class ZeroMQRPCServer:
         :type callback: Callable
         """
         context = zmq.Context()
-        socket = context.socket(zmq.REP)
-        socket.bind(url_worker)
+        socket = context.socket(zmq.ROUTER)
+        socket.copy_threshold = self._copy_threshold
+
+        if self._hwm is not None:
+            socket.sndhwm = socket.rcvhwm = self._hwm
+
+        if self._through_broker:
+            socket.connect(url_worker)
+        else:
+            socket.bind(url_worker)
 
         self._is_active = True
 
-        while self._is_active:
-            message = socket.recv()
-            result: bytes | None = callback(message)
-            if result:
-                socket.send(result)
+        workers = [
+            gevent.spawn(self._process, socket, callback)
+            for _ in range(self._workers)
+        ]
+
+        try:
+            while self._is_active:
+                frames = recv_frames(socket, self._copy_threshold)
+
+                if self._control_callback and self._control(frames):
+                    continue
+
+                if self._max_queue and self._in_flight >= self._max_queue:
+                    self._reject(socket, frames)
+                    continue
 
-        socket.close()
-        context.term()
+                self._in_flight += 1
+                self._queue.put(self._queue_item(frames))
+        finally:
+            gevent.killall([*workers, *self._detached])
+            socket.close(linger=0)
+            context.term()
+
+    def _process(self, socket: zmq.Socket, callback: Callable) -> None:
+        """
+        Worker loop. Process queued requests one by one and route the
+        replies back to the caller.
+
+        :param socket: The ROUTER socket to reply on.
+        :type socket: zmq.Socket
+
+        :param callback: The function to process the messages.
+        :type callback: Callable
+        """
+        while True:
+            item = self._queue.get()
+            frames = item[-1] if self._priority_callback else item
+            detached = None
+
+            try:
+                detached = self._handle(socket, frames, callback)
+            finally:
+                if detached is None:
+                    self._in_flight -= 1
+                else:
+                    detached.link(self._release)
+
+    def _release(self, detached: gevent.Greenlet) -> None:
+        """
+        Finish the request whose reply was sent outside of the worker.
+        """
+        self._detached.discard(detached)
+        self._in_flight -= 1
+
+    def _queue_item(self, frames: list) -> Any:
+        """
+        Get the queue item of the request, ordered by the priority of the
+        request if priorities are enabled.
+
+        :param frames: The request frames.
+        :type frames: list
+        """
+        if not self._priority_callback:
+            return frames
+
+        _, body = split_envelope(frames)
+
+        try:
+            priority = self._priority_callback(body) if body else 0
+        except Exception as e:
+            logger.warning(f"Failed to get priority of request: {e}")
+            priority = 0
+
+        return -priority, next(self._sequence), frames
+
+    def _control(self, frames: list) -> bool:
+        """
+        Handle the control message.
+
+        :param frames: The message frames.
+        :type frames: list
+        :return: True if the message was handled.
+        """
+        _, body = split_envelope(frames)
+        body, _ = parse_trailer(body)
+
+        try:
+            return bool(body) and self._control_callback(body)  # type: ignore
+        except Exception as e:
+            logger.warning(f"Failed to handle control message: {e}")
+            return False
+
+    def _reject(self, socket: zmq.Socket, frames: list) -> None:
+        """
+        Reject the request over the queue limit.
+
+        :param socket: The ROUTER socket to reply on.
+        :type socket: zmq.Socket
+
+        :param frames: The request frames.
+        :type frames: list
+        """
+        logger.warning(
+            f"Server is overloaded ({self._in_flight} requests in flight), "
+            f"rejecting request"
+        )
+
+        if self._overload_callback:
+            self._handle(socket, frames, self._overload_callback)
+
+    def _handle(
+        self, socket: zmq.Socket, frames: list, callback: Callable
+    ) -> gevent.Greenlet | None:
+        """
+        Process the request and route the reply back to the caller.
+        Streamed replies and replies the callback finishes in its own
+        greenlet are sent by another greenlet, which is returned, so the
+        worker isn't held while the caller reads the stream.
+
+        :param socket: The ROUTER socket to reply on.
+        :type socket: zmq.Socket
+
+        :param frames: The request frames.
+        :type frames: list
+
+        :param callback: The function to process the messages.
+        :type callback: Callable
+        """
+        envelope, body = split_envelope(frames)
+
+        try:
+            body, threshold = self._attach(body)
+        except Exception as e:
+            logger.warning(f"Failed to read request: {e}")
+            self._reply_error(socket, envelope, body, e)
+            return None
+
+        if not body:
+            return None
+
+        try:
+            result: bytes | Frames | Iterator | None = callback(body)
+        except Exception as e:
+            logger.exception(f"Failed to process request: {e}")
+            return None
+
+        if isinstance(result, (gevent.Greenlet, Iterator)):
+            detached = gevent.spawn(
+                self._reply, socket, envelope, result, threshold
+            )
+            self._detached.add(detached)
+
+            return detached
+
+        self._reply(socket, envelope, result, threshold)
+
+        return None
+
+    def _reply_error(
+        self,
+        socket: zmq.Socket,
+        envelope: list,
+        body: list,
+        error: Exception,
+    ) -> None:
+        """
+        Reply to the request which can't be read with the reply built by
+        ``error_callback``.
+        """
+        if not self._error_callback or not body:
+            return None
+
+        try:
+            reply = self._error_callback(body, error)
+        except Exception as e:
+            logger.exception(f"Failed to build error reply: {e}")
+            return None
+
+        self._reply(socket, envelope, reply)
+
+    def _reply(
+        self,
+        socket: zmq.Socket,
+        envelope: list,
+        result: Any,
+        threshold: int | None = None,
+    ) -> None:
+        """
+        Send the result of the callback: one reply, replies of an iterator
+        one by one, or the value of a greenlet once it's ready.
+        """
+        try:
+            if isinstance(result, gevent.Greenlet):
+                result = result.get()
+
+            if isinstance(result, Iterator):
+                for reply in result:
+                    self._send(socket, envelope, reply, threshold)
+            elif result:
+                self._send(socket, envelope, result, threshold)
+        except Exception as e:
+            logger.exception(f"Failed to send reply: {e}")
+
+    def _attach(self, body: list) -> tuple[list, int | None]:
+        """
+        Read frames sent through shared memory, if it's enabled.
+
+        :return: body frames and the minimal size of reply frames sent
+            through shared memory, None if the caller doesn't read them
+        """
+        body, threshold = parse_trailer(body)
+
+        if not self._shared_memory:
+            if has_handles(body):
+                raise InvalidSegment("Shared memory is disabled")
+
+            return body, None
+
+        return get_segment_pool().attach(body), threshold
+
+    def _send(
+        self,
+        socket: zmq.Socket,
+        envelope: list,
+        reply: bytes | Frames,
+        threshold: int | None = None,
+    ) -> None:
+        """
+        Route the reply back to the caller.
+        """
+        frames = as_frames(reply)
+
+        if threshold is not None:
+            frames = get_segment_pool().share(frames, threshold)
+
+        with self._send_lock:
+            socket.send_multipart([*envelope, *frames], copy=False)
+
+
+class ZeroMQBroker:
+    """
+    A ROUTER/DEALER device sharing one bound endpoint between several RPC
+    servers. Servers connect to the backend with ``through_broker=True``
+    and requests are load balanced between them.
+
+    The device runs in a native thread, so forwarding doesn't compete with
+    greenlets of the current process. Its sockets are native ZeroMQ
+    sockets, because green sockets poll their state from the hub thread.
+
+    :param frontend: URL clients connect to.
+    :type frontend: str
+
+    :param backend: URL RPC servers connect to.
+    :type backend: str
+    """
+
+    def __init__(self, frontend: str, backend: str) -> None:
+        self._frontend = frontend
+        self._backend = backend
+        self._context: native_zmq.Context | None = None
+
+    def run(self) -> None:
+        """
+        Start the device in a native thread and wait until it's stopped.
+        """
+        logger.info(
+            f"Starting ZeroMQ broker on {self._frontend} -> {self._backend}"
+        )
+
+        self._context = native_zmq.Context()
+        frontend = self._context.socket(native_zmq.ROUTER)
+        frontend.bind(self._frontend)
+        backend = self._context.socket(native_zmq.DEALER)
+        backend.bind(self._backend)
+
+        threadpool = gevent.get_hub().threadpool
+        threadpool.spawn(self._proxy, frontend, backend).get()
+
+    def stop(self) -> None:
+        """
+        Stop the device.
+        """
+        if self._context:
+            self._context.term()
+            self._context = None
+
+    @staticmethod
+    def _proxy(
+        frontend: native_zmq.Socket, backend: native_zmq.Socket
+    ) -> None:
+        try:
+            native_zmq.proxy(frontend, backend)
+        except native_zmq.ContextTerminated:
+            pass
+        finally:
+            frontend.close(linger=0)
+            backend.close(linger=0)
 
 
 class ZeroMQSubscribeServer:
     """
     A ZeroMQ based Subscription server with multithreading support.
 
-    :param host: The host to connect to.
-    :type host: str
+    :param host: The host to connect to, or the socket path for IPC.
+    :type host: str | Path
 
-    :param port: The port to connect to.
-    :type port: int
+    :param port: The port to connect to, not used for IPC.
+    :type port: int | None
 
     :param callback: The function to process the incoming topic and messages.
     :type callback: Callable[[bytes, bytes], bytes]
@@ -115,26 +536,30 @@ class ZeroMQSubscribeServer:
 
     :param through_broker: Use broker or not.
     :type through_broker: bool, optional
+
+    :param copy_threshold: Messages of at least this many bytes are
+        received as memoryviews.
+    :type copy_threshold: int, optional
     """
 
     def __init__(
         self,
-        host: str,
-        port: int,
+        host: Address,
+        port: int | None,
         callback: Callable[[bytes, bytes], bytes],
         topics: list[str],
         protocol: ProtocolType = TCP,
         workers: int = 1,
         is_debug: bool = False,
         through_broker: bool = False,
+        copy_threshold: int = COPY_THRESHOLD,
     ) -> None:
-        self._host = host
-        self._port = port
+        self._endpoint = Endpoint(protocol, host, port)
         self._callback = callback
-        self._protocol = protocol
         self._workers = workers
         self._topics = topics
         self._through_broker = through_broker
+        self._copy_threshold = copy_threshold
         self._is_active = False
 
     def run(self) -> None:
@@ -149,12 +574,12 @@ class ZeroMQSubscribeServer:
         for topic in self._topics:
             socket.setsockopt(zmq.SUBSCRIBE, topic.encode())
 
-        socket.connect(f"{self._protocol}://{self._host}:{self._port}")
+        socket.connect(self._endpoint.url)
 
         self._is_active = True
 
         while self._is_active:
-            _topic, message = socket.recv_multipart()
+            _topic, message = recv_frames(socket, self._copy_threshold)
             result: bytes | None = self._callback(_topic, message)
             if result:
                 socket.send(result)
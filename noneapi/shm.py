@@ -0,0 +1,364 @@
+import atexit
+import itertools
+import mmap
+import os
+import re
+import struct
+import tempfile
+import time
+import weakref
+from dataclasses import dataclass
+from typing import Any
+
+from loguru import logger
+
+from .exceptions import InvalidSegment, SegmentExpired
+
+SHARED_MEMORY_THRESHOLD = 1024 * 1024
+
+_SEGMENT_MAGIC = b"\x00noneapi:segment"
+_TRAILER_MAGIC = b"\x00noneapi:shm-req"
+
+# Handle frame sent instead of the payload: magic, name, generation, size.
+_HANDLE = struct.Struct("16s64sQQ")
+# Trailer frame of requests whose sender reads shared replies: magic,
+# threshold.
+_TRAILER = struct.Struct("16sQ")
+# Header of the segment: reference count, reader pid, generation.
+_HEADER = struct.Struct("IIQ")
+
+_MIN_CAPACITY = 64 * 1024
+_PREFIX = "noneapi-"
+_NAME = re.compile(rf"{_PREFIX}\d+-\d+")
+
+
+def _default_directory() -> str:
+    if os.path.isdir("/dev/shm"):
+        return "/dev/shm"
+
+    return tempfile.gettempdir()
+
+
+def _is_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+
+    return True
+
+
+def build_trailer(threshold: int) -> bytes:
+    """
+    Build trailer frame of the request telling the receiver that the
+    sender reads replies from shared memory, and for which frame sizes.
+
+    :param threshold: minimal size of a reply frame in bytes sent through
+        shared memory
+    :return: bytes
+    """
+    return _TRAILER.pack(_TRAILER_MAGIC, threshold)
+
+
+def parse_trailer(frames: list[Any]) -> tuple[list[Any], int | None]:
+    """
+    Strip the trailer frame of the request, if it has one.
+
+    :param frames: request frames
+    :return: frames without the trailer and the threshold of the sender,
+        None if the sender doesn't read shared replies
+    """
+    if frames and len(frames[-1]) == _TRAILER.size:
+        magic, threshold = _TRAILER.unpack(frames[-1])
+
+        if magic == _TRAILER_MAGIC:
+            return frames[:-1], threshold
+
+    return frames, None
+
+
+def has_handles(frames: list[Any]) -> bool:
+    """
+    Check if any of the frames was sent through shared memory.
+
+    :param frames: received frames
+    :return: bool
+    """
+    return any(SegmentPool._is_handle(frame) for frame in frames)
+
+
+@dataclass
+class _Segment:
+    name: str
+    path: str
+    capacity: int
+    buffer: mmap.mmap
+    generation: int = 0
+    shared_at: float = 0.0
+
+
+class SegmentPool:
+    """
+    Process-wide pool of shared memory segments for frames sent to
+    processes on the same host.
+
+    A large frame is copied into a free segment once and only a small
+    handle travels over ZeroMQ, the receiver maps the segment and reads
+    the frame without copying. The segment stays in use until the
+    receiver drops the last view of the frame, e.g. an array created over
+    it, then it's reused for another frame of the same size class.
+
+    Segments are files in ``/dev/shm`` named by the pid of the writer.
+    Files left by crashed writers are removed when the pool is used first,
+    segments held by crashed readers, or never attached by the reader in
+    ``lease_timeout`` seconds, are reclaimed. A reader detects a segment
+    reclaimed before it was attached by its generation and raises
+    SegmentExpired.
+
+    :param directory: Directory of segment files, ``/dev/shm`` by default.
+    :param max_bytes: Total capacity of segments, frames over it are sent
+        through ZeroMQ as is.
+    :param lease_timeout: Seconds after which a segment which wasn't
+        attached by the reader is reclaimed.
+    """
+
+    def __init__(
+        self,
+        directory: str | None = None,
+        max_bytes: int = 1024 * 1024 * 1024,
+        lease_timeout: float = 60.0,
+    ) -> None:
+        self._directory = directory or _default_directory()
+        self._max_bytes = max_bytes
+        self._lease_timeout = lease_timeout
+        self._pid = os.getpid()
+        self._segments: list[_Segment] = []
+        self._names = itertools.count()
+        self._is_swept = False
+
+    @property
+    def size(self) -> int:
+        """
+        Total capacity of segments of the process in bytes.
+        """
+        return sum(segment.capacity for segment in self._segments)
+
+    def share(self, frames: list[Any], threshold: int) -> list[Any]:
+        """
+        Replace frames of at least ``threshold`` bytes with handles of
+        shared memory segments holding their copy.
+
+        :param frames: message frames, bytes or buffers
+        :param threshold: minimal size of the shared frame in bytes
+        :return: list of frames and handles
+        """
+        return [
+            self._share(frame)
+            if memoryview(frame).nbytes >= threshold
+            else frame
+            for frame in frames
+        ]
+
+    def attach(self, frames: list[Any]) -> list[Any]:
+        """
+        Replace handles with memoryviews over the shared memory segments.
+        The segment is released when the last view of it is dropped.
+
+        :param frames: received frames
+        :return: list of frames
+        """
+        return [
+            self._attach(frame) if self._is_handle(frame) else frame
+            for frame in frames
+        ]
+
+    def close(self) -> None:
+        """
+        Remove segments of the process. Readers keep their mappings.
+        """
+        if os.getpid() != self._pid:
+            return None
+
+        segments, self._segments = self._segments, []
+
+        for segment in segments:
+            try:
+                os.unlink(segment.path)
+            except OSError:
+                pass
+
+            try:
+                segment.buffer.close()
+            except BufferError:
+                pass
+
+    def _share(self, frame: Any) -> Any:
+        view = memoryview(frame).cast("B")
+        segment = self._acquire(view.nbytes)
+
+        if segment is None:
+            return frame
+
+        segment.generation += 1
+        segment.shared_at = time.monotonic()
+        _HEADER.pack_into(segment.buffer, 0, 1, 0, segment.generation)
+        start = _HEADER.size
+        segment.buffer[start:start + view.nbytes] = view
+
+        return _HANDLE.pack(
+            _SEGMENT_MAGIC,
+            segment.name.encode(),
+            segment.generation,
+            view.nbytes,
+        )
+
+    def _acquire(self, size: int) -> _Segment | None:
+        """
+        Get the smallest free segment fitting ``size`` bytes, create it if
+        there is none and the pool isn't full.
+        """
+        if os.getpid() != self._pid:
+            self._pid = os.getpid()
+            self._segments = []
+
+        if not self._is_swept:
+            self._is_swept = True
+            self._sweep()
+
+        free = [
+            segment
+            for segment in self._segments
+            if segment.capacity >= size and self._is_free(segment)
+        ]
+
+        if free:
+            return min(free, key=lambda segment: segment.capacity)
+
+        capacity = max(1 << (size - 1).bit_length(), _MIN_CAPACITY)
+
+        if self.size + capacity > self._max_bytes:
+            logger.debug("Shared memory is full, sending frame inline")
+            return None
+
+        name = f"{_PREFIX}{self._pid}-{next(self._names)}"
+        path = os.path.join(self._directory, name)
+        fd = os.open(path, os.O_CREAT | os.O_EXCL | os.O_RDWR, 0o600)
+
+        try:
+            os.ftruncate(fd, _HEADER.size + capacity)
+            buffer = mmap.mmap(fd, _HEADER.size + capacity)
+        finally:
+            os.close(fd)
+
+        segment = _Segment(name, path, capacity, buffer)
+        self._segments.append(segment)
+
+        return segment
+
+    def _is_free(self, segment: _Segment) -> bool:
+        references, reader, _ = _HEADER.unpack_from(segment.buffer, 0)
+
+        if not references:
+            return True
+
+        if reader:
+            return not _is_alive(reader)
+
+        return time.monotonic() - segment.shared_at > self._lease_timeout
+
+    def _sweep(self) -> None:
+        """
+        Remove segment files left by crashed processes.
+        """
+        try:
+            names = os.listdir(self._directory)
+        except OSError:
+            return None
+
+        for name in names:
+            if not name.startswith(_PREFIX):
+                continue
+
+            pid = name[len(_PREFIX):].split("-", 1)[0]
+
+            if pid.isdigit() and not _is_alive(int(pid)):
+                try:
+                    os.unlink(os.path.join(self._directory, name))
+                except OSError:
+                    pass
+
+    @staticmethod
+    def _is_handle(frame: Any) -> bool:
+        return (
+            len(frame) == _HANDLE.size
+            and bytes(frame[:len(_SEGMENT_MAGIC)]) == _SEGMENT_MAGIC
+        )
+
+    def _attach(self, handle: Any) -> memoryview:
+        _, name, generation, size = _HANDLE.unpack(handle)
+        path = self._path(name.rstrip(b"\0"))
+
+        try:
+            with open(path, "r+b") as file:
+                buffer = mmap.mmap(file.fileno(), 0)
+        except OSError as e:
+            raise SegmentExpired(f"Segment {path} is removed") from e
+
+        references, _, current = _HEADER.unpack_from(buffer, 0)
+
+        if current != generation:
+            raise SegmentExpired(f"Segment {path} is reused")
+
+        _HEADER.pack_into(buffer, 0, references, os.getpid(), generation)
+        release = weakref.finalize(buffer, _release, path, generation)
+        release.atexit = False
+
+        return memoryview(buffer)[_HEADER.size:_HEADER.size + size]
+
+    def _path(self, name: bytes) -> str:
+        """
+        Get the path of the segment named in a handle. Only names of
+        segments are accepted, so a handle can't point the reader at
+        another file.
+        """
+        if not _NAME.fullmatch(name.decode("ascii", "replace")):
+            raise InvalidSegment(f"Segment name {name!r} is invalid")
+
+        directory = os.path.realpath(self._directory)
+        path = os.path.realpath(os.path.join(directory, name.decode()))
+
+        if os.path.dirname(path) != directory:
+            raise InvalidSegment(f"Segment {path} is out of {directory}")
+
+        return path
+
+
+def _release(path: str, generation: int) -> None:
+    """
+    Mark the segment free, unless it was reclaimed in the meantime.
+    """
+    try:
+        fd = os.open(path, os.O_RDWR)
+    except OSError:
+        return None
+
+    try:
+        _, _, current = _HEADER.unpack(os.pread(fd, _HEADER.size, 0))
+
+        if current == generation:
+            os.pwrite(fd, _HEADER.pack(0, 0, generation), 0)
+    finally:
+        os.close(fd)
+
+
+_SEGMENTS = SegmentPool()
+atexit.register(_SEGMENTS.close)
+
+
+def get_segment_pool() -> SegmentPool:
+    """
+    Get process-wide pool of shared memory segments.
+    """
+    return _SEGMENTS
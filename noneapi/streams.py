@@ -0,0 +1,199 @@
+from collections.abc import Iterator
+from typing import Any, Callable
+
+from gevent.lock import Semaphore  # type: ignore
+from gevent.queue import Empty, Queue  # type: ignore
+
+from .exceptions import StreamInterrupted
+
+STREAM_HEADER = "stream"
+WINDOW_HEADER = "window"
+CREDIT_HEADER = "credit"
+UPLOAD_HEADER = "upload"
+END_HEADER = "end"
+
+STREAM_ITEM = "item"
+STREAM_END = "end"
+
+CREDIT_METHOD = "__credit__"
+CANCEL_METHOD = "__cancel__"
+CHUNK_METHOD = "__chunk__"
+CONTROL_METHODS = (CREDIT_METHOD, CANCEL_METHOD, CHUNK_METHOD)
+
+STREAM_WINDOW = 16
+STREAM_TIMEOUT = 60.0
+
+
+def is_stream(result: Any) -> bool:
+    """
+    Check whether the result of the RPC method is streamed item by item,
+    i.e. it's a generator or another iterator.
+    """
+    return isinstance(result, Iterator)
+
+
+class StreamCredit:
+    """
+    Credit of a response stream, the number of items the consumer is ready
+    to receive. The producer takes one credit per item and waits while
+    there is none, the consumer grants more as it processes items, so no
+    more than ``window`` items are buffered between them.
+
+    :param window: Initial credit.
+    """
+
+    def __init__(self, window: int) -> None:
+        self._credit = Semaphore(max(window, 1))
+        self.cancelled = False
+
+    def grant(self, credit: int) -> None:
+        """
+        Allow the producer to send ``credit`` more items.
+        """
+        for _ in range(credit):
+            self._credit.release()
+
+    def cancel(self) -> None:
+        """
+        Stop the stream, the consumer doesn't need more items.
+        """
+        self.cancelled = True
+        self._credit.release()
+
+    def take(self, timeout: float | None = None) -> bool:
+        """
+        Take credit for one item, wait until the consumer grants it.
+
+        :param timeout: seconds to wait, wait forever if not set.
+        :return: False if the stream is cancelled or no credit was granted
+            in time.
+        """
+        return self._credit.acquire(timeout=timeout) and not self.cancelled
+
+
+_END = object()
+_CANCELLED = object()
+
+
+class Upload(Iterator):
+    """
+    Iterator over chunks uploaded by the caller, passed to the RPC method
+    as its first argument. Credit for more chunks is granted to the caller
+    as chunks are consumed, so no more than ``window`` of them are buffered.
+    Chunks are parsed when they are consumed, not when they arrive.
+
+    :param window: Maximum number of chunks sent ahead.
+    :param timeout: Seconds to wait for every chunk.
+    :param grant: Function granting the caller credit for more chunks.
+    :param parse: Function parsing raw frames of the chunk encoded with the
+        named serializer.
+    """
+
+    def __init__(
+        self,
+        window: int,
+        timeout: float | None,
+        grant: Callable[[int], None],
+        parse: Callable[[list[Any], str | None], Any],
+    ) -> None:
+        self._window = max(window, 1)
+        self._credit = max(self._window // 2, 1)
+        self._timeout = timeout
+        self._grant = grant
+        self._parse = parse
+        self._chunks = Queue()
+        self._started = False
+        self._consumed = 0
+        self._done = False
+
+    def put(self, frames: list[Any], serializer: str | None = None) -> None:
+        """
+        Add raw frames of the chunk received from the caller.
+        """
+        self._chunks.put((frames, serializer))
+
+    def end(self) -> None:
+        """
+        Mark the upload finished by the caller.
+        """
+        self._chunks.put(_END)
+
+    def cancel(self) -> None:
+        """
+        Mark the upload cancelled by the caller.
+        """
+        self._chunks.put(_CANCELLED)
+
+    def __next__(self) -> Any:
+        if self._done:
+            raise StopIteration
+
+        if not self._started:
+            self._started = True
+            self._grant(self._window)
+
+        try:
+            chunk = self._chunks.get(timeout=self._timeout)
+        except Empty:
+            self._done = True
+            raise StreamInterrupted(
+                f"No chunk uploaded in {self._timeout}s"
+            ) from None
+
+        if chunk is _END:
+            self._done = True
+            raise StopIteration
+
+        if chunk is _CANCELLED:
+            self._done = True
+            raise StreamInterrupted("Upload is cancelled by the caller")
+
+        self._consumed += 1
+
+        if self._consumed >= self._credit:
+            self._grant(self._consumed)
+            self._consumed = 0
+
+        return self._parse(*chunk)
+
+
+class HeldStream(Iterator):
+    """
+    Items of the generator method holding a resource, e.g. a slot of
+    ``max_concurrency``, until the stream is exhausted, fails or is
+    closed. Released once, whichever comes first.
+
+    :param items: Items of the method.
+    :param release: Function releasing the resource.
+    """
+
+    def __init__(self, items: Iterator, release: Callable[[], None]) -> None:
+        self._items = items
+        self._release: Callable[[], None] | None = release
+
+    def __next__(self) -> Any:
+        if self._release is None:
+            raise StopIteration
+
+        try:
+            return next(self._items)
+        except BaseException:
+            self.close()
+            raise
+
+    def close(self) -> None:
+        """
+        Close the items and release the resource.
+        """
+        release, self._release = self._release, None
+
+        if release is None:
+            return
+
+        try:
+            close = getattr(self._items, "close", None)
+
+            if close:
+                close()
+        finally:
+            release()
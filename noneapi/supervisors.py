@@ -0,0 +1,119 @@
+import multiprocessing
+from multiprocessing.connection import wait
+from multiprocessing.process import BaseProcess
+from typing import Any, Callable
+
+import gevent  # type: ignore
+from loguru import logger
+
+
+class ProcessSupervisor:
+    """
+    Keep a fixed number of worker processes alive.
+
+    Workers are started with the ``spawn`` start method, so every worker
+    gets a fresh interpreter with its own gevent hub and ZeroMQ context
+    instead of inheriting the state of the supervising process. A worker
+    that exits with a non-zero code is started again.
+
+    :param target: Function run by each worker process. It receives the
+        worker index as the last positional argument.
+    :type target: Callable
+
+    :param processes: Number of worker processes.
+    :type processes: int
+
+    :param args: Positional arguments passed to the target.
+    :type args: tuple, optional
+    """
+
+    LOOP_WAIT_TIME = 0.5
+
+    def __init__(
+        self,
+        target: Callable,
+        processes: int,
+        args: tuple[Any, ...] = (),
+    ) -> None:
+        self._target = target
+        self._processes = processes
+        self._args = args
+        self._context = multiprocessing.get_context("spawn")
+        self._workers: dict[int, BaseProcess] = {}
+        self._is_active = False
+
+    @property
+    def pids(self) -> list[int | None]:
+        """
+        Process ids of the current workers.
+        """
+        return [worker.pid for worker in self._workers.values()]
+
+    def run(self) -> None:
+        """
+        Start the workers and restart them whenever they crash.
+        """
+        self._is_active = True
+
+        for index in range(self._processes):
+            self._start_worker(index)
+
+        while self._is_active:
+            gevent.sleep(self.LOOP_WAIT_TIME)
+
+            for index, worker in list(self._workers.items()):
+                if not self._is_active or not self._is_dead(worker):
+                    continue
+
+                if worker.exitcode == 0:
+                    logger.info(f"Worker process {worker.pid} is finished")
+                    del self._workers[index]
+                    continue
+
+                logger.info(
+                    f"Worker process {worker.pid} is dead "
+                    f"(exit code {worker.exitcode})"
+                )
+                self._start_worker(index)
+
+            if not self._workers:
+                break
+
+        self._is_active = False
+
+    def stop(self) -> None:
+        """
+        Stop the supervisor and terminate all workers.
+        """
+        self._is_active = False
+
+        for worker in self._workers.values():
+            if worker.exitcode is None:
+                worker.terminate()
+
+        for worker in self._workers.values():
+            worker.join(timeout=self.LOOP_WAIT_TIME)
+
+        self._workers = {}
+
+    @staticmethod
+    def _is_dead(worker: BaseProcess) -> bool:
+        """
+        Check whether the worker process has exited. The sentinel is used
+        besides the exit code, because gevent may reap child processes
+        before multiprocessing gets their exit code.
+        """
+        return worker.exitcode is not None or bool(
+            wait([worker.sentinel], timeout=0)
+        )
+
+    def _start_worker(self, index: int) -> None:
+        """
+        Start the worker process with the given index.
+        """
+        worker = self._context.Process(
+            target=self._target, args=(*self._args, index), daemon=True
+        )
+        worker.start()
+        self._workers[index] = worker
+        logger.info(f"Worker process {worker.pid} is started")
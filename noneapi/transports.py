@@ -1,22 +1,629 @@
+import itertools
+import os
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from pathlib import Path
 from typing import Any, Literal, Protocol, cast, runtime_checkable
 
+import gevent  # type: ignore
 import zmq.green as zmq
+from gevent.event import AsyncResult  # type: ignore
+from gevent.greenlet import Greenlet  # type: ignore
+from gevent.lock import Semaphore  # type: ignore
+from gevent.queue import Queue  # type: ignore
+from loguru import logger
+
+from .exceptions import ConnectionClosed, RequestTimeout
+from .shm import build_trailer, get_segment_pool
 
 TCP = cast(Literal["tcp"], "tcp")
 INPROC = cast(Literal["inproc"], "inproc")
+IPC = cast(Literal["ipc"], "ipc")
+
+ProtocolType = Literal["tcp", "inproc", "ipc"]
+Address = str | Path
+Frames = list[bytes]
+Reply = bytes | memoryview | list[Any]
+
+COPY_THRESHOLD = 64 * 1024
+
+
+@dataclass(frozen=True)
+class Endpoint:
+    """
+    ZeroMQ endpoint. TCP endpoints are addressed by host and port, IPC
+    endpoints by the path of the socket file and inproc endpoints by name,
+    so the port of IPC endpoints is ignored and it's optional for inproc
+    ones.
+
+    :param protocol: type of protocol
+    :param host: host, IPC socket path or inproc name
+    :param port: port, not used for IPC
+    """
+
+    protocol: ProtocolType
+    host: Address
+    port: int | None = None
+
+    def __post_init__(self) -> None:
+        if self.protocol not in (TCP, INPROC, IPC):
+            raise ValueError(f"Unknown protocol {self.protocol}")
+
+        if self.protocol == TCP and self.port is None:
+            raise ValueError(f"TCP endpoint {self.host} requires a port")
+
+        object.__setattr__(self, "host", os.fspath(self.host))
+
+        if self.protocol == IPC:
+            object.__setattr__(self, "port", None)
+
+    def __str__(self) -> str:
+        return self.url
+
+    @property
+    def url(self) -> str:
+        """
+        ZeroMQ URL of the endpoint.
+        """
+        if self.port is None:
+            return f"{self.protocol}://{self.host}"
+
+        return f"{self.protocol}://{self.host}:{self.port}"
+
+    @classmethod
+    def parse(cls, url: str) -> "Endpoint":
+        """
+        Parse ZeroMQ URL, e.g. ``tcp://127.0.0.1:5555`` or
+        ``ipc:///run/orders.sock``.
+
+        :param url: ZeroMQ URL
+        :return: Endpoint
+        """
+        protocol, _, address = url.partition("://")
+
+        if not address:
+            raise ValueError(f"Invalid endpoint {url}")
+
+        if protocol == TCP:
+            host, _, port = address.rpartition(":")
+
+            if not host or not port.isdigit():
+                raise ValueError(f"Invalid endpoint {url}")
+
+            return cls(TCP, host, int(port))
+
+        return cls(cast(ProtocolType, protocol), address)
+
+
+def build_url(
+    protocol: ProtocolType, host: Address, port: int | None
+) -> str:
+    """
+    Build ZeroMQ endpoint URL, see Endpoint.
+
+    :param protocol: type of protocol
+    :param host: host, IPC socket path or inproc name
+    :param port: port, not used for IPC
+    :return: str
+    """
+    return Endpoint(protocol, host, port).url
+
+
+def as_frames(data: bytes | Frames) -> Frames:
+    """
+    Get message frames of single frame or multipart data.
+    """
+    if isinstance(data, list):
+        return data
+
+    return [data]
+
+
+def recv_frames(
+    socket: zmq.Socket, copy_threshold: int = COPY_THRESHOLD
+) -> list[Any]:
+    """
+    Receive multipart message without copying large frames. Frames of at
+    least ``copy_threshold`` bytes are returned as memoryviews over the
+    ZeroMQ message, smaller ones are copied to ``bytes``, which is faster
+    for them.
+
+    :param socket: socket to receive from
+    :param copy_threshold: minimal size of the frame in bytes which isn't
+        copied
+    :return: list of bytes and memoryviews
+    """
+    return [
+        frame.buffer if len(frame) >= copy_threshold else frame.bytes
+        for frame in socket.recv_multipart(copy=False)
+    ]
+
+
+_correlation_ids = itertools.count(1)
+
+
+def next_correlation_id() -> int:
+    """
+    Get process-wide unique id used to match replies with requests.
+    """
+    return next(_correlation_ids)
+
+
+class ZeroMQConnection:
+    """
+    Multiplexed client connection to one endpoint.
+
+    Requests are sent over a single DEALER socket tagged with their
+    correlation id, so any number of them can be in flight at once. A
+    receiver greenlet resolves pending results as replies arrive, in any
+    order. Results are resolved with the reply frame, or with the list of
+    frames if the reply has several of them.
+
+    A stream request gets any number of replies, they are put to its queue
+    until the stream is closed.
+
+    With ``shared_memory_threshold`` set, request frames of at least that
+    many bytes are sent through shared memory and the remote endpoint is
+    asked to send large reply frames the same way, see SegmentPool. Only
+    replies to such requests are read from shared memory.
+
+    :param context: ZeroMQ context to create the socket in.
+    :param url: Endpoint URL.
+    """
+
+    def __init__(self, context: zmq.Context, url: str) -> None:
+        self._url = url
+        self._socket: zmq.Socket = context.socket(zmq.DEALER)
+        self._socket.copy_threshold = COPY_THRESHOLD
+        self._socket.connect(url)
+        self._pending: dict[bytes, AsyncResult] = {}
+        self._streams: dict[bytes, Queue] = {}
+        # Requests whose replies may be sent through shared memory.
+        self._shared: set[bytes] = set()
+        self._send_lock = Semaphore()
+        self._receiver: Greenlet | None = None
+
+    @property
+    def pending(self) -> int:
+        """
+        Number of requests waiting for the reply, including open streams.
+        """
+        return len(self._pending) + len(self._streams)
+
+    def request(
+        self,
+        correlation_id: int,
+        data: bytes | Frames,
+        shared_memory_threshold: int | None = None,
+    ) -> AsyncResult:
+        """
+        Send request and return the result resolved with the reply.
+
+        :param correlation_id: id of the request
+        :param data: request data, one or several frames
+        :param shared_memory_threshold: minimal size of frames in bytes sent
+            through shared memory, not used if not set
+        :return: AsyncResult
+        """
+        key = correlation_id.to_bytes(8, "big")
+        response = AsyncResult()
+        self._pending[key] = response
+
+        if shared_memory_threshold is not None:
+            self._shared.add(key)
+
+        self.send(correlation_id, data, shared_memory_threshold)
+
+        return response
+
+    def stream(
+        self,
+        correlation_id: int,
+        data: bytes | Frames,
+        shared_memory_threshold: int | None = None,
+    ) -> Queue:
+        """
+        Send stream request and return the queue of its replies. The stream
+        is open until ``close_stream`` is called.
+
+        :param correlation_id: id of the request
+        :param data: request data, one or several frames
+        :param shared_memory_threshold: minimal size of frames in bytes sent
+            through shared memory, not used if not set
+        :return: Queue of replies
+        """
+        key = correlation_id.to_bytes(8, "big")
+        replies = Queue()
+        self._streams[key] = replies
+
+        if shared_memory_threshold is not None:
+            self._shared.add(key)
+
+        self.send(correlation_id, data, shared_memory_threshold)
+
+        return replies
+
+    def send(
+        self,
+        correlation_id: int,
+        data: bytes | Frames,
+        shared_memory_threshold: int | None = None,
+    ) -> None:
+        """
+        Send message without waiting for the reply.
+
+        :param correlation_id: id of the message
+        :param data: message data, one or several frames
+        :param shared_memory_threshold: minimal size of frames in bytes sent
+            through shared memory, not used if not set
+        """
+        frames = as_frames(data)
+
+        if shared_memory_threshold is not None:
+            frames = [
+                *get_segment_pool().share(frames, shared_memory_threshold),
+                build_trailer(shared_memory_threshold),
+            ]
+
+        if not self._receiver:
+            self._receiver = gevent.spawn(self._receive)
+
+        with self._send_lock:
+            self._socket.send_multipart(
+                [correlation_id.to_bytes(8, "big"), b"", *frames],
+                copy=False,
+            )
+
+    def close_stream(self, correlation_id: int) -> None:
+        """
+        Close the stream, further replies to it will be dropped.
+
+        :param correlation_id: id of the stream request
+        """
+        key = correlation_id.to_bytes(8, "big")
+        self._streams.pop(key, None)
+        self._shared.discard(key)
+
+    def discard(self, correlation_id: int) -> None:
+        """
+        Forget the pending request, a late reply to it will be dropped.
+
+        :param correlation_id: id of the request
+        """
+        key = correlation_id.to_bytes(8, "big")
+        self._pending.pop(key, None)
+        self._shared.discard(key)
+
+    def close(self) -> None:
+        """
+        Close the connection and fail all pending requests. Open streams
+        get the ConnectionClosed error as the last reply.
+        """
+        if self._receiver:
+            self._receiver.kill()
+            self._receiver = None
+
+        pending, self._pending = self._pending, {}
+        self._shared.clear()
+
+        for response in pending.values():
+            response.set_exception(ConnectionClosed(self._url))
+
+        streams, self._streams = self._streams, {}
+
+        for replies in streams.values():
+            replies.put(ConnectionClosed(self._url))
+
+        self._socket.close(linger=0)
+
+    def _receive(self) -> None:
+        """
+        Receiver loop. Resolve pending requests with their replies and put
+        replies of streams to their queues. Frames are read from shared
+        memory only for requests which asked for it, a reply which can't
+        be read fails its request.
+        """
+        segments = get_segment_pool()
+
+        while True:
+            frames = recv_frames(self._socket)
+            key = frames[0]
+            reply: Any
+
+            try:
+                if key in self._shared:
+                    frames = segments.attach(frames)
+
+                reply = frames[2] if len(frames) == 3 else frames[2:]
+            except Exception as e:
+                logger.warning(f"Failed to read reply from {self._url}: {e}")
+                reply = e
+
+            replies = self._streams.get(key)
+
+            if replies is not None:
+                replies.put(reply)
+                continue
+
+            response = self._pending.pop(key, None)
+            self._shared.discard(key)
+
+            if response is None:
+                continue
+
+            if isinstance(reply, Exception):
+                response.set_exception(reply)
+            else:
+                response.set(reply)
+
+
+@dataclass(frozen=True)
+class PoolStats:
+    """
+    Connection pool statistics.
+    """
+
+    size: int
+    in_flight: int
+    created: int
+    reused: int
+    evicted: int
+
+
+class ConnectionPool:
+    """
+    Process-wide pool of multiplexed client connections.
+
+    Connections are keyed by their Endpoint and shared by all proxies and
+    protocols, so the first call to an endpoint doesn't pay for socket
+    setup once the endpoint is connected and the number of open
+    sockets doesn't grow with the number of proxies.
+
+    When the pool is full the least recently used connection without
+    in-flight requests is closed. If every connection is busy the pool
+    grows over its limit until some of them become idle.
+
+    :param max_size: Maximum number of connections.
+    :type max_size: int
+
+    :param idle_timeout: Seconds after which an unused connection is closed.
+    :type idle_timeout: float
+    """
+
+    def __init__(self, max_size: int = 1024, idle_timeout: float = 300.0):
+        self._max_size = max_size
+        self._idle_timeout = idle_timeout
+        self._context = zmq.Context.instance()
+        self._connections: OrderedDict[Endpoint, ZeroMQConnection] = (
+            OrderedDict()
+        )
+        self._last_used: dict[Endpoint, float] = {}
+        self._last_eviction = time.monotonic()
+        self._created = 0
+        self._reused = 0
+        self._evicted = 0
+
+    @property
+    def stats(self) -> PoolStats:
+        """
+        Current pool statistics.
+        """
+        return PoolStats(
+            size=len(self._connections),
+            in_flight=sum(
+                connection.pending
+                for connection in self._connections.values()
+            ),
+            created=self._created,
+            reused=self._reused,
+            evicted=self._evicted,
+        )
+
+    def get(
+        self, host: Address, port: int | None, protocol: ProtocolType = TCP
+    ) -> ZeroMQConnection:
+        """
+        Get connection to the endpoint, connect if it isn't connected yet.
+
+        :param host: host, IPC socket path or inproc name to connect
+        :param port: port to connect
+        :param protocol: type of protocol
+        :return: ZeroMQConnection
+        """
+        key = Endpoint(protocol, host, port)
+        now = time.monotonic()
 
-ProtocolType = Literal["tcp", "inproc"]
+        if now - self._last_eviction > self._idle_timeout:
+            self.evict_idle(now)
+
+        connection = self._connections.get(key)
+
+        if connection:
+            self._connections.move_to_end(key)
+            self._reused += 1
+        else:
+            if len(self._connections) >= self._max_size:
+                self._evict_lru()
+
+            connection = ZeroMQConnection(self._context, key.url)
+            self._connections[key] = connection
+            self._created += 1
+
+        self._last_used[key] = now
+
+        return connection
+
+    def connect(
+        self, host: Address, port: int | None, protocol: ProtocolType = TCP
+    ) -> None:
+        """
+        Connect to the endpoint ahead of the first call.
+
+        :param host: host to connect
+        :param port: port to connect
+        :param protocol: type of protocol
+        """
+        self.get(host, port, protocol)
+
+    def reset(
+        self, host: Address, port: int | None, protocol: ProtocolType = TCP
+    ) -> bool:
+        """
+        Close connection to the endpoint, so the next request reconnects.
+        A connection with in-flight requests is kept, closing it would fail
+        requests of other callers.
+
+        :param host: host of the connection
+        :param port: port of the connection
+        :param protocol: type of protocol
+        :return: True if the connection was closed.
+        """
+        key = Endpoint(protocol, host, port)
+        connection = self._connections.get(key)
+
+        if not connection or connection.pending:
+            return False
+
+        self._close(key)
+
+        return True
+
+    def evict_idle(self, now: float | None = None) -> int:
+        """
+        Close connections that were not used for ``idle_timeout`` seconds.
+
+        :return: Number of closed connections.
+        """
+        now = now or time.monotonic()
+        self._last_eviction = now
+
+        idle = [
+            key
+            for key, connection in self._connections.items()
+            if not connection.pending
+            and now - self._last_used[key] > self._idle_timeout
+        ]
+
+        for key in idle:
+            self._close(key)
+
+        return len(idle)
+
+    def close(self) -> None:
+        """
+        Close all connections.
+        """
+        for key in list(self._connections):
+            self._close(key)
+
+    def _evict_lru(self) -> None:
+        for key, connection in self._connections.items():
+            if not connection.pending:
+                self._close(key)
+                return
+
+        logger.warning(
+            f"Connection pool is full ({self._max_size}) and all "
+            f"connections are busy"
+        )
+
+    def _close(self, key: Endpoint) -> None:
+        connection = self._connections.pop(key)
+        del self._last_used[key]
+        connection.close()
+        self._evicted += 1
+
+
+_POOL = ConnectionPool()
+
+
+def get_pool() -> ConnectionPool:
+    """
+    Get process-wide connection pool.
+    """
+    return _POOL
 
 
 @runtime_checkable
 class BaseTransport(Protocol):
     def request(
-        self, host: str, port: int, data: bytes, protocol: ProtocolType = TCP
-    ) -> bytes:
+        self,
+        host: Address,
+        port: int | None,
+        data: bytes | Frames,
+        protocol: ProtocolType = TCP,
+        timeout: float | None = None,
+        retries: int | None = None,
+        correlation_id: int | None = None,
+        deadline: float | None = None,
+    ) -> Reply:
         """
         Send request to the remote endpoint. Low level method.
         Uses by client for making requests.
 
+        :arg data: data to send
+        :arg host: host to send
+        :arg port: port to send
+        :arg protocol: protocol to use
+        :arg timeout: seconds to wait for the reply of one attempt
+        :arg retries: number of retries after a timeout
+        :arg correlation_id: id of the request
+        :arg deadline: absolute deadline of all attempts, unix time
+        """
+        ...
+
+    def request_async(
+        self,
+        host: Address,
+        port: int | None,
+        data: bytes | Frames,
+        protocol: ProtocolType = TCP,
+        correlation_id: int | None = None,
+    ) -> AsyncResult:
+        """
+        Send request to the remote endpoint without waiting for the reply.
+        Uses by client for making concurrent requests.
+
+        :arg data: data to send
+        :arg host: host to send
+        :arg port: port to send
+        :arg protocol: protocol to use
+        :arg correlation_id: id of the request
+        """
+        ...
+
+    def request_stream(
+        self,
+        host: Address,
+        port: int | None,
+        data: bytes | Frames,
+        protocol: ProtocolType = TCP,
+        correlation_id: int | None = None,
+    ) -> Queue:
+        """
+        Send stream request to the remote endpoint. Uses by client for
+        receiving streamed responses.
+
+        :arg data: data to send
+        :arg host: host to send
+        :arg port: port to send
+        :arg protocol: protocol to use
+        :arg correlation_id: id of the request
+        """
+        ...
+
+    def notify(
+        self,
+        host: Address,
+        port: int | None,
+        data: bytes | Frames,
+        protocol: ProtocolType = TCP,
+    ) -> None:
+        """
+        Send message to the remote endpoint which isn't replied. Uses by
+        client for controlling streams.
+
         :arg data: data to send
         :arg host: host to send
         :arg port: port to send
@@ -26,8 +633,8 @@ class BaseTransport(Protocol):
 
     def dispatch(
         self,
-        host: str,
-        port: int,
+        host: Address,
+        port: int | None,
         topic: str,
         data: bytes,
         protocol: ProtocolType = TCP,
@@ -48,9 +655,9 @@ class BaseTransport(Protocol):
 
     @staticmethod
     def send(
-        data: bytes,
+        data: bytes | Frames,
         protocol: ProtocolType = TCP,
-        host: str | None = None,
+        host: Address | None = None,
         port: int | None = None,
         socket: Any = None,
     ) -> Any:
@@ -67,7 +674,7 @@ class BaseTransport(Protocol):
         ...
 
     @staticmethod
-    def receive(socket: Any) -> bytes:
+    def receive(socket: Any) -> bytes | memoryview:
         """
         Receive data from the remote endpoint. Low level method.
         Uses by server for receiving requests.
@@ -77,44 +684,224 @@ class BaseTransport(Protocol):
 
 class ZeroMQTransport(BaseTransport):
     REQUEST_TIMEOUT = 2500
-    REQUEST_RETRIES = 3
+    REQUEST_RETRIES = 0
     WAIT_TIME = 100
 
     """
     Base class for all transports. It just sent and receive data.
+
+    With ``shared_memory_threshold`` set, frames of at least that many
+    bytes are sent to endpoints on the same host through shared memory,
+    replies too.
     """
 
-    def __init__(self, is_debug: bool = False) -> None:
-        self._context = zmq.Context()
+    def __init__(
+        self,
+        is_debug: bool = False,
+        shared_memory_threshold: int | None = None,
+    ) -> None:
+        self._context = zmq.Context.instance()
         self._pub_event_socket: zmq.Socket | None = None
-        self._request_socket: zmq.Socket | None = None
         self._is_debug = is_debug
+        self._shared_memory_threshold = shared_memory_threshold
 
     def request(
-        self, host: str, port: int, data: bytes, protocol: ProtocolType = TCP
-    ) -> bytes:
+        self,
+        host: Address,
+        port: int | None,
+        data: bytes | Frames,
+        protocol: ProtocolType = TCP,
+        timeout: float | None = None,
+        retries: int | None = None,
+        correlation_id: int | None = None,
+        deadline: float | None = None,
+    ) -> Reply:
         """
         Send request to the remote endpoint. Low level method.
+
+        Implements the Lazy Pirate pattern: if no reply arrives within the
+        timeout, the connection is reset (unless other requests are in
+        flight on it) and the request is sent again. A late reply to any
+        attempt is accepted, since all of them share the correlation id.
+        A retry runs the remote method again if the first attempt was only
+        slow, so requests aren't retried by default, pass ``retries`` for
+        idempotent methods only.
+
+        :param host: host to send
+        :param port: port to send
+        :param data: request data, one or several frames
+        :param protocol: type of protocol
+        :param timeout: seconds to wait for the reply of one attempt,
+            ``REQUEST_TIMEOUT`` milliseconds by default
+        :param retries: number of retries after a timeout,
+            ``REQUEST_RETRIES`` by default
+        :param correlation_id: id of the request, generated if not set
+        :param deadline: absolute deadline of all attempts, unix time. No
+            attempt waits past it.
+        :return: reply frame, memoryview if it is large, or the list of
+            frames of a multipart reply
+        """
+        if timeout is None:
+            timeout = self.REQUEST_TIMEOUT / 1000
+
+        if retries is None:
+            retries = self.REQUEST_RETRIES
+
+        if correlation_id is None:
+            correlation_id = next_correlation_id()
+
+        pool = get_pool()
+        attempts = 0
+
+        for attempt in range(retries + 1):
+            attempt_timeout = timeout
+
+            if deadline is not None:
+                attempt_timeout = min(timeout, deadline - time.time())
+
+                if attempt_timeout <= 0:
+                    break
+
+            connection = pool.get(host, port, protocol)
+            response = connection.request(
+                correlation_id, data, self._shared_memory_threshold
+            )
+            attempts += 1
+
+            try:
+                return response.get(timeout=attempt_timeout)
+            except gevent.Timeout:
+                connection.discard(correlation_id)
+                pool.reset(host, port, protocol)
+            except BaseException:
+                # The caller is killed or the connection is closed, nobody
+                # waits for the reply anymore.
+                connection.discard(correlation_id)
+                raise
+
+            if attempt < retries:
+                logger.warning(
+                    f"No reply from {build_url(protocol, host, port)}, "
+                    f"retrying ({attempt + 1}/{retries})"
+                )
+                gevent.sleep(self.WAIT_TIME / 1000)
+
+        url = build_url(protocol, host, port)
+
+        raise RequestTimeout.no_reply(url, timeout, attempts)
+
+    def request_async(
+        self,
+        host: Address,
+        port: int | None,
+        data: bytes | Frames,
+        protocol: ProtocolType = TCP,
+        correlation_id: int | None = None,
+    ) -> AsyncResult:
+        """
+        Send request to the remote endpoint without waiting for the reply.
+        Requests to the same endpoint share one multiplexed connection from
+        the process-wide connection pool.
+        :param host: host to send
+        :param port: port to send
+        :param data: request data, one or several frames
+        :param protocol: type of protocol
+        :param correlation_id: id of the request, generated if not set
+        :return: AsyncResult resolved with the reply
+        """
+        connection = get_pool().get(host, port, protocol)
+
+        if correlation_id is None:
+            correlation_id = next_correlation_id()
+
+        return connection.request(
+            correlation_id, data, self._shared_memory_threshold
+        )
+
+    def request_stream(
+        self,
+        host: Address,
+        port: int | None,
+        data: bytes | Frames,
+        protocol: ProtocolType = TCP,
+        correlation_id: int | None = None,
+    ) -> Queue:
+        """
+        Send stream request to the remote endpoint. Replies are put to the
+        queue as they arrive, until the stream is closed with
+        ``close_stream``.
         :param host: host to send
         :param port: port to send
-        :param data: request data
+        :param data: request data, one or several frames
         :param protocol: type of protocol
-        :return: Optional[bytes]
+        :param correlation_id: id of the request, generated if not set
+        :return: Queue of replies
         """
+        connection = get_pool().get(host, port, protocol)
 
-        if not self._request_socket:
-            self._request_socket = self._context.socket(zmq.REQ)
-            self._request_socket.connect(f"{protocol}://{host}:{port}")
+        if correlation_id is None:
+            correlation_id = next_correlation_id()
+
+        return connection.stream(
+            correlation_id, data, self._shared_memory_threshold
+        )
+
+    def close_stream(
+        self,
+        host: Address,
+        port: int | None,
+        correlation_id: int,
+        protocol: ProtocolType = TCP,
+    ) -> None:
+        """
+        Close the stream, further replies to it will be dropped.
+        :param host: host of the stream
+        :param port: port of the stream
+        :param correlation_id: id of the stream request
+        :param protocol: type of protocol
+        """
+        get_pool().get(host, port, protocol).close_stream(correlation_id)
 
-        self._request_socket.send(data)
-        message = self._request_socket.recv()
+    def discard(
+        self,
+        host: Address,
+        port: int | None,
+        correlation_id: int,
+        protocol: ProtocolType = TCP,
+    ) -> None:
+        """
+        Forget the pending request, a late reply to it will be dropped.
+        :param host: host of the request
+        :param port: port of the request
+        :param correlation_id: id of the request
+        :param protocol: type of protocol
+        """
+        get_pool().get(host, port, protocol).discard(correlation_id)
 
-        return message
+    def notify(
+        self,
+        host: Address,
+        port: int | None,
+        data: bytes | Frames,
+        protocol: ProtocolType = TCP,
+    ) -> None:
+        """
+        Send message to the remote endpoint which isn't replied, e.g.
+        credit of a stream.
+        :param host: host to send
+        :param port: port to send
+        :param data: message data, one or several frames
+        :param protocol: type of protocol
+        """
+        connection = get_pool().get(host, port, protocol)
+        connection.send(
+            next_correlation_id(), data, self._shared_memory_threshold
+        )
 
     def dispatch(
         self,
-        host: str,
-        port: int,
+        host: Address,
+        port: int | None,
         topic: str,
         data: bytes,
         protocol: ProtocolType = TCP,
@@ -122,35 +909,40 @@ class ZeroMQTransport(BaseTransport):
     ) -> None:
         if not self._pub_event_socket:
             self._pub_event_socket = self._context.socket(zmq.PUB)
+            url = build_url(protocol, host, port)
+
             if through_broker:
-                self._pub_event_socket.connect(f"{protocol}://{host}:{port}")
+                self._pub_event_socket.connect(url)
             else:
-                self._pub_event_socket.bind(f"{protocol}://{host}:{port}")
+                self._pub_event_socket.bind(url)
 
         _data = [topic.encode(), data]
         self._pub_event_socket.send_multipart(_data)
 
     @staticmethod
     def send(
-        data: bytes,
+        data: bytes | Frames,
         protocol: ProtocolType = TCP,
-        host: str | None = None,
+        host: Address | None = None,
         port: int | None = None,
         socket: zmq.Socket | None = None,
     ) -> zmq.Socket:
-        assert (host and port) or socket, "Host or socket should be defined"
+        assert host or socket, "Host or socket should be defined"
 
         if not socket:
             context = zmq.Context()
             socket = context.socket(zmq.REQ)
-            socket.connect(f"{protocol}://{host}:{port}")
+            socket.connect(build_url(protocol, host, port))  # type: ignore
 
-        socket.send(data)
+        socket.send_multipart(as_frames(data), copy=False)
 
         return socket
 
     @staticmethod
-    def receive(socket: zmq.Socket) -> bytes:
-        result = socket.recv()
+    def receive(socket: zmq.Socket) -> bytes | memoryview:
+        frame = socket.recv(copy=False)
+
+        if len(frame) >= COPY_THRESHOLD:
+            return frame.buffer
 
-        return result
+        return frame.bytes
@@ -1,7 +1,25 @@
 import inspect
-from typing import Any, Callable, List
+from types import UnionType
+from typing import (
+    Annotated,
+    Any,
+    Callable,
+    ForwardRef,
+    List,
+    Literal,
+    Union,
+    get_args,
+    get_origin,
+    get_type_hints,
+)
 
-from pydantic import BaseModel
+from pydantic import BaseModel, ConfigDict, TypeAdapter, ValidationError
+
+Validator = Callable[..., None]
+Coercer = Callable[..., tuple[tuple[Any, ...], dict[str, Any]]]
+
+_VALIDATORS: dict[tuple[Callable, bool], Validator | None] = {}
+_COERCERS: dict[tuple[Callable, bool], Coercer | None] = {}
 
 
 def validate_or_ignore(func: Callable, *args: List[Any], **kwargs: Any):
@@ -9,38 +27,332 @@ def validate_or_ignore(func: Callable, *args: List[Any], **kwargs: Any):
     Validate the arguments of a function against the type hints of the
     function. If the arguments aren't valid, raise a Validation error.
     """
-    inspected = inspect.getfullargspec(func)
+    validator = get_validator(func)
 
-    # Validate positional arguments
-    for i, arg_value in enumerate(args):
-        arg_name = inspected.args[i]
-        arg_type = inspected.annotations.get(arg_name, None)
+    if validator:
+        validator(*args, **kwargs)
 
-        if arg_type:
-            validate_argument(arg_name, arg_value, arg_type)
 
-    # Validate keyword arguments
-    for arg_name, arg_value in kwargs.items():
-        arg_type = inspected.annotations.get(arg_name, None)
+def coerce_or_ignore(
+    func: Callable, *args: Any, **kwargs: Any
+) -> tuple[tuple[Any, ...], dict[str, Any]]:
+    """
+    Validate the arguments of a function against the type hints of the
+    function deeply and return the validated values. If the arguments
+    aren't valid, raise a ValueError.
+    """
+    coercer = get_coercer(func)
 
-        if arg_type:
-            validate_argument(arg_name, arg_value, arg_type)
+    if coercer:
+        return coercer(*args, **kwargs)
 
+    return args, kwargs
 
-def validate_argument(arg_name: str, arg_value: Any, arg_type: type):
+
+def get_validator(func: Callable) -> Validator | None:
     """
-    Validate a single argument.
+    Get validator of the function arguments. Validators are compiled once
+    per function and cached, bound methods of the same function share the
+    validator.
+
+    :param func: Function or bound method.
+    :return: Validator or None if the function has no annotated arguments.
     """
+    is_bound = inspect.ismethod(func)
+    key = (getattr(func, "__func__", func), is_bound)
+
+    try:
+        return _VALIDATORS[key]
+    except KeyError:
+        validator = _VALIDATORS[key] = compile_validator(*key)
+
+        return validator
+
+
+def get_coercer(func: Callable) -> Coercer | None:
+    """
+    Get coercer of the function arguments. Like validators, coercers are
+    compiled once per function and cached.
+
+    :param func: Function or bound method.
+    :return: Coercer or None if the function has no annotated arguments.
+    """
+    is_bound = inspect.ismethod(func)
+    key = (getattr(func, "__func__", func), is_bound)
+
+    try:
+        return _COERCERS[key]
+    except KeyError:
+        coercer = _COERCERS[key] = compile_coercer(*key)
+
+        return coercer
+
+
+def compile_coercer(func: Callable, is_bound: bool = False) -> Coercer | None:
+    """
+    Compile coercer of the function arguments from its signature. The
+    coercer validates arguments deeply with pydantic and returns the
+    validated values, e.g. model instances instead of dicts.
+
+    Arguments of types pydantic can't build a schema for, e.g. unresolved
+    string annotations, get the shallow check of the validator instead.
+
+    :param func: Function to compile the coercer for.
+    :param is_bound: Skip the first argument, it's bound to the instance.
+    :return: Coercer or None if the function has no annotated arguments.
+    """
+    parameters = get_parameters(func, is_bound)
+
+    adapters = {
+        parameter.name: build_adapter(parameter.annotation)
+        for parameter in parameters
+        if parameter.annotation is not inspect.Parameter.empty
+    }
 
+    if not adapters:
+        return None
+
+    checks = {
+        parameter.name: build_check(parameter.name, parameter.annotation)
+        for parameter in parameters
+        if parameter.name in adapters and adapters[parameter.name] is None
+    }
+
+    positional = [
+        (parameter.name, adapters.get(parameter.name))
+        for parameter in parameters
+        if parameter.kind in (
+            inspect.Parameter.POSITIONAL_ONLY,
+            inspect.Parameter.POSITIONAL_OR_KEYWORD,
+        )
+    ]
+
+    def coerce(
+        arg_name: str, arg_value: Any, adapter: TypeAdapter | None
+    ) -> Any:
+        if adapter is None:
+            check = checks.get(arg_name)
+
+            if check:
+                check(arg_value)
+
+            return arg_value
+
+        try:
+            return adapter.validate_python(arg_value)
+        except ValidationError as e:
+            # ValidationError can't be rebuilt from its args by the caller
+            raise ValueError(f"Argument {arg_name} is not valid: {e}") from e
+
+    def coercer(
+        *args: Any, **kwargs: Any
+    ) -> tuple[tuple[Any, ...], dict[str, Any]]:
+        coerced_args = tuple(
+            coerce(arg_name, arg_value, adapter)
+            for (arg_name, adapter), arg_value in zip(positional, args)
+        ) + args[len(positional):]
+        coerced_kwargs = {
+            arg_name: coerce(arg_name, arg_value, adapters.get(arg_name))
+            for arg_name, arg_value in kwargs.items()
+        }
+
+        return coerced_args, coerced_kwargs
+
+    return coercer
+
+
+def compile_validator(
+    func: Callable, is_bound: bool = False
+) -> Validator | None:
+    """
+    Compile validator of the function arguments from its signature.
+
+    :param func: Function to compile the validator for.
+    :param is_bound: Skip the first argument, it's bound to the instance.
+    :return: Validator or None if the function has no annotated arguments.
+    """
+    parameters = get_parameters(func, is_bound)
+
+    checks = {
+        parameter.name: check
+        for parameter in parameters
+        if parameter.annotation is not inspect.Parameter.empty
+        and (check := build_check(parameter.name, parameter.annotation))
+    }
+
+    if not checks:
+        return None
+
+    positional = [
+        checks.get(parameter.name)
+        for parameter in parameters
+        if parameter.kind in (
+            inspect.Parameter.POSITIONAL_ONLY,
+            inspect.Parameter.POSITIONAL_OR_KEYWORD,
+        )
+    ]
+
+    def validator(*args: Any, **kwargs: Any) -> None:
+        for check, arg_value in zip(positional, args):
+            if check:
+                check(arg_value)
+
+        for arg_name, arg_value in kwargs.items():
+            check = checks.get(arg_name)
+
+            if check:
+                check(arg_value)
+
+    return validator
+
+
+def get_parameters(
+    func: Callable, is_bound: bool = False
+) -> list[inspect.Parameter]:
+    """
+    Get parameters of the function with string annotations resolved. If
+    some of them can't be resolved, annotations are left as they are.
+
+    :param func: Function to get parameters of.
+    :param is_bound: Skip the first argument, it's bound to the instance.
+    """
+    parameters = list(inspect.signature(func).parameters.values())
+
+    if is_bound:
+        parameters = parameters[1:]
+
+    try:
+        hints = get_type_hints(func, include_extras=True)
+    except Exception:
+        return parameters
+
+    return [
+        parameter.replace(
+            annotation=hints.get(parameter.name, parameter.annotation)
+        )
+        for parameter in parameters
+    ]
+
+
+def build_adapter(arg_type: Any) -> TypeAdapter | None:
+    """
+    Build pydantic adapter of the argument type. Classes pydantic doesn't
+    know are checked with ``isinstance``.
+
+    :return: Adapter or None if the type isn't resolved or pydantic can't
+        build a schema for it.
+    """
+    if not is_resolved(arg_type):
+        return None
+
+    try:
+        return TypeAdapter(arg_type)
+    except Exception:
+        pass
+
+    try:
+        return TypeAdapter(
+            arg_type, config=ConfigDict(arbitrary_types_allowed=True)
+        )
+    except Exception:
+        return None
+
+
+def is_resolved(arg_type: Any) -> bool:
+    """
+    Check whether the annotation has no string forward references.
+    """
+    if isinstance(arg_type, (str, ForwardRef)):
+        return False
+
+    origin = get_origin(arg_type)
+
+    if origin is Literal:
+        return True
+
+    if origin is Annotated:
+        return is_resolved(get_args(arg_type)[0])
+
+    return all(is_resolved(arg) for arg in get_args(arg_type))
+
+
+def build_check(
+    arg_name: str, arg_type: Any
+) -> Callable[[Any], None] | None:
+    """
+    Build check of a single argument. The kind of the check is chosen
+    once, when the validator is compiled. Unions check every member,
+    literals check the value, ``Annotated`` checks the annotated type.
+
+    :return: Check or None if the type accepts any value or can't be
+        checked shallowly, e.g. ``Any``, a type variable or a string
+        annotation.
+    """
     if isinstance(arg_type, type) and issubclass(arg_type, BaseModel):
-        arg_type(**arg_value)
-    elif hasattr(arg_type, "__origin__"):
-        if not isinstance(arg_value, arg_type.__origin__):
+        model = arg_type
+
+        def check_model(arg_value: Any) -> None:
+            model(**arg_value)
+
+        return check_model
+
+    origin = get_origin(arg_type)
+
+    if origin is Annotated:
+        return build_check(arg_name, get_args(arg_type)[0])
+
+    if origin is Literal:
+        values = get_args(arg_type)
+
+        def check_literal(arg_value: Any) -> None:
+            if arg_value not in values:
+                raise ValueError(
+                    f"Argument {arg_name} should be one of {values}"
+                )
+
+        return check_literal
+
+    if origin is Union or origin is UnionType:
+        members = [
+            build_check(arg_name, member) for member in get_args(arg_type)
+        ]
+
+        if None in members:
+            return None
+
+        def check_union(arg_value: Any) -> None:
+            for check in members:
+                try:
+                    check(arg_value)  # type: ignore
+                    return None
+                except (TypeError, ValueError):
+                    continue
+
             raise ValueError(
                 f"Argument {arg_name} should be of type {arg_type}"
             )
-    else:
-        if not isinstance(arg_value, arg_type):
+
+        return check_union
+
+    expected = origin or arg_type
+
+    if arg_type is Any or not isinstance(expected, type):
+        return None
+
+    def check_type(arg_value: Any) -> None:
+        if not isinstance(arg_value, expected):
             raise ValueError(
                 f"Argument {arg_name} should be of type {arg_type}"
             )
+
+    return check_type
+
+
+def validate_argument(arg_name: str, arg_value: Any, arg_type: type):
+    """
+    Validate a single argument.
+    """
+    check = build_check(arg_name, arg_type)
+
+    if check:
+        check(arg_value)
@@ -1,3 +1,4 @@
+import orjson
 import pytest
 from pydantic import BaseModel
 from gevent.greenlet import Greenlet
@@ -18,7 +19,9 @@ def start_server(host, port, callback):
 
 @pytest.fixture(scope="session")
 def echo_server():
-    callback = lambda msg: msg
+    callback = lambda frames: orjson.dumps(
+        [orjson.loads(frame) for frame in frames]
+    )
     server = start_server(host="127.0.0.1", port=5555, callback=callback)
 
     yield server
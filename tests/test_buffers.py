@@ -0,0 +1,55 @@
+import pytest
+
+from noneapi.serializers import (
+    JSONSerializer,
+    MsgPackSerializer,
+    ORJSONSerializer,
+)
+
+numpy = pytest.importorskip("numpy")
+
+
+@pytest.mark.parametrize("serializer", [JSONSerializer(), ORJSONSerializer()])
+def test_serializer_sends_arrays_as_raw_frames(serializer):
+    matrix = numpy.arange(12, dtype=numpy.float32).reshape(3, 4)
+    data = {
+        "matrix": matrix,
+        "columns": numpy.asfortranarray(matrix),
+        "rows": matrix[::2],
+        "blob": memoryview(b"\x00\xff" * 10),
+        "name": "features",
+    }
+
+    frames = serializer.serialize_frames(data)
+    result = serializer.deserialize_frames(frames)
+
+    assert len(frames) == 6
+    assert numpy.shares_memory(frames[2], matrix)
+    assert result["matrix"].dtype == numpy.float32
+    assert numpy.array_equal(result["matrix"], matrix)
+    assert numpy.array_equal(result["columns"], matrix)
+    assert numpy.array_equal(result["rows"], matrix[::2])
+    assert result["columns"].flags.f_contiguous
+    assert bytes(result["blob"]) == b"\x00\xff" * 10
+    assert result["name"] == "features"
+    assert serializer.serialize_frames({"name": "features"}) == [
+        serializer.serialize({"name": "features"})
+    ]
+
+
+@pytest.mark.parametrize(
+    "serializer", [JSONSerializer(), ORJSONSerializer(), MsgPackSerializer()]
+)
+def test_serializer_keeps_dicts_looking_like_buffers(serializer):
+    data = {
+        "matrix": numpy.arange(4),
+        "lookalike": {"__buffer__": 0},
+        "tagged": {"__buffer__": "0" * 32, "frame": 1},
+    }
+
+    frames = serializer.serialize_frames(data)
+    result = serializer.deserialize_frames(frames)
+
+    assert numpy.array_equal(result["matrix"], numpy.arange(4))
+    assert result["lookalike"] == {"__buffer__": 0}
+    assert result["tagged"] == {"__buffer__": "0" * 32, "frame": 1}
@@ -0,0 +1,66 @@
+import time
+
+from noneapi.caches import TTLCache
+
+
+def test_ttl_cache_evicts_least_recently_used():
+    cache = TTLCache(maxsize=2)
+
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+
+    assert cache.get("a") == 1
+    assert cache.get("b") is None
+    assert cache.get("c") == 3
+    assert cache.stats.evictions == 1
+    assert cache.stats.hits == 3
+    assert cache.stats.misses == 1
+
+
+def test_ttl_cache_expires_entries():
+    cache = TTLCache(ttl=0.05)
+
+    cache.set("a", 1)
+    time.sleep(0.1)
+
+    assert cache.get("a") is None
+    assert cache.stats.size == 0
+
+
+def test_ttl_cache_invalidates_by_event():
+    cache = TTLCache(
+        invalidate_on={
+            "order_service:order_updated": lambda event: event["id"],
+            "order_service:orders_imported": None,
+        },
+        tag=lambda order_id: order_id,
+    )
+
+    cache.set("order-1", b"1", [1])
+    cache.set("order-2", b"2", [2])
+
+    assert cache.invalidate_event("order_service:order_updated", {"id": 1})
+    assert cache.get("order-1") is None
+    assert cache.get("order-2") == b"2"
+
+    assert not cache.invalidate_event("payment_service:paid", {"id": 2})
+    assert cache.invalidate_event("order_service:orders_imported", None)
+    assert cache.stats.size == 0
+    assert cache.stats.invalidations == 2
+
+
+def test_ttl_cache_limits_bytes_and_entry_ttl():
+    cache = TTLCache(ttl=10, maxbytes=10)
+
+    cache.set("a", b"12345")
+    cache.set("b", [b"12345", b"{}"])
+
+    assert cache.get("a") is None
+    assert cache.stats.bytes == 7
+
+    cache.set("c", b"1", ttl=0.01)
+    time.sleep(0.05)
+
+    assert cache.get("c") is None
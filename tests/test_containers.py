@@ -1,12 +1,66 @@
+import os
+import signal
+import time
+from unittest import mock
+
+import gevent
 import pytest
 import requests
 from gevent import Greenlet
+from pydantic import BaseModel
 from threading import Thread
+from typing import Iterator
 
+from noneapi.caches import TTLCache
 from noneapi.rpc import rpc
 from noneapi.containers import Container, ContainerRunner
+from noneapi.protocols import BATCH_METHOD, RPCProtocol
 from noneapi.proxies import ServiceProxy
-from noneapi.exceptions import RemoteError
+from noneapi.deadlines import deadline_scope, get_deadline
+from noneapi.events import event_handler
+from noneapi.exceptions import RemoteError, RemoteOverloaded, RequestTimeout
+from noneapi.serializers import JSONSerializer, ORJSONSerializer
+from noneapi.shm import get_segment_pool
+from noneapi.transports import IPC
+
+
+class ProcessService:
+    name = "process_service"
+
+    @rpc
+    def pid(self, seconds: float) -> int:
+        gevent.sleep(seconds)
+        return os.getpid()
+
+
+class ExecutorService:
+    name = "executor_service"
+
+    @rpc(executor="process", pool="cpu")
+    def spin(self, seconds: float) -> int:
+        started = time.monotonic()
+
+        while time.monotonic() - started < seconds:
+            pass
+
+        return os.getpid()
+
+    @rpc(executor="thread")
+    def thread_pid(self) -> int:
+        return os.getpid()
+
+    @rpc(executor="thread")
+    def thread_deadline(self) -> float | None:
+        return get_deadline()
+
+    @rpc
+    def ping(self) -> str:
+        return "pong"
+
+    @rpc(max_inflight=1)
+    def limited(self) -> str:
+        gevent.sleep(0.2)
+        return "done"
 
 
 def test_container_call_methods():
@@ -44,6 +98,66 @@ def test_container_call_methods():
     with pytest.raises(RemoteError):
         service.math_service.div(1, 0, 2)
 
+    with pytest.raises(RemoteError, match="MethodNotFound"):
+        service.math_service.pow(2, 2)
+
+    thread.kill()
+
+
+def test_container_replies_with_request_serializer():
+    pytest.importorskip("msgpack")
+
+    from noneapi.serializers import MsgPackSerializer
+
+    class ServiceMath:
+        name = "test_service"
+
+        @rpc
+        def sum(self, a: int, b: int) -> int:
+            return a + b
+
+    class Service:
+        math_service = ServiceProxy(
+            host="127.0.0.1", port=8018, serializer=MsgPackSerializer()
+        )
+
+    thread = Greenlet(
+        run=Container(ServiceMath).run,
+        **dict(host="127.0.0.1", port=8018)
+    )
+    thread.start()
+
+    assert Service().math_service.sum(1, 2) == 3
+
+    thread.kill()
+
+
+def test_container_replies_to_unknown_serializer():
+    class CustomSerializer(JSONSerializer):
+        name = "custom"
+
+    class ServiceMath:
+        name = "test_service"
+
+        @rpc
+        def sum(self, a: int, b: int) -> int:
+            return a + b
+
+    class Service:
+        math_service = ServiceProxy(
+            host="127.0.0.1", port=8019, serializer=CustomSerializer(),
+            timeout=1,
+        )
+
+    thread = Greenlet(
+        run=Container(ServiceMath).run,
+        **dict(host="127.0.0.1", port=8019)
+    )
+    thread.start()
+
+    with pytest.raises(RemoteError, match="custom is not registered"):
+        Service().math_service.sum(1, 2)
+
     thread.kill()
 
 
@@ -67,3 +181,1131 @@ def test_container_runner():
 
     assert response.status_code == 200
     assert "html" in response.text
+
+
+def test_container_processes_requests_concurrently():
+    class SlowService:
+        name = "slow_service"
+
+        @rpc
+        def wait(self, seconds: float) -> float:
+            gevent.sleep(seconds)
+            return seconds
+
+    class Service:
+        slow_service = ServiceProxy(host="127.0.0.1", port=8002)
+
+    container = Container(SlowService)
+
+    thread = Greenlet(
+        run=container.run,
+        **dict(host="127.0.0.1", port=8002, workers=4)
+    )
+    thread.start()
+
+    started = time.monotonic()
+    calls = [
+        gevent.spawn(lambda: Service().slow_service.wait(0.2))
+        for _ in range(4)
+    ]
+    gevent.joinall(calls, timeout=5)
+
+    assert [call.value for call in calls] == [0.2] * 4
+    assert time.monotonic() - started < 0.6
+
+    thread.kill()
+
+
+def test_container_runs_worker_processes():
+    class Service:
+        process_service = ServiceProxy(host="127.0.0.1", port=8003)
+
+    container = Container(ProcessService)
+
+    thread = Greenlet(
+        run=container.run,
+        **dict(host="127.0.0.1", port=8003, processes=2)
+    )
+    thread.start()
+
+    def call_workers():
+        for _ in range(20):
+            calls = [
+                gevent.spawn(lambda: Service().process_service.pid(0.1))
+                for _ in range(8)
+            ]
+            gevent.joinall(calls, timeout=2)
+            gevent.killall(calls)
+            pids = {call.value for call in calls if call.successful()}
+
+            if len(pids) == 2:
+                return pids
+
+            gevent.sleep(0.5)
+
+        return pids
+
+    pids = call_workers()
+    assert len(pids) == 2
+    assert os.getpid() not in pids
+
+    killed = pids.pop()
+    os.kill(killed, signal.SIGKILL)
+
+    restarted = call_workers()
+    assert len(restarted) == 2
+    assert killed not in restarted
+
+    container.stop()
+    thread.join(timeout=5)
+
+
+def test_container_drops_calls_past_deadline():
+    calls = []
+
+    class DeadlineService:
+        name = "deadline_service"
+        deadline_service = ServiceProxy(host="127.0.0.1", port=8004)
+
+        @rpc
+        def slow(self) -> float:
+            calls.append("slow")
+            gevent.sleep(0.3)
+            return get_deadline()
+
+        @rpc
+        def nested(self) -> float:
+            return self.deadline_service.deadline()
+
+        @rpc
+        def deadline(self) -> float:
+            return get_deadline()
+
+    class Service:
+        deadline_service = ServiceProxy(host="127.0.0.1", port=8004)
+
+    container = Container(DeadlineService)
+
+    thread = Greenlet(
+        run=container.run,
+        **dict(host="127.0.0.1", port=8004, workers=2)
+    )
+    thread.start()
+
+    service = Service()
+    deadline = time.time() + 1
+
+    with deadline_scope(deadline):
+        nested = service.deadline_service.nested()
+        assert nested == pytest.approx(deadline, abs=0.05)
+
+    def call_slow():
+        with deadline_scope(time.time() + 0.2):
+            Service().deadline_service.slow()
+
+    slow_calls = [gevent.spawn(call_slow) for _ in range(3)]
+    gevent.joinall(slow_calls)
+    gevent.sleep(0.4)
+
+    assert all(
+        isinstance(call.exception, RequestTimeout) for call in slow_calls
+    )
+    assert calls == ["slow", "slow"]
+
+    thread.kill()
+
+
+def test_container_coerces_arguments():
+    class Order(BaseModel):
+        id: int
+        items: list[int]
+
+    class CoerceService:
+        name = "coerce_service"
+
+        @rpc(coerce=True)
+        def total(self, order: Order) -> int:
+            assert isinstance(order, Order)
+            return sum(order.items)
+
+    class Service:
+        coerce_service = ServiceProxy(host="127.0.0.1", port=8005)
+
+    container = Container(CoerceService)
+
+    thread = Greenlet(
+        run=container.run,
+        **dict(host="127.0.0.1", port=8005)
+    )
+    thread.start()
+
+    service = Service()
+
+    assert service.coerce_service.total({"id": 1, "items": [1, "2"]}) == 3
+
+    with pytest.raises(RemoteError, match="ValueError"):
+        service.coerce_service.total({"id": 1, "items": ["x"]})
+
+    thread.kill()
+
+
+def test_container_middlewares_and_same_class_names():
+    calls = []
+
+    def first_service():
+        class NamedService:
+            name = "first"
+
+            @rpc
+            def who(self) -> str:
+                return "first"
+
+        return NamedService
+
+    def second_service():
+        class NamedService:
+            name = "second"
+
+            @rpc
+            def who(self) -> str:
+                return "second"
+
+        return NamedService
+
+    def middleware(method, handler):
+        def handle(args, kwargs, headers):
+            calls.append((method, headers["correlation_id"]))
+            return handler(args, kwargs, headers)
+
+        return handle
+
+    class Service:
+        first = ServiceProxy(host="127.0.0.1", port=8006)
+        second = ServiceProxy(host="127.0.0.1", port=8007)
+
+    threads = [
+        Greenlet(
+            run=Container(first_service(), middlewares=[middleware]).run,
+            **dict(host="127.0.0.1", port=8006)
+        ),
+        Greenlet(
+            run=Container(second_service()).run,
+            **dict(host="127.0.0.1", port=8007)
+        ),
+    ]
+
+    for thread in threads:
+        thread.start()
+
+    service = Service()
+
+    assert service.first.who() == "first"
+    assert service.second.who() == "second"
+    assert calls == [("who", mock.ANY)]
+
+    gevent.killall(threads)
+
+
+def test_container_runs_methods_in_executors():
+    class Service:
+        executor_service = ServiceProxy(
+            host="127.0.0.1", port=8008, timeout=10, retries=0
+        )
+
+    container = Container(ExecutorService, process_pools={"cpu": 1})
+
+    thread = Greenlet(
+        run=container.run,
+        **dict(host="127.0.0.1", port=8008, workers=2)
+    )
+    thread.start()
+
+    service = Service()
+
+    assert service.executor_service.thread_pid() == os.getpid()
+
+    with deadline_scope(time.time() + 5):
+        deadline = get_deadline()
+
+        assert service.executor_service.thread_deadline() == deadline
+
+    spin = gevent.spawn(Service().executor_service.spin, 1.0)
+    gevent.sleep(0.1)
+
+    started = time.monotonic()
+    assert service.executor_service.ping() == "pong"
+    assert time.monotonic() - started < 0.5
+
+    assert spin.get() != os.getpid()
+
+    limited = [
+        gevent.spawn(Service().executor_service.limited) for _ in range(2)
+    ]
+    gevent.joinall(limited)
+
+    assert limited[0].value == "done"
+    assert isinstance(limited[1].exception, RemoteOverloaded)
+
+    container.stop()
+    thread.kill()
+
+
+def test_container_limits_method_concurrency():
+    running = []
+    peak = []
+
+    class BulkheadService:
+        name = "bulkhead_service"
+
+        @rpc(max_concurrency=2)
+        def list_orders(self) -> int:
+            running.append(1)
+            peak.append(len(running))
+            gevent.sleep(0.1)
+            running.pop()
+            return len(peak)
+
+        @rpc(priority=10)
+        def save_order(self) -> str:
+            return "saved"
+
+    class Service:
+        bulkhead_service = ServiceProxy(host="127.0.0.1", port=8009)
+
+    container = Container(BulkheadService)
+
+    thread = Greenlet(
+        run=container.run,
+        **dict(host="127.0.0.1", port=8009, workers=6)
+    )
+    thread.start()
+
+    calls = [
+        gevent.spawn(Service().bulkhead_service.list_orders)
+        for _ in range(5)
+    ]
+    assert Service().bulkhead_service.save_order() == "saved"
+    gevent.joinall(calls)
+
+    assert all(call.successful() for call in calls)
+    assert max(peak) == 2
+
+    thread.kill()
+
+
+def test_container_bulkhead_does_not_hold_workers():
+    class BulkheadService:
+        name = "bulkhead_service"
+
+        @rpc(max_concurrency=1)
+        def export(self) -> str:
+            gevent.sleep(0.3)
+            return "exported"
+
+        @rpc
+        def ping(self) -> str:
+            return "pong"
+
+    class Service:
+        bulkhead_service = ServiceProxy(host="127.0.0.1", port=8020)
+
+    thread = Greenlet(
+        run=Container(BulkheadService).run,
+        **dict(host="127.0.0.1", port=8020, workers=2)
+    )
+    thread.start()
+
+    calls = [
+        gevent.spawn(Service().bulkhead_service.export) for _ in range(4)
+    ]
+    gevent.sleep(0.1)
+    started = time.monotonic()
+
+    assert Service().bulkhead_service.ping() == "pong"
+    assert time.monotonic() - started < 0.2
+
+    gevent.joinall(calls, timeout=2)
+
+    assert [call.value for call in calls] == ["exported"] * 4
+
+    thread.kill()
+
+
+def test_container_coalesces_identical_calls():
+    calls = []
+
+    class CoalesceService:
+        name = "coalesce_service"
+
+        @rpc(coalesce=True)
+        def get_order(self, order_id: int) -> dict:
+            calls.append(order_id)
+            gevent.sleep(0.1)
+            return {"id": order_id}
+
+    class Service:
+        coalesce_service = ServiceProxy(host="127.0.0.1", port=8010)
+
+    container = Container(CoalesceService)
+
+    thread = Greenlet(
+        run=container.run,
+        **dict(host="127.0.0.1", port=8010, workers=10)
+    )
+    thread.start()
+
+    results = [
+        gevent.spawn(Service().coalesce_service.get_order, order_id)
+        for order_id in [42] * 8 + [7]
+    ]
+    gevent.joinall(results)
+
+    assert [result.value for result in results] == [
+        {"id": 42}
+    ] * 8 + [{"id": 7}]
+    assert sorted(calls) == [7, 42]
+
+    thread.kill()
+
+
+def test_container_coalesced_calls_keep_own_deadline():
+    calls = []
+
+    class CoalesceService:
+        name = "coalesce_deadline_service"
+
+        @rpc(coalesce=True)
+        def deadline(self) -> float:
+            calls.append("deadline")
+            gevent.sleep(0.3)
+            return get_deadline()
+
+    class Service:
+        coalesce_service = ServiceProxy(host="127.0.0.1", port=8021)
+
+    container = Container(CoalesceService)
+
+    thread = Greenlet(
+        run=container.run,
+        **dict(host="127.0.0.1", port=8021, workers=10)
+    )
+    thread.start()
+
+    def call(budget):
+        with deadline_scope(time.time() + budget):
+            return Service().coalesce_service.deadline()
+
+    short = gevent.spawn(call, 0.1)
+    gevent.sleep(0.05)
+    deadline = time.time() + 2
+    late = gevent.spawn(call, 2)
+    gevent.joinall([short, late])
+
+    assert isinstance(short.exception, RequestTimeout)
+    assert late.value == pytest.approx(deadline, abs=0.05)
+    assert calls == ["deadline", "deadline"]
+
+    thread.kill()
+
+
+def test_container_coalesced_calls_pass_middlewares():
+    calls = []
+    checked = []
+
+    def auth_middleware(method, handler):
+        def handle(args, kwargs, headers):
+            checked.append(headers.get("token"))
+
+            if headers.get("token") != "secret":
+                raise PermissionError("Unauthorized")
+
+            return handler(args, kwargs, headers)
+
+        return handle
+
+    class CoalesceService:
+        name = "auth_coalesce_service"
+
+        @rpc(coalesce=True)
+        def get_order(self, order_id: int) -> dict:
+            calls.append(order_id)
+            gevent.sleep(0.1)
+            return {"id": order_id}
+
+    container = Container(CoalesceService, middlewares=[auth_middleware])
+
+    thread = Greenlet(
+        run=container.run,
+        **dict(host="127.0.0.1", port=8027, workers=4)
+    )
+    thread.start()
+
+    protocol = RPCProtocol(ORJSONSerializer())
+
+    def get_order(token):
+        return protocol.call(
+            "get_order", [42], {}, "127.0.0.1", 8027,
+            headers={"token": token}, timeout=1,
+        )
+
+    results = [
+        gevent.spawn(get_order, token)
+        for token in ["secret", "secret", "guess"]
+    ]
+    gevent.joinall(results)
+
+    assert [result.value for result in results[:2]] == [{"id": 42}] * 2
+    assert results[2].value["exc_type"] == "PermissionError"
+    assert calls == [42]
+    assert sorted(checked) == ["guess", "secret", "secret"]
+
+    thread.kill()
+
+
+def test_container_caches_responses():
+    calls = []
+    cache = TTLCache(
+        invalidate_on={"cache_service:order_updated": lambda event: event},
+        tag=lambda order_id: order_id,
+    )
+
+    class CacheService:
+        name = "cache_service"
+
+        @rpc(cache=cache)
+        def get_order(self, order_id: int) -> dict:
+            calls.append(order_id)
+            return {"id": order_id}
+
+        @rpc(cache=cache)
+        def fail(self) -> None:
+            raise ValueError("not cached")
+
+    class Service:
+        cache_service = ServiceProxy(host="127.0.0.1", port=8011)
+
+    container = Container(CacheService)
+
+    thread = Greenlet(
+        run=container.run,
+        **dict(host="127.0.0.1", port=8011)
+    )
+    thread.start()
+
+    service = Service()
+
+    assert service.cache_service.get_order(1) == {"id": 1}
+    assert service.cache_service.get_order(1) == {"id": 1}
+    assert service.cache_service.get_order(2) == {"id": 2}
+    assert calls == [1, 2]
+
+    with pytest.raises(RemoteError):
+        service.cache_service.fail()
+
+    container._callback_event(b"cache_service:order_updated", b"1")
+
+    assert service.cache_service.get_order(1) == {"id": 1}
+    assert calls == [1, 2, 1]
+    assert cache.stats.hits == 1
+
+    thread.kill()
+
+
+def test_container_survives_broken_cache_functions():
+    received = []
+
+    class CacheService:
+        name = "broken_cache_service"
+
+        @rpc(cache=TTLCache(tag=lambda order: order["id"]))
+        def get_order(self, order: int) -> int:
+            return order
+
+        @rpc(
+            cache=TTLCache(
+                invalidate_on={
+                    "broken_cache_service:updated": lambda event: {}
+                }
+            )
+        )
+        def get_orders(self) -> list:
+            return []
+
+        @event_handler("broken_cache_service", "updated")
+        def on_updated(self, event: dict) -> None:
+            received.append(event)
+
+    class Service:
+        cache_service = ServiceProxy(host="127.0.0.1", port=8028, timeout=1)
+
+    container = Container(CacheService)
+
+    thread = Greenlet(
+        run=container.run,
+        **dict(host="127.0.0.1", port=8028)
+    )
+    thread.start()
+
+    assert Service().cache_service.get_order(1) == 1
+
+    container._callback_event(b"broken_cache_service:updated", b'{"id":1}')
+
+    assert received == [{"id": 1}]
+
+    thread.kill()
+
+
+def test_container_caches_responses_per_caller():
+    calls = []
+
+    def auth_middleware(method, handler):
+        def handle(args, kwargs, headers):
+            if headers.get("token") != "secret":
+                raise PermissionError("Unauthorized")
+
+            return handler(args, kwargs, headers)
+
+        return handle
+
+    class CacheService:
+        name = "auth_cache_service"
+
+        @rpc(cache=TTLCache())
+        def get_order(self, order_id: int) -> dict:
+            calls.append(order_id)
+            return {"id": order_id}
+
+    container = Container(CacheService, middlewares=[auth_middleware])
+
+    thread = Greenlet(
+        run=container.run,
+        **dict(host="127.0.0.1", port=8026)
+    )
+    thread.start()
+
+    protocol = RPCProtocol(ORJSONSerializer())
+
+    def get_order(headers):
+        return protocol.call(
+            "get_order", [42], {}, "127.0.0.1", 8026, headers=headers,
+            timeout=1,
+        )
+
+    assert get_order({"token": "secret"}) == {"id": 42}
+    assert get_order({"token": "secret"}) == {"id": 42}
+    assert calls == [42]
+
+    rejected = get_order({"token": "guess"})
+
+    assert RemoteError.is_remote_error(rejected)
+    assert rejected["exc_type"] == "PermissionError"
+
+    thread.kill()
+
+
+def test_proxy_caches_responses_marked_by_service():
+    calls = []
+
+    class ProfileService:
+        name = "profile_service"
+
+        @rpc(max_age=10)
+        def get_profile(self, user_id: int) -> dict:
+            calls.append(user_id)
+            return {"id": user_id}
+
+        @rpc
+        def get_balance(self, user_id: int) -> int:
+            calls.append(user_id)
+            return 0
+
+    class ClientService:
+        name = "client_service"
+        profile_service = ServiceProxy(
+            host="127.0.0.1",
+            port=8012,
+            cache=TTLCache(
+                invalidate_on={"profile_service:updated": lambda e: e},
+                tag=lambda user_id: user_id,
+            ),
+        )
+
+    thread = Greenlet(
+        run=Container(ProfileService).run,
+        **dict(host="127.0.0.1", port=8012)
+    )
+    thread.start()
+
+    container = Container(ClientService)
+    client = container.init()
+
+    assert client.profile_service.get_profile(1) == {"id": 1}
+    assert client.profile_service.get_profile(1) == {"id": 1}
+    assert client.profile_service.get_balance(1) == 0
+    assert client.profile_service.get_balance(1) == 0
+    assert calls == [1, 1, 1]
+
+    container._callback_event(b"profile_service:updated", b"1")
+
+    assert client.profile_service.get_profile(1) == {"id": 1}
+    assert calls == [1, 1, 1, 1]
+
+    with mock.patch.object(
+        RPCProtocol, "encode_body", autospec=True,
+        side_effect=RPCProtocol.encode_body,
+    ) as encode_body:
+        assert client.profile_service.get_profile(2) == {"id": 2}
+
+    assert encode_body.call_count == 1
+
+    thread.kill()
+
+
+def test_container_runs_batches():
+    class BatchService:
+        name = "batch_service"
+
+        @rpc
+        def get_order(self, order_id: int) -> dict:
+            gevent.sleep(0.1)
+            return {"id": order_id}
+
+        @rpc
+        def fail(self) -> None:
+            raise ValueError("failed")
+
+        @rpc
+        def batch(self) -> str:
+            return "not a batch"
+
+    class Service:
+        batch_service = ServiceProxy(host="127.0.0.1", port=8013)
+
+    thread = Greenlet(
+        run=Container(BatchService).run,
+        **dict(host="127.0.0.1", port=8013)
+    )
+    thread.start()
+
+    service = Service()
+    # Connect first, so only processing of the batch is timed.
+    assert service.batch_service.get_order(0) == {"id": 0}
+    started = time.monotonic()
+
+    with service.batch_service._batch() as batch:
+        orders = [batch.get_order(order_id) for order_id in range(5)]
+        failed = batch.fail()
+        missing = batch.missing()
+
+    assert time.monotonic() - started < 0.3
+    assert [order.get() for order in orders] == [
+        {"id": order_id} for order_id in range(5)
+    ]
+
+    with pytest.raises(RemoteError, match="ValueError"):
+        failed.get()
+
+    with pytest.raises(RemoteError, match="MethodNotFound"):
+        missing.get()
+
+    assert service.batch_service.batch() == "not a batch"
+
+    thread.kill()
+
+
+def test_container_replies_to_malformed_batches():
+    class BatchService:
+        name = "malformed_batch_service"
+
+        @rpc
+        def get_order(self, order_id: int) -> dict:
+            return {"id": order_id}
+
+    thread = Greenlet(
+        run=Container(BatchService).run,
+        **dict(host="127.0.0.1", port=8022)
+    )
+    thread.start()
+
+    protocol = RPCProtocol(ORJSONSerializer())
+    results = protocol.call_batch(
+        [["get_order", [1], {}], ["get_order"], 42, [["get_order"], [], {}]],
+        "127.0.0.1", 8022, timeout=1,
+    )
+
+    assert results[0] == {"id": 1}
+    assert all(
+        RemoteError.is_remote_error(result)
+        and result["exc_type"] == "TypeError"
+        for result in results[1:]
+    )
+
+    error = protocol.call(
+        BATCH_METHOD, {"get_order": [1]}, {}, "127.0.0.1", 8022, timeout=1
+    )
+
+    assert RemoteError.is_remote_error(error)
+    assert error["value"] == "Batch must be a list of calls"
+
+    thread.kill()
+
+
+def test_container_streams_generator_methods():
+    produced = []
+    finished = []
+
+    class ExportService:
+        name = "export_service"
+
+        @rpc
+        def export_rows(self, count: int) -> Iterator[dict]:
+            try:
+                for row_id in range(count):
+                    produced.append(row_id)
+                    yield {"id": row_id}
+            finally:
+                finished.append(count)
+
+        @rpc
+        def export_broken(self) -> Iterator[dict]:
+            yield {"id": 0}
+            raise ValueError("broken")
+
+    class Service:
+        export_service = ServiceProxy(host="127.0.0.1", port=8014)
+
+    thread = Greenlet(
+        run=Container(ExportService).run,
+        **dict(host="127.0.0.1", port=8014)
+    )
+    thread.start()
+
+    service = Service()
+
+    rows = list(service.export_service.export_rows._stream(100))
+    assert rows == [{"id": row_id} for row_id in range(100)]
+    assert service.export_service.export_rows(3) == [
+        {"id": 0}, {"id": 1}, {"id": 2}
+    ]
+
+    produced.clear()
+
+    with service.export_service.export_rows._stream(10_000) as rows:
+        assert next(rows) == {"id": 0}
+        gevent.sleep(0.1)
+        assert len(produced) <= 32
+
+    gevent.sleep(0.1)
+    assert finished[-1] == 10_000
+    assert len(produced) <= 32
+
+    broken = service.export_service.export_broken._stream()
+    assert next(broken) == {"id": 0}
+
+    with pytest.raises(RemoteError, match="ValueError"):
+        next(broken)
+
+    thread.kill()
+
+
+def test_container_receives_uploads():
+    received = []
+
+    class ImportService:
+        name = "import_service"
+
+        @rpc
+        def import_rows(self, rows: Iterator[str], source: str) -> dict:
+            count = 0
+
+            for row in rows:
+                received.append(row)
+                count += 1
+
+            return {"source": source, "count": count}
+
+        @rpc
+        def import_head(self, rows: Iterator[str]) -> str:
+            return next(rows)
+
+    class Service:
+        import_service = ServiceProxy(host="127.0.0.1", port=8015)
+
+    thread = Greenlet(
+        run=Container(ImportService).run,
+        **dict(host="127.0.0.1", port=8015)
+    )
+    thread.start()
+
+    service = Service()
+    sent = []
+
+    def rows(count):
+        for row_id in range(count):
+            sent.append(row_id)
+            yield f"row {row_id}"
+
+    assert service.import_service.import_rows._upload(
+        rows(1000), source="csv"
+    ) == {"source": "csv", "count": 1000}
+    assert received == [f"row {row_id}" for row_id in range(1000)]
+
+    sent.clear()
+
+    assert service.import_service.import_head._upload(rows(10_000)) == "row 0"
+    assert len(sent) <= 16
+
+    def broken():
+        yield "row 0"
+        raise ValueError("broken")
+
+    with pytest.raises(ValueError, match="broken"):
+        service.import_service.import_rows._upload(broken(), source="csv")
+
+    thread.kill()
+
+
+def test_container_streams_do_not_hold_workers():
+    class ExportService:
+        name = "stalled_export_service"
+
+        @rpc
+        def export_rows(self, count: int) -> Iterator[int]:
+            yield from range(count)
+
+        @rpc
+        def import_rows(self, rows: Iterator[int]) -> int:
+            return sum(rows)
+
+        @rpc
+        def ping(self) -> str:
+            return "pong"
+
+    class Service:
+        export_service = ServiceProxy(
+            host="127.0.0.1", port=8023, timeout=1
+        )
+
+    thread = Greenlet(
+        run=Container(ExportService).run,
+        **dict(host="127.0.0.1", port=8023, workers=1)
+    )
+    thread.start()
+
+    service = Service()
+
+    def stalled_rows():
+        yield 1
+        gevent.sleep(0.5)
+        yield 2
+
+    upload = gevent.spawn(
+        service.export_service.import_rows._upload, stalled_rows()
+    )
+    gevent.sleep(0.05)
+
+    with service.export_service.export_rows._stream(10_000) as rows:
+        assert next(rows) == 0
+
+        gevent.sleep(0.1)
+        started = time.monotonic()
+
+        assert service.export_service.ping() == "pong"
+        assert time.monotonic() - started < 0.2
+
+    assert upload.get(timeout=1) == 3
+
+    thread.kill()
+
+
+def test_container_limits_streams_until_they_end():
+    class ExportService:
+        name = "limited_export_service"
+
+        @rpc(max_inflight=1)
+        def export_rows(self, count: int) -> Iterator[int]:
+            yield from range(count)
+
+    class Service:
+        export_service = ServiceProxy(host="127.0.0.1", port=8029)
+
+    thread = Greenlet(
+        run=Container(ExportService).run,
+        **dict(host="127.0.0.1", port=8029, workers=2)
+    )
+    thread.start()
+
+    service = Service()
+
+    with service.export_service.export_rows._stream(10_000) as rows:
+        assert next(rows) == 0
+
+        with pytest.raises(RemoteOverloaded):
+            service.export_service.export_rows(1)
+
+    gevent.sleep(0.1)
+    assert service.export_service.export_rows(2) == [0, 1]
+
+    thread.kill()
+
+
+def test_rpc_rejects_executors_for_generator_methods():
+    with pytest.raises(ValueError, match="export_rows"):
+        class ExportService:
+            name = "export_service"
+
+            @rpc(executor="thread")
+            def export_rows(self, count: int) -> Iterator[int]:
+                yield from range(count)
+
+
+def test_container_sends_arrays_as_raw_frames():
+    numpy = pytest.importorskip("numpy")
+
+    class ScoringService:
+        name = "scoring_service"
+
+        @rpc
+        def score(self, features, weights) -> dict:
+            assert not features.flags.owndata
+            return {"scores": features @ weights, "rows": len(features)}
+
+    class Service:
+        scoring_service = ServiceProxy(host="127.0.0.1", port=8016)
+
+    thread = Greenlet(
+        run=Container(ScoringService).run,
+        **dict(host="127.0.0.1", port=8016)
+    )
+    thread.start()
+
+    service = Service()
+    features = numpy.random.rand(100_000, 16)
+    weights = numpy.random.rand(16)
+
+    result = service.scoring_service.score(features, weights=weights)
+
+    assert result["rows"] == 100_000
+    assert result["scores"].shape == (100_000,)
+    assert numpy.allclose(result["scores"], features @ weights)
+
+    thread.kill()
+
+
+def test_container_passes_large_frames_through_shared_memory():
+    class ImageService:
+        name = "image_service"
+
+        @rpc
+        def flip(self, image: str) -> str:
+            return image[::-1]
+
+    class Service:
+        image_service = ServiceProxy(
+            host="127.0.0.1", port=8017, shared_memory_threshold=64 * 1024
+        )
+
+    thread = Greenlet(
+        run=Container(ImageService).run,
+        **dict(host="127.0.0.1", port=8017, shared_memory=True)
+    )
+    thread.start()
+
+    service = Service()
+    image = "ab" * 1024 * 1024
+    segments = get_segment_pool()
+    size = segments.size
+
+    assert service.image_service.flip(image) == image[::-1]
+    assert service.image_service.flip("ab") == "ba"
+    assert segments.size > size
+
+    thread.kill()
+
+    thread = Greenlet(
+        run=Container(ImageService).run,
+        **dict(host="127.0.0.1", port=8025)
+    )
+    thread.start()
+
+    class RemoteService:
+        image_service = ServiceProxy(
+            host="127.0.0.1", port=8025, timeout=1,
+            shared_memory_threshold=64 * 1024,
+        )
+
+    with pytest.raises(RemoteError, match="Shared memory is disabled"):
+        RemoteService().image_service.flip(image)
+
+    thread.kill()
+
+
+def test_container_keeps_shared_frames_of_slow_calls():
+    class ImageService:
+        name = "slow_image_service"
+
+        @rpc
+        def flip(self, image: str) -> str:
+            gevent.sleep(0.2)
+            return image[::-1]
+
+    class Service:
+        image_service = ServiceProxy(
+            host="127.0.0.1", port=8024, timeout=2,
+            shared_memory_threshold=64 * 1024,
+        )
+
+    thread = Greenlet(
+        run=Container(ImageService).run,
+        **dict(
+            host="127.0.0.1", port=8024, workers=1, shared_memory=True
+        )
+    )
+    thread.start()
+
+    service = Service()
+    images = [f"{letter}z" * 512 * 1024 for letter in "abc"]
+    calls = []
+
+    for image in images:
+        calls.append(gevent.spawn(service.image_service.flip, image))
+        gevent.sleep(0.05)
+
+    gevent.joinall(calls, timeout=3)
+
+    assert [call.value for call in calls] == [
+        image[::-1] for image in images
+    ]
+
+    thread.kill()
+
+
+def test_container_serves_ipc_endpoint(tmp_path):
+    path = tmp_path / "ipc_service.sock"
+
+    class IPCService:
+        name = "ipc_service"
+
+        @rpc
+        def echo(self, message: str) -> str:
+            return message
+
+        @rpc
+        def count(self, limit: int) -> Iterator[int]:
+            yield from range(limit)
+
+    class Service:
+        ipc_service = ServiceProxy(host=path, protocol=IPC)
+
+    thread = Greenlet(
+        run=Container(IPCService).run, **dict(host=path, protocol=IPC)
+    )
+    thread.start()
+
+    service = Service()
+
+    assert service.ipc_service.echo("hello") == "hello"
+    assert list(service.ipc_service.count._stream(3)) == [0, 1, 2]
+    assert path.exists()
+
+    thread.kill()
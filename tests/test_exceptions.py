@@ -39,3 +39,22 @@ def test_error_handler():
     handler = RemoteErrorHandler()
 
     assert isinstance(handler.handle_exception(error), dict)
+
+
+def test_remote_overloaded_error_from_dict():
+    from noneapi.exceptions import Overloaded, RemoteOverloaded
+
+    error = RemoteError(original_exc=Overloaded("busy"), message="busy")
+
+    assert isinstance(RemoteError.from_dict(error.to_dict()), RemoteOverloaded)
+
+
+def test_request_timeout_from_dict():
+    from noneapi.exceptions import RequestTimeout
+
+    timeout = RequestTimeout.no_reply("tcp://127.0.0.1:5555", 0.5, 1)
+    error = RemoteError(original_exc=timeout, message=str(timeout))
+    restored = RemoteError.from_dict(error.to_dict())
+
+    assert isinstance(restored._original_exc, RequestTimeout)
+    assert "tcp://127.0.0.1:5555" in str(restored)
@@ -1,3 +1,10 @@
+import time
+from unittest import mock
+
+import pytest
+
+from noneapi.deadlines import deadline_scope
+from noneapi.exceptions import DeadlineExceeded, UnsupportedEnvelope
 from noneapi.protocols import RPCProtocol
 from noneapi.serializers import JSONSerializer
 
@@ -12,10 +19,89 @@ def test_create_correct_protocol(echo_server):
         args=[], kwargs={}, headers={}
     )
 
-    assert result == {
-        'method': 'test',
-        'args': [],
-        'kwargs': {},
-        'meta': {'headers': {}}
-    }
+    assert result == [[2, 'test', 'json', mock.ANY], [[], {}]]
+
+
+
+def test_call_attaches_deadline(echo_server):
+    protocol = RPCProtocol(
+        serializer=JSONSerializer()
+    )
+
+    started = time.time()
+    result = protocol.call(
+        host="127.0.0.1", port=5555, method="test",
+        args=[], kwargs={}, timeout=1, retries=1
+    )
+    headers = result[0][3]
+
+    assert started + 2 <= headers["deadline"] <= time.time() + 2
+    assert 0 < headers["budget"] <= 2
+
+    with deadline_scope(time.time() + 0.5):
+        result = protocol.call(
+            host="127.0.0.1", port=5555, method="test",
+            args=[], kwargs={}, timeout=1, retries=1
+        )
+
+    assert result[0][3]["budget"] <= 0.5
+
+    with deadline_scope(time.time() - 1):
+        with pytest.raises(DeadlineExceeded):
+            protocol.call(
+                host="127.0.0.1", port=5555, method="test",
+                args=[], kwargs={}
+            )
+
+
+def test_parse_request_accepts_legacy_envelope():
+    protocol = RPCProtocol(
+        serializer=JSONSerializer()
+    )
+
+    legacy = b'{"method": "test", "args": [1], "kwargs": {"a": 2}, ' \
+             b'"meta": {"headers": {"x": 3}}}'
+
+    assert protocol.parse_request(legacy) == ("test", [1], {"a": 2}, {"x": 3})
+    assert protocol.parse_call(
+        b'[1, "test", [1], {"a": 2}, {"x": 3}]'
+    ) == ("test", [1], {"a": 2})
+
+
+def test_parse_request_reads_header_and_body_frames():
+    protocol = RPCProtocol(
+        serializer=JSONSerializer()
+    )
+
+    frames = protocol._encode_request("test", [1], {"a": 2}, {"x": 3})
+
+    assert protocol.parse_header(frames[0]) == ("test", "json", {"x": 3})
+    assert protocol.parse_request(frames) == ("test", [1], {"a": 2}, {"x": 3})
+
+
+def test_peek_method_reads_method_of_header_frame():
+    protocol = RPCProtocol(
+        serializer=JSONSerializer()
+    )
+
+    header = protocol._encode_request("test", [1], {}, {"x": 3})[0]
+
+    assert protocol.peek_method(header) == "test"
+    assert protocol.peek_method(memoryview(header)) == "test"
+    assert protocol.peek_method(b'[2, "test", "json", {}]') is None
+    assert protocol.peek_method(b'[2,"te\\"st","json",{}]') is None
+
+
+def test_parse_request_rejects_unknown_envelope_version():
+    protocol = RPCProtocol(
+        serializer=JSONSerializer()
+    )
+
+    with pytest.raises(UnsupportedEnvelope):
+        protocol.parse_header(b'[3, "test", "json", {}]')
+
+    with pytest.raises(UnsupportedEnvelope):
+        protocol.parse_request([b'[3, "test", "json", {}]', b"[[], {}]"])
 
+    with pytest.raises(UnsupportedEnvelope):
+        protocol.parse_call(b'[2, "test", [1], {}, {}]')
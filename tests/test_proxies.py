@@ -1,7 +1,16 @@
+import time
+
 import pytest
+from unittest import mock
 
 from noneapi.proxies import ServiceProxy, ClusterProxy
-from noneapi.exceptions import ServiceNotFound, AsyncCallError
+from noneapi.exceptions import (
+    AsyncCallError,
+    RequestTimeout,
+    ServiceNotFound,
+)
+from noneapi.transports import get_pool
+from tests.conftest import start_server
 
 
 def test_remote_service_call(echo_server):
@@ -13,12 +22,10 @@ def test_remote_service_call(echo_server):
 
     result = service.service_a.test(1, 2, 3, test=1, test2=2)
 
-    assert result == {
-        'method': 'test',
-        'args': [1, 2, 3],
-        'kwargs': {"test": 1, "test2": 2},
-        'meta': {'headers': {}}
-    }
+    assert result == [
+        [2, 'test', 'orjson', mock.ANY],
+        [[1, 2, 3], {"test": 1, "test2": 2}],
+    ]
 
 
 def test_remote_service_async_call(echo_server):
@@ -37,26 +44,21 @@ def test_remote_service_async_call(echo_server):
         result_async2 = service_a.test2.result()
         result_async = service_a.test.result()
 
-        assert result_sync == {
-            'method': 'test',
-            'args': [1, 2, 3],
-            'kwargs': {"test": 1, "test2": 2},
-            'meta': {'headers': {}}
-        }
+        assert result_sync == [
+            [2, 'test', 'orjson', mock.ANY],
+            [[1, 2, 3], {"test": 1, "test2": 2}],
+        ]
 
-        assert result_async == result_sync
+        assert result_async == [mock.ANY, result_sync[1]]
 
-        assert result_async2 == {
-            'method': 'test2',
-            'args': [1, 2, 3],
-            'kwargs': {},
-            'meta': {'headers': {}}
-        }
+        assert result_async2 == [
+            [2, 'test2', 'orjson', mock.ANY], [[1, 2, 3], {}]
+        ]
 
         service_a.test.async_call(1, 2, 3, test=1, test2=2)
         result_async = service_a.test.result()
 
-        assert result_async == result_sync
+        assert result_async == [mock.ANY, result_sync[1]]
 
 
 def test_remote_service_try_call_without_async_context(echo_server):
@@ -81,12 +83,10 @@ def test_remote_service_through_cluster(echo_server):
     with ClusterProxy(config) as cluster:
         result = cluster.test_service_1.test(1, 2, 3, test=1, test2=2)
 
-        assert result == {
-            'method': 'test',
-            'args': [1, 2, 3],
-            'kwargs': {"test": 1, "test2": 2},
-            'meta': {'headers': {}}
-        }
+        assert result == [
+            [2, 'test', 'orjson', mock.ANY],
+            [[1, 2, 3], {"test": 1, "test2": 2}],
+        ]
 
 
 def test_async_remote_service_through_cluster(echo_server):
@@ -107,22 +107,18 @@ def test_async_remote_service_through_cluster(echo_server):
         cluster.test_service_1.test.call_async(
             1, 2, 3, test=1, test2=2
         )
-        assert cluster.test_service_1.test.result() == {
-            'method': 'test',
-            'args': [1, 2, 3],
-            'kwargs': {"test": 1, "test2": 2},
-            'meta': {'headers': {}}
-        }
+        assert cluster.test_service_1.test.result() == [
+            [2, 'test', 'orjson', mock.ANY],
+            [[1, 2, 3], {"test": 1, "test2": 2}],
+        ]
 
         cluster.test_service_2.test.call_async(
             1, 2, 3, test=1, test2=2
         )
-        assert cluster.test_service_2.test.result() == {
-            'method': 'test',
-            'args': [1, 2, 3],
-            'kwargs': {"test": 1, "test2": 2},
-            'meta': {'headers': {}}
-        }
+        assert cluster.test_service_2.test.result() == [
+            [2, 'test', 'orjson', mock.ANY],
+            [[1, 2, 3], {"test": 1, "test2": 2}],
+        ]
 
 
 def test_async_remote_service_through_cluster_with_exception(echo_server):
@@ -138,3 +134,117 @@ def test_async_remote_service_through_cluster_with_exception(echo_server):
     with ClusterProxy(config) as cluster:
         with pytest.raises(ServiceNotFound):
             cluster.test_service_2.test(1, 2, 3, test=1, test2=2)
+
+
+def test_remote_service_pipelined_async_calls(echo_server):
+    class Service:
+        name = "test_service"
+        service_a = ServiceProxy(host="127.0.0.1", port=5555)
+
+    service = Service()
+
+    with service.service_a as service_a:
+        futures = [service_a.test.async_call(i) for i in range(100)]
+
+        assert [future.get(timeout=5)[1][0] for future in futures] == [
+            [i] for i in range(100)
+        ]
+
+        ids = {
+            future.get()[0][3]["correlation_id"]
+            for future in futures
+        }
+        assert len(ids) == 100
+
+    with service.service_a as service_a:
+        service_a.test.async_call(1)
+        service_a.test.async_call(2)
+
+        assert service_a.test.result()[1][0] == [1]
+        assert service_a.test.result()[1][0] == [2]
+
+
+def test_remote_service_call_timeout():
+    class Service:
+        name = "test_service"
+        service_a = ServiceProxy(
+            host="127.0.0.1", port=5599, timeout=0.1, retries=1
+        )
+
+    service = Service()
+
+    with pytest.raises(RequestTimeout):
+        service.service_a.test(1)
+
+    with pytest.raises(RequestTimeout):
+        service.service_a.test._with_options(timeout=0.05, retries=0)(1)
+
+    started = time.monotonic()
+
+    with pytest.raises(RequestTimeout):
+        proxy = service.service_a._with_options(timeout=0.05, retries=0)
+
+        with proxy._batch() as batch:
+            batch.test(1)
+
+    assert time.monotonic() - started < 0.15
+
+
+def test_remote_service_async_call_timeout_drops_request():
+    server = start_server(
+        host="127.0.0.1", port=5557, callback=lambda frames: None
+    )
+
+    class Service:
+        name = "test_service"
+        service_a = ServiceProxy(host="127.0.0.1", port=5557)
+
+    with Service().service_a as service_a:
+        future = service_a.test.async_call(1)
+
+        with pytest.raises(RequestTimeout):
+            future.get(timeout=0.05)
+
+        with pytest.raises(RequestTimeout):
+            future.get()
+
+        cancelled = service_a.test.async_call(2)
+        cancelled.cancel()
+
+        with pytest.raises(AsyncCallError):
+            cancelled.get()
+
+    assert get_pool().get("127.0.0.1", 5557).pending == 0
+
+    with Service().service_a as service_a:
+        abandoned = service_a.test.async_call(3)
+
+    assert get_pool().get("127.0.0.1", 5557).pending == 0
+
+    with pytest.raises(AsyncCallError):
+        abandoned.get()
+
+    server.stop()
+
+
+def test_remote_service_call_retries_after_lost_reply():
+    replies = []
+
+    def callback(frames):
+        replies.append(frames)
+        return frames[1] if len(replies) > 1 else None
+
+    server = start_server(host="127.0.0.1", port=5556, callback=callback)
+
+    class Service:
+        name = "test_service"
+        service_a = ServiceProxy(
+            host="127.0.0.1", port=5556, timeout=0.2, retries=2
+        )
+
+    result = Service().service_a.test(1)
+
+    assert result == [[1], {}]
+    assert len(replies) == 2
+
+    server.stop()
@@ -0,0 +1,38 @@
+from datetime import date, datetime, timezone
+from decimal import Decimal
+from uuid import uuid4
+
+import pytest
+
+from noneapi.serializers import (
+    JSONSerializer,
+    ORJSONSerializer,
+    get_serializer,
+)
+
+pytest.importorskip("msgpack")
+
+from noneapi.serializers import MsgPackSerializer  # noqa: E402
+
+
+def test_msgpack_serializer_keeps_bytes_and_ext_types():
+    serializer = MsgPackSerializer()
+    data = {
+        "blob": b"\x00\xff" * 10,
+        "created": datetime(2023, 10, 29, 12, 30, tzinfo=timezone.utc),
+        "day": date(2023, 10, 29),
+        "id": uuid4(),
+        "price": Decimal("10.05"),
+        1: [1, "a", None],
+    }
+
+    assert serializer.deserialize(serializer.serialize(data)) == data
+
+
+def test_get_serializer_by_name():
+    assert isinstance(get_serializer("json"), JSONSerializer)
+    assert isinstance(get_serializer("orjson"), ORJSONSerializer)
+    assert get_serializer("msgpack") is get_serializer("msgpack")
+
+    with pytest.raises(ValueError):
+        get_serializer("yaml")
@@ -0,0 +1,72 @@
+import gevent
+from gevent.greenlet import Greenlet
+
+from noneapi.servers import ZeroMQRPCServer, split_envelope
+from noneapi.transports import ZeroMQTransport
+
+
+def test_split_envelope():
+    assert split_envelope([b"id", b"", b"header", b"body"]) == (
+        [b"id", b""], [b"header", b"body"]
+    )
+
+
+def test_server_rejects_requests_over_queue_limit():
+    def callback(frames):
+        gevent.sleep(0.2)
+        return frames[0]
+
+    server = ZeroMQRPCServer(
+        host="127.0.0.1",
+        port=5557,
+        callback=callback,
+        max_queue=1,
+        overload_callback=lambda frames: b"overloaded",
+        hwm=100,
+    )
+    Greenlet(run=server.run).start()
+
+    transport = ZeroMQTransport()
+    calls = [
+        gevent.spawn(transport.request, "127.0.0.1", 5557, [b"%d" % i])
+        for i in range(3)
+    ]
+    gevent.joinall(calls)
+
+    assert sorted(call.value for call in calls) == [
+        b"0", b"overloaded", b"overloaded"
+    ]
+    assert server.in_flight == 0
+
+    server.stop()
+
+
+def test_server_processes_high_priority_requests_first():
+    processed = []
+
+    def callback(frames):
+        processed.append(frames[0])
+        gevent.sleep(0.05)
+        return frames[0]
+
+    server = ZeroMQRPCServer(
+        host="127.0.0.1",
+        port=5558,
+        callback=callback,
+        priority_callback=lambda frames: int(frames[0].startswith(b"high")),
+    )
+    Greenlet(run=server.run).start()
+
+    transport = ZeroMQTransport()
+    blocker = gevent.spawn(transport.request, "127.0.0.1", 5558, [b"low-0"])
+    gevent.sleep(0.02)
+
+    calls = [
+        gevent.spawn(transport.request, "127.0.0.1", 5558, [data])
+        for data in [b"low-1", b"low-2", b"high-1", b"high-2"]
+    ]
+    gevent.joinall([blocker, *calls])
+
+    assert processed == [b"low-0", b"high-1", b"high-2", b"low-1", b"low-2"]
+
+    server.stop()
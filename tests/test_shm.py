@@ -0,0 +1,91 @@
+import gc
+import os
+import subprocess
+import sys
+
+import pytest
+
+from noneapi.exceptions import InvalidSegment, SegmentExpired
+from noneapi.shm import (
+    _HANDLE,
+    _SEGMENT_MAGIC,
+    SegmentPool,
+    build_trailer,
+    parse_trailer,
+)
+
+
+def test_segment_pool_shares_large_frames(tmp_path):
+    pool = SegmentPool(directory=str(tmp_path))
+    payload = os.urandom(100_000)
+
+    shared = pool.share([b"header", payload], threshold=1024)
+
+    assert shared[0] == b"header"
+    assert len(shared[1]) < 1024
+    assert pool.size == 128 * 1024
+
+    frames = pool.attach(shared)
+
+    assert frames[0] == b"header"
+    assert isinstance(frames[1], memoryview)
+    assert frames[1] == payload
+
+    pool.share([payload], threshold=1024)
+    assert pool.size == 2 * 128 * 1024
+
+    del frames
+    gc.collect()
+
+    pool.share([payload], threshold=1024)
+    assert pool.size == 2 * 128 * 1024
+
+    pool.close()
+    assert os.listdir(tmp_path) == []
+
+
+def test_segment_pool_reclaims_segments(tmp_path):
+    pool = SegmentPool(directory=str(tmp_path), lease_timeout=0)
+    expired = pool.share([b"x" * 2048], threshold=1024)
+    pool.share([b"y" * 2048], threshold=1024)
+
+    assert pool.size == 64 * 1024
+
+    with pytest.raises(SegmentExpired):
+        pool.attach(expired)
+
+    pool.close()
+
+
+def test_segment_pool_attaches_only_segments(tmp_path):
+    directory = tmp_path / "shm"
+    directory.mkdir()
+    (tmp_path / "secret").write_bytes(b"\0" * 64)
+    (directory / "noneapi-1-0").symlink_to(tmp_path / "secret")
+    pool = SegmentPool(directory=str(directory))
+
+    for name in [b"../secret", b"/etc/passwd", b"noneapi-1-0"]:
+        handle = _HANDLE.pack(_SEGMENT_MAGIC, name, 0, 16)
+
+        with pytest.raises(InvalidSegment):
+            pool.attach([handle])
+
+
+def test_segment_pool_removes_segments_of_crashed_processes(tmp_path):
+    process = subprocess.Popen([sys.executable, "-c", "pass"])
+    process.wait()
+    (tmp_path / f"noneapi-{process.pid}-0").write_bytes(b"\0" * 64)
+
+    pool = SegmentPool(directory=str(tmp_path))
+    pool.share([b"x" * 2048], threshold=1024)
+
+    assert os.listdir(tmp_path) == [f"noneapi-{os.getpid()}-0"]
+
+    pool.close()
+
+
+def test_request_trailer():
+    frames = [b"header", b"body"]
+
+    assert parse_trailer(frames) == (frames, None)
+    assert parse_trailer([*frames, build_trailer(1024)]) == (frames, 1024)
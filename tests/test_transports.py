@@ -0,0 +1,120 @@
+import time
+from pathlib import Path
+
+import pytest
+
+from noneapi.exceptions import InvalidSegment
+from noneapi.shm import _HANDLE, _SEGMENT_MAGIC
+from noneapi.transports import (
+    COPY_THRESHOLD,
+    IPC,
+    TCP,
+    ConnectionPool,
+    Endpoint,
+    ZeroMQTransport,
+    get_pool,
+)
+from tests.conftest import start_server
+
+
+def test_endpoint_url():
+    assert Endpoint(TCP, "127.0.0.1", 5555).url == "tcp://127.0.0.1:5555"
+    assert Endpoint(IPC, Path("/tmp/a.sock"), 1).url == "ipc:///tmp/a.sock"
+    assert Endpoint(IPC, "/tmp/a.sock") == Endpoint(IPC, Path("/tmp/a.sock"))
+
+    for url in ("tcp://127.0.0.1:5555", "ipc:///tmp/a.sock", "inproc://a"):
+        assert Endpoint.parse(url).url == url
+
+    with pytest.raises(ValueError):
+        Endpoint(TCP, "127.0.0.1")
+
+    with pytest.raises(ValueError):
+        Endpoint.parse("127.0.0.1:5555")
+
+
+def test_connection_pool_reuses_endpoint_connection():
+    pool = ConnectionPool()
+
+    connection = pool.get("127.0.0.1", 7001)
+
+    assert pool.get("127.0.0.1", 7001) is connection
+    assert pool.get("127.0.0.1", 7002) is not connection
+    assert pool.stats.size == 2
+    assert pool.stats.created == 2
+    assert pool.stats.reused == 1
+
+    pool.close()
+
+    assert pool.stats.size == 0
+
+
+def test_connection_pool_evicts_least_recently_used():
+    pool = ConnectionPool(max_size=2)
+
+    first = pool.get("127.0.0.1", 7001)
+    second = pool.get("127.0.0.1", 7002)
+    pool.get("127.0.0.1", 7001)
+    pool.get("127.0.0.1", 7003)
+
+    assert pool.get("127.0.0.1", 7001) is first
+    assert pool.get("127.0.0.1", 7002) is not second
+    assert pool.stats.size == 2
+    assert pool.stats.evicted == 2
+
+    pool.close()
+
+
+def test_connection_pool_evicts_idle_connections():
+    pool = ConnectionPool(idle_timeout=0.05)
+
+    pool.get("127.0.0.1", 7001)
+    time.sleep(0.1)
+    pool.get("127.0.0.1", 7002)
+
+    assert pool.stats.size == 1
+    assert pool.stats.evicted == 1
+
+    pool.close()
+
+
+def test_transports_share_connections(echo_server):
+    first, second = ZeroMQTransport(), ZeroMQTransport()
+
+    assert first.request("127.0.0.1", 5555, b'"ping"') == b'["ping"]'
+    created = get_pool().stats.created
+
+    assert second.request(
+        "127.0.0.1", 5555, [b'"po"', b'"ng"']
+    ) == b'["po","ng"]'
+    assert get_pool().stats.created == created
+    assert get_pool().stats.in_flight == 0
+
+
+def test_transport_receives_large_reply_without_copy(echo_server):
+    transport = ZeroMQTransport()
+    payload = b'"' + b"x" * COPY_THRESHOLD + b'"'
+
+    small = transport.request("127.0.0.1", 5555, b'"ping"')
+    large = transport.request("127.0.0.1", 5555, payload)
+
+    assert isinstance(small, bytes)
+    assert isinstance(large, memoryview)
+    assert bytes(large) == b"[" + payload + b"]"
+
+
+def test_transport_reads_shared_replies_only_if_asked():
+    handle = _HANDLE.pack(_SEGMENT_MAGIC, b"../../etc/passwd", 1, 16)
+    server = start_server("127.0.0.1", 7010, lambda frames: handle)
+
+    assert ZeroMQTransport().request("127.0.0.1", 7010, b"{}") == handle
+
+    transport = ZeroMQTransport(shared_memory_threshold=1024)
+    started = time.monotonic()
+
+    with pytest.raises(InvalidSegment):
+        transport.request("127.0.0.1", 7010, b"{}")
+
+    assert time.monotonic() - started < 1
+    assert get_pool().stats.in_flight == 0
+
+    server.stop()
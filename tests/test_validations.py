@@ -35,4 +35,89 @@ def test_validation_pydantic_types():
     assert not validations.validate_or_ignore(test_pydantic, model={"x": 1, "y": 2})
 
     with pytest.raises(ValueError):
-        assert validations.validate_or_ignore(test_pydantic, model={"x": 1, "y": "qwe"})
\ No newline at end of file
+        assert validations.validate_or_ignore(test_pydantic, model={"x": 1, "y": "qwe"})
+
+def test_validations_special_forms():
+    from typing import Annotated, Any, Literal, Optional
+
+    def test_forms(
+        a: Optional[int],
+        b: int | None,
+        c: Any,
+        d: Literal["x", "y"],
+        e: Annotated[str, "name"],
+    ):
+        return a
+
+    assert not validations.validate_or_ignore(
+        test_forms, None, 1, object(), "x", "e"
+    )
+    assert not validations.validate_or_ignore(test_forms, 1, None, 1, "y", "")
+
+    for args in (
+        ("1", 1, 1, "x", "e"),
+        (1, "1", 1, "x", "e"),
+        (1, 1, 1, "z", "e"),
+        (1, 1, 1, "x", 1),
+    ):
+        with pytest.raises(ValueError):
+            validations.validate_or_ignore(test_forms, *args)
+
+
+def test_validators_are_compiled_once():
+    class Service:
+        def method(self, x: int, y: str = ""):
+            return x
+
+        def untyped(self, x, y):
+            return x
+
+    service = Service()
+    validator = validations.get_validator(service.method)
+
+    assert validations.get_validator(Service().method) is validator
+    assert validations.get_validator(service.untyped) is None
+
+    validator(1, y="a")
+
+    with pytest.raises(ValueError):
+        validations.validate_or_ignore(service.method, "1")
+
+
+def test_coercion_validates_deeply_and_returns_models():
+    from pydantic import BaseModel
+
+    class Item(BaseModel):
+        id: int
+
+    def test_coerce(items: list[Item], ids: list[int], flag=None):
+        return items
+
+    args, kwargs = validations.coerce_or_ignore(
+        test_coerce, [{"id": 1}], ids=[1, "2"]
+    )
+
+    assert args == ([Item(id=1)],)
+    assert kwargs == {"ids": [1, 2]}
+
+    with pytest.raises(ValueError):
+        validations.coerce_or_ignore(test_coerce, [], ids=["x"])
+
+
+def test_coercion_falls_back_to_shallow_check():
+    class Point:
+        pass
+
+    def test_coerce(point: Point, name: "Missing", count: int):  # noqa
+        return point
+
+    point = Point()
+    args, kwargs = validations.coerce_or_ignore(
+        test_coerce, point, "x", count="2"
+    )
+
+    assert args == (point, "x")
+    assert kwargs == {"count": 2}
+
+    with pytest.raises(ValueError):
+        validations.coerce_or_ignore(test_coerce, "point", "x", count=2)